@@ -0,0 +1,236 @@
+"""SOPSy Benchmarks fixtures.
+
+Run them with `pytest benchmarks`, fixtures of 1KB, 64KB and 1MB are generated by
+default, set `SOPSY_BENCH_SIZES=full` (up to 50MB) or a list like `1KB,10MB` to
+change them. Save runs with `--benchmark-autosave` and track them over time with
+`--benchmark-compare`. A table comparing the backends is printed at the end.
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import math
+import os
+import shutil
+import tracemalloc
+from typing import TYPE_CHECKING
+from typing import Any
+from typing import Callable
+
+import pytest
+
+from sopsy import utils
+
+native = pytest.importorskip("sopsy.native")
+pytest.importorskip("cryptography")
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+os.environ["SOPS_AGE_KEY"] = (
+    "AGE-SECRET-KEY-1PZK567WHQ5DPQ9MZZCXAFSYHETZ9J59YTAKXD6CDWEPHVKG8LXHSZPDFN8"
+)
+os.environ["SOPS_AGE_RECIPIENTS"] = (
+    "age13q0ur562d70500mmsnxlhnmpu0cemanf9muk7tyeum0r88gnfa2scrus0l"
+)
+LASTMODIFIED = "2024-10-10T19:34:48Z"
+AGE_STANZA = {
+    "recipient": "age13q0ur562d70500mmsnxlhnmpu0cemanf9muk7tyeum0r88gnfa2scrus0l",
+    "enc": "-----BEGIN AGE ENCRYPTED FILE-----\nYWdlLWVuY3J5cHRpb24ub3JnL3YxCi0+IFgyNTUxOSA3VkxSaW5JcE1WTWNEL1lH\nMzhJdjIxUWRvVUhvU3laT2lIeitNYSsza0hNCk1NZGN1cndmbmRTc0RRYkhQdkhI\nM3hNRFNhaVlyZE9lem11Ny9mL0lTZnMKLS0tIGNzS1ZLeDJrYlEwRzNiY1hYN3I2\nS3ZuNWNNdVRmTGFqOUlGZVFhclJxZnMKc8jVhERNU0EHh81J16ssU/N9waH7b8wc\nWK2DseZRZV0RFFf9quX5goXFHsrqRRaCfj9PBPLe47e/V6Z92K2oYg==\n-----END AGE ENCRYPTED FILE-----\n",  # noqa: E501
+}
+SIZES = [10, 100, 1_000, 10_000]
+FORMATS = ["json", "yaml", "dotenv", "binary"]
+EXTENSIONS = {"json": ".json", "yaml": ".yaml", "dotenv": ".env", "binary": ".bin"}
+BACKENDS = ["subprocess", "cached", "native", "async", "batch", "get_dict"]
+BENCH_SIZES = {"quick": "1KB,64KB,1MB", "full": "1KB,64KB,1MB,10MB,50MB"}
+# approximate size of an encrypted key/value line, to reach the target file sizes
+ENCRYPTED_LINE_SIZE = 180
+VALUE_SIZE = 48
+
+# (operation, format, size) -> backend -> (median seconds, peak memory bytes)
+RESULTS: dict[tuple[str, str, str], dict[str, tuple[float, int]]] = {}
+
+
+def bench_sizes() -> list[str]:
+    """Return the fixture sizes to benchmark, from `SOPSY_BENCH_SIZES`."""
+    value = os.environ.get("SOPSY_BENCH_SIZES", "quick")
+    return BENCH_SIZES.get(value, value).split(",")
+
+
+def parse_size(size: str) -> int:
+    """Convert a size like `64KB` to a number of bytes."""
+    units = {"KB": 1024, "MB": 1024**2}
+    return int(size[:-2]) * units[size[-2:].upper()]
+
+
+def make_document(keys: int) -> dict[str, Any]:
+    """Build an encrypted SOPS document with the given number of keys."""
+    metadata = {
+        "age": [AGE_STANZA],
+        "lastmodified": LASTMODIFIED,
+        "unencrypted_suffix": "_unencrypted",
+        "version": "3.9.1",
+    }
+    data_key = native.unwrap_data_key(metadata, key_cache=None)
+    digest = hashlib.sha512()
+    document: dict[str, Any] = {}
+    for i in range(keys):
+        value = f"secret-value-{i:08d}"
+        digest.update(value.encode())
+        document[f"key{i}"] = native.encrypt_value(value, data_key, f"key{i}:")
+    metadata["mac"] = native.encrypt_value(
+        digest.hexdigest().upper(), data_key, LASTMODIFIED
+    )
+    document["sops"] = metadata
+    return document
+
+
+def make_tree(size: int) -> dict[str, str]:
+    """Build a flat document whose encrypted form weighs about `size` bytes."""
+    keys = max(1, size // ENCRYPTED_LINE_SIZE)
+    return {
+        f"key{i:08d}": f"secret-value-{i:08d}-".ljust(VALUE_SIZE, "x")
+        for i in range(keys)
+    }
+
+
+def make_plaintext(fmt: str, size: int) -> bytes:
+    """Build the decrypted output of a fixture, as sops would print it."""
+    if fmt == "binary":
+        return base64.b64encode(os.urandom(size * 3 // 4))
+    tree = make_tree(size)
+    if fmt == "json":
+        return json.dumps(tree, indent="\t").encode()
+    if fmt == "dotenv":
+        return "".join(f"{k}={v}\n" for k, v in tree.items()).encode()
+    return utils.yaml_dump(tree).encode()
+
+
+def make_sops_content(fmt: str, size: int) -> bytes:
+    """Build an age encrypted SOPS file of about `size` bytes in the given format."""
+    metadata: dict[str, Any] = {
+        "age": [AGE_STANZA],
+        "lastmodified": LASTMODIFIED,
+        "unencrypted_suffix": "_unencrypted",
+        "version": "3.9.1",
+    }
+    aead = native.AESGCM(native.unwrap_data_key(metadata, key_cache=None))
+    if fmt == "binary":
+        tree = {"data": make_plaintext(fmt, size).decode()}
+    else:
+        tree = make_tree(size)
+    digest = hashlib.sha512()
+    document: dict[str, Any] = {}
+    for key, value in tree.items():
+        digest.update(value.encode())
+        document[key] = native.encrypt_value(value, aead, f"{key}:")
+    metadata["mac"] = native.encrypt_value(
+        digest.hexdigest().upper(), aead, LASTMODIFIED
+    )
+    if fmt == "dotenv":
+        # sops flattens its metadata in dotenv files
+        age = {f"sops_age__list_0__map_{k}": v for k, v in AGE_STANZA.items()}
+        flat = {**{f"sops_{k}": v for k, v in metadata.items() if k != "age"}, **age}
+        lines = [f"{k}={v}" for k, v in document.items()]
+        lines.extend(f"{k}={v}".replace("\n", "\\n") for k, v in sorted(flat.items()))
+        return "\n".join([*lines, ""]).encode()
+    document["sops"] = metadata
+    if fmt == "yaml":
+        return utils.yaml_dump(document).encode()
+    return json.dumps(document, indent="\t").encode()
+
+
+def measure(
+    benchmark: Any,
+    func: Callable[[], Any],
+    *,
+    operation: str,
+    fmt: str,
+    size: str,
+    backend: str,
+) -> Any:
+    """Benchmark a function, then record its median time and memory peak.
+
+    The memory peak is measured with `tracemalloc` during one extra call, it only
+    accounts for Python allocations (not the sops process ones).
+    """
+    benchmark.group = f"{operation}-{fmt}-{size}"
+    result = benchmark(func)
+    tracemalloc.start()
+    try:
+        _ = func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    benchmark.extra_info["peak_memory"] = peak
+    stats = getattr(benchmark.stats, "stats", None)
+    median = stats.median if stats is not None else math.nan
+    RESULTS.setdefault((operation, fmt, size), {})[backend] = (median, peak)
+    return result
+
+
+def pytest_terminal_summary(terminalreporter: Any) -> None:
+    """Print the median time and memory peak of each backend side by side."""
+    if not RESULTS:
+        return
+    used = {backend for results in RESULTS.values() for backend in results}
+    backends = [b for b in BACKENDS if b in used]
+    header = ["operation", "format", "size", *backends]
+    rows = [header]
+    for (operation, fmt, size), results in RESULTS.items():
+        cells = [operation, fmt, size]
+        for backend in backends:
+            if backend in results:
+                median, peak = results[backend]
+                # no timing when benchmarks are disabled
+                timing = "-" if math.isnan(median) else f"{median * 1000:.2f}ms"
+                cells.append(f"{timing} {peak / 1024**2:.1f}MiB")
+            else:
+                cells.append("-")
+        rows.append(cells)
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    terminalreporter.write_sep("-", "sopsy backends (median time, memory peak)")
+    for row in rows:
+        terminalreporter.write_line(
+            "  ".join(cell.ljust(width) for cell, width in zip(row, widths))
+        )
+
+
+@pytest.fixture(scope="session")
+def sops_fixture(
+    tmp_path_factory: pytest.TempPathFactory,
+) -> Callable[[str, str], Path]:
+    """Return a function writing (once) a SOPS file of a given format and size."""
+    tmp_path = tmp_path_factory.mktemp("fixtures")
+    files: dict[tuple[str, str], Path] = {}
+
+    def _sops_fixture(fmt: str, size: str) -> Path:
+        if (fmt, size) not in files:
+            path = tmp_path / f"secret-{size}{EXTENSIONS[fmt]}"
+            _ = path.write_bytes(make_sops_content(fmt, parse_size(size)))
+            files[fmt, size] = path
+        return files[fmt, size]
+
+    return _sops_fixture
+
+
+@pytest.fixture(scope="session")
+def sops_files(tmp_path_factory: pytest.TempPathFactory) -> dict[int, Path]:
+    """Write encrypted JSON documents of several sizes."""
+    tmp_path = tmp_path_factory.mktemp("sops")
+    files = {}
+    for size in SIZES:
+        files[size] = tmp_path / f"secret-{size}.json"
+        _ = files[size].write_text(json.dumps(make_document(size), indent="\t"))
+    return files
+
+
+@pytest.fixture
+def sops_binary() -> str:
+    """Return the sops binary path, skip the benchmark if it is not installed."""
+    path = shutil.which("sops")
+    if path is None:
+        pytest.skip("sops binary not found")
+    return path
@@ -0,0 +1,157 @@
+"""SOPSy backends compared across file formats and sizes.
+
+Backends: `subprocess` runs sops for each call, `cached` serves decryptions from a
+`DecryptCache`, `native` decrypts in-process, `async` runs sops with `AsyncSops`,
+`batch` decrypts several copies of the file with `decrypt_many`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING
+from typing import Any
+from typing import Callable
+
+import pytest
+from conftest import BACKENDS
+from conftest import FORMATS
+from conftest import bench_sizes
+from conftest import make_plaintext
+from conftest import measure
+from conftest import parse_size
+
+from sopsy import AsyncSops
+from sopsy import DecryptCache
+from sopsy import Sops
+from sopsy import decrypt_many
+from sopsy import utils
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+NATIVE_FORMATS = {"json", "yaml"}
+BATCH_SIZE = 8
+KEY = "key00000000"
+SOPS_BACKENDS = [b for b in BACKENDS if b != "get_dict"]
+
+
+def _sops_kwargs(fmt: str, sops_binary: str) -> dict[str, Any]:
+    kwargs: dict[str, Any] = {"binary_path": sops_binary}
+    if fmt == "binary":
+        kwargs.update(input_type="binary", output_type="binary")
+    return kwargs
+
+
+def _sops(backend: str, path: Path, fmt: str, sops_binary: str) -> Sops:
+    kwargs = _sops_kwargs(fmt, sops_binary)
+    if backend == "cached":
+        return Sops(path, cache=DecryptCache(), native=fmt in NATIVE_FORMATS, **kwargs)
+    if backend == "native":
+        if fmt not in NATIVE_FORMATS:
+            pytest.skip(f"no native support of {fmt} files")
+        return Sops(path, native=True, **kwargs)
+    if backend == "async":
+        return AsyncSops(path, **kwargs)
+    return Sops(path, **kwargs)
+
+
+def _decrypt(backend: str, path: Path, fmt: str, sops_binary: str) -> Callable[[], Any]:
+    to_dict = fmt != "binary"
+    if backend == "batch":
+        files = [path] * BATCH_SIZE
+        kwargs = _sops_kwargs(fmt, sops_binary)
+        return lambda: decrypt_many(files, to_dict=to_dict, **kwargs)
+    s = _sops(backend, path, fmt, sops_binary)
+    if isinstance(s, AsyncSops):
+        return lambda: asyncio.run(s.decrypt(to_dict=to_dict))
+    if backend == "cached":
+        _ = s.decrypt(to_dict=to_dict)
+    return lambda: s.decrypt(to_dict=to_dict)
+
+
+@pytest.mark.parametrize("backend", SOPS_BACKENDS)
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_construct(
+    benchmark: Any,
+    sops_fixture: Callable[[str, str], Path],
+    sops_binary: str,
+    fmt: str,
+    backend: str,
+) -> None:
+    """Build a `Sops` object, resolving its binary and configuration."""
+    size = bench_sizes()[0]
+    path = sops_fixture(fmt, size)
+    if backend == "batch":
+        pytest.skip("batches build one object per file")
+    _ = measure(
+        benchmark,
+        lambda: _sops(backend, path, fmt, sops_binary),
+        operation="construct",
+        fmt=fmt,
+        size=size,
+        backend=backend,
+    )
+
+
+@pytest.mark.parametrize("backend", SOPS_BACKENDS)
+@pytest.mark.parametrize("size", bench_sizes())
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_decrypt(
+    benchmark: Any,
+    sops_fixture: Callable[[str, str], Path],
+    sops_binary: str,
+    fmt: str,
+    size: str,
+    backend: str,
+) -> None:
+    """Decrypt a whole file."""
+    decrypt = _decrypt(backend, sops_fixture(fmt, size), fmt, sops_binary)
+    _ = measure(
+        benchmark, decrypt, operation="decrypt", fmt=fmt, size=size, backend=backend
+    )
+
+
+@pytest.mark.parametrize("backend", ["subprocess", "cached", "native", "async"])
+@pytest.mark.parametrize("size", bench_sizes())
+@pytest.mark.parametrize("fmt", [f for f in FORMATS if f != "binary"])
+def test_get(
+    benchmark: Any,
+    sops_fixture: Callable[[str, str], Path],
+    sops_binary: str,
+    fmt: str,
+    size: str,
+    backend: str,
+) -> None:
+    """Get one key of a file."""
+    s = _sops(backend, sops_fixture(fmt, size), fmt, sops_binary)
+    if isinstance(s, AsyncSops):
+
+        def _get() -> Any:
+            return asyncio.run(s.get(KEY))
+    else:
+        if backend == "cached":
+            _ = s.decrypt()
+
+        def _get() -> Any:
+            return s.get(KEY)
+
+    value = measure(
+        benchmark, _get, operation="get", fmt=fmt, size=size, backend=backend
+    )
+    assert value.startswith("secret-value-00000000-")
+
+
+@pytest.mark.parametrize("size", bench_sizes())
+@pytest.mark.parametrize("fmt", [f for f in FORMATS if f != "binary"])
+def test_parse(benchmark: Any, fmt: str, size: str) -> None:
+    """Parse the decrypted output of a file."""
+    data = make_plaintext(fmt, parse_size(size))
+    parsed = measure(
+        benchmark,
+        lambda: utils.get_dict(data, output_type=fmt),
+        operation="parse",
+        fmt=fmt,
+        size=size,
+        backend="get_dict",
+    )
+    assert KEY in parsed
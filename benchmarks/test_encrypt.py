@@ -0,0 +1,66 @@
+"""SOPSy encrypt() throughput: in-process encryption against the sops binary.
+
+Each benchmark round encrypts one document, the operations per second reported by
+pytest-benchmark are documents per second.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+from typing import Any
+
+import pytest
+from conftest import bench_sizes
+from conftest import make_plaintext
+from conftest import measure
+from conftest import parse_size
+
+from sopsy import Sops
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+ENCRYPT_FORMATS = ["json", "yaml"]
+ENCRYPT_BACKENDS = ["subprocess", "native"]
+# a generated per-tenant credentials document
+TENANT_SIZE = "1KB"
+
+
+@pytest.mark.parametrize("backend", ENCRYPT_BACKENDS)
+@pytest.mark.parametrize("size", bench_sizes())
+@pytest.mark.parametrize("fmt", ENCRYPT_FORMATS)
+def test_encrypt(
+    benchmark: Any,
+    tmp_path: Path,
+    sops_binary: str,
+    fmt: str,
+    size: str,
+    backend: str,
+) -> None:
+    """Encrypt a plain document, in-process or with `sops encrypt`."""
+    path = tmp_path / f"plain.{fmt}"
+    _ = path.write_bytes(make_plaintext(fmt, parse_size(size)))
+    s = Sops(path, binary_path=sops_binary, native=backend == "native")
+    out = measure(
+        benchmark, s.encrypt, operation="encrypt", fmt=fmt, size=size, backend=backend
+    )
+    assert isinstance(out, dict)
+    assert "sops" in out
+
+
+@pytest.mark.parametrize("backend", ENCRYPT_BACKENDS)
+def test_encrypt_tenant(
+    benchmark: Any, tmp_path: Path, sops_binary: str, backend: str
+) -> None:
+    """Encrypt a small credentials document in place, as a nightly job would."""
+    benchmark.group = f"encrypt-tenant-{TENANT_SIZE}"
+    path = tmp_path / "tenant.json"
+    plaintext = make_plaintext("json", parse_size(TENANT_SIZE))
+    s = Sops(path, binary_path=sops_binary, native=backend == "native", in_place=True)
+
+    def _encrypt() -> None:
+        _ = path.write_bytes(plaintext)
+        _ = s.encrypt()
+
+    benchmark(_encrypt)
+    assert path.read_bytes() != plaintext
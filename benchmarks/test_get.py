@@ -0,0 +1,55 @@
+"""SOPSy get() latency against document size."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+from typing import Any
+
+import pytest
+from conftest import SIZES
+
+from sopsy import native
+from sopsy import sopsy
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_get_native_lazy(
+    benchmark: Any, sops_files: dict[int, Path], size: int
+) -> None:
+    """Decrypt one key with the native engine, only decrypting its value."""
+    benchmark.group = f"get-{size}"
+    content = sops_files[size].read_bytes()
+
+    def _get() -> Any:
+        document = native.load_document(content, "json")
+        return native.decrypt_path(document, ["key0"])
+
+    assert benchmark(_get) == "secret-value-00000000"
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_get_native_full(
+    benchmark: Any, sops_files: dict[int, Path], size: int
+) -> None:
+    """Decrypt one key with the native engine, decrypting and verifying everything."""
+    benchmark.group = f"get-{size}"
+    content = sops_files[size].read_bytes()
+
+    def _get() -> Any:
+        document = native.load_document(content, "json")
+        return native.decrypt_path(document, ["key0"], verify_mac=True)
+
+    assert benchmark(_get) == "secret-value-00000000"
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_get_binary(
+    benchmark: Any, sops_files: dict[int, Path], sops_binary: str, size: int
+) -> None:
+    """Decrypt one key with the sops binary."""
+    benchmark.group = f"get-{size}"
+    s = sopsy.Sops(sops_files[size], binary_path=sops_binary)
+    assert benchmark(s.get, "key0") == "secret-value-00000000"
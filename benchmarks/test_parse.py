@@ -0,0 +1,69 @@
+"""SOPSy decrypted output parsing against document size."""
+
+from __future__ import annotations
+
+import json
+from typing import Any
+
+import pytest
+import yaml
+from conftest import SIZES
+
+from sopsy import utils
+
+
+def _document(keys: int) -> dict[str, Any]:
+    return {
+        f"service{i}": {
+            "password": f"secret-value-{i:08d}",
+            "port": 1024 + i,
+            "hosts": [f"host{i}-a.example.com", f"host{i}-b.example.com"],
+        }
+        for i in range(keys)
+    }
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_parse_yaml_python(benchmark: Any, size: int) -> None:
+    """Parse YAML with the pure-Python loader."""
+    benchmark.group = f"parse-yaml-{size}"
+    data = yaml.safe_dump(_document(size)).encode()
+    assert benchmark(yaml.safe_load, data) == _document(size)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_parse_yaml_libyaml(benchmark: Any, size: int) -> None:
+    """Parse YAML with the libyaml loader, when available."""
+    benchmark.group = f"parse-yaml-{size}"
+    data = yaml.safe_dump(_document(size)).encode()
+    assert benchmark(utils.get_dict, data, output_type="yaml") == _document(size)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_parse_json_stdlib(benchmark: Any, size: int) -> None:
+    """Parse JSON with the standard library."""
+    benchmark.group = f"parse-json-{size}"
+    data = json.dumps(_document(size)).encode()
+    assert benchmark(json.loads, data) == _document(size)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_parse_json_fast(benchmark: Any, size: int) -> None:
+    """Parse JSON with orjson, when installed."""
+    benchmark.group = f"parse-json-{size}"
+    data = json.dumps(_document(size)).encode()
+    assert benchmark(utils.get_dict, data, output_type="json") == _document(size)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_dump_yaml_python(benchmark: Any, size: int) -> None:
+    """Dump YAML with the pure-Python dumper."""
+    benchmark.group = f"dump-yaml-{size}"
+    _ = benchmark(yaml.dump, _document(size))
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_dump_yaml_libyaml(benchmark: Any, size: int) -> None:
+    """Dump YAML with the libyaml dumper, when available."""
+    benchmark.group = f"dump-yaml-{size}"
+    _ = benchmark(utils.yaml_dump, _document(size))
@@ -0,0 +1,64 @@
+"""SOPSy set() latency: incremental update against full re-encryption."""
+
+from __future__ import annotations
+
+import hashlib
+from typing import TYPE_CHECKING
+from typing import Any
+
+from sopsy import native
+from sopsy import sopsy
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+SIZE = 1_000
+
+
+def test_set_native_incremental(benchmark: Any, sops_files: dict[int, Path]) -> None:
+    """Set one key with the native engine, only re-encrypting its value."""
+    benchmark.group = f"set-{SIZE}"
+    content = sops_files[SIZE].read_bytes()
+
+    def _set() -> bytes:
+        document = native.load_document(content, "json")
+        updated = native.update_document(document, [(["key0"], "new-value")])
+        return native.dump_document(updated, "json", like=content)
+
+    _ = benchmark(_set)
+
+
+def test_set_native_full(benchmark: Any, sops_files: dict[int, Path]) -> None:
+    """Set one key in-process with a decrypt-modify-encrypt cycle."""
+    benchmark.group = f"set-{SIZE}"
+    content = sops_files[SIZE].read_bytes()
+
+    def _set() -> bytes:
+        document = native.load_document(content, "json")
+        tree = native.decrypt_document(document)
+        tree["key0"] = "new-value"
+        metadata = document["sops"]
+        data_key = native.unwrap_data_key(metadata, key_cache=native.data_key_cache)
+        digest = hashlib.sha512()
+        out: dict[str, Any] = {}
+        for key, value in tree.items():
+            digest.update(native.value_to_bytes(value))
+            out[key] = native.encrypt_value(value, data_key, f"{key}:")
+        out["sops"] = dict(metadata)
+        out["sops"]["mac"] = native.encrypt_value(
+            digest.hexdigest().upper(), data_key, metadata["lastmodified"]
+        )
+        return native.dump_document(out, "json", like=content)
+
+    _ = benchmark(_set)
+
+
+def test_set_binary(
+    benchmark: Any, sops_files: dict[int, Path], sops_binary: str, tmp_path: Path
+) -> None:
+    """Set one key with `sops set`."""
+    benchmark.group = f"set-{SIZE}"
+    sops_file = tmp_path / "secret.json"
+    _ = sops_file.write_bytes(sops_files[SIZE].read_bytes())
+    s = sopsy.Sops(sops_file, binary_path=sops_binary)
+    _ = benchmark(s.set, "key0", "new-value")
@@ -3,22 +3,142 @@
 SOPS binary must be installed and available in your `$PATH`.
 """
 
-from sopsy.errors import SopsyCommandFailedError
-from sopsy.errors import SopsyCommandNotFoundError
-from sopsy.errors import SopsyConfigNotFoundError
-from sopsy.errors import SopsyError
-from sopsy.errors import SopsyUnparsableOutpoutTypeError
-from sopsy.sopsy import Sops
-from sopsy.sopsy import SopsyInOutType
-from sopsy.sopsy import SopsyInputSource
+from __future__ import annotations
+
+import importlib
+from typing import TYPE_CHECKING
+from typing import Any
+
+if TYPE_CHECKING:
+    from sopsy.aio import AsyncSops
+    from sopsy.batch import SopsyBatchResult
+    from sopsy.batch import SopsyRotateSummary
+    from sopsy.batch import decrypt_many
+    from sopsy.batch import encrypt_many
+    from sopsy.batch import exec_many
+    from sopsy.batch import iter_many
+    from sopsy.batch import rotate_many
+    from sopsy.batch import rotate_tree
+    from sopsy.binary import SopsBinaryInfo
+    from sopsy.binary import binary_info
+    from sopsy.cache import DecryptCache
+    from sopsy.config import SopsConfig
+    from sopsy.errors import SopsyCommandFailedError
+    from sopsy.errors import SopsyCommandNotFoundError
+    from sopsy.errors import SopsyConfigNotFoundError
+    from sopsy.errors import SopsyError
+    from sopsy.errors import SopsyNativeError
+    from sopsy.errors import SopsyTimeoutError
+    from sopsy.errors import SopsyUnparsableOutpoutTypeError
+    from sopsy.hooks import SopsLatency
+    from sopsy.hooks import SopsLatencyRecorder
+    from sopsy.hooks import SopsyEvent
+    from sopsy.hooks import add_hook
+    from sopsy.hooks import remove_hook
+    from sopsy.session import SopsSession
+    from sopsy.shared import SopsPreload
+    from sopsy.shared import preload
+    from sopsy.sopsy import Sops
+    from sopsy.sopsy import SopsyInOutType
+    from sopsy.sopsy import SopsyInputSource
+    from sopsy.store import SopsStore
+    from sopsy.utils import SopsyExecResult
+    from sopsy.utils import config_files
+    from sopsy.watch import SopsSnapshot
+    from sopsy.watch import SopsWatcher
+
+# public names and the module defining them, imported on first access so that
+# `import sopsy` stays cheap: yaml, subprocess, asyncio... are only loaded when used
+_EXPORTS = {
+    "AsyncSops": "sopsy.aio",
+    "DecryptCache": "sopsy.cache",
+    "Sops": "sopsy.sopsy",
+    "SopsBinaryInfo": "sopsy.binary",
+    "SopsConfig": "sopsy.config",
+    "SopsLatency": "sopsy.hooks",
+    "SopsLatencyRecorder": "sopsy.hooks",
+    "SopsPreload": "sopsy.shared",
+    "SopsSession": "sopsy.session",
+    "SopsSnapshot": "sopsy.watch",
+    "SopsStore": "sopsy.store",
+    "SopsWatcher": "sopsy.watch",
+    "SopsyBatchResult": "sopsy.batch",
+    "SopsyCommandFailedError": "sopsy.errors",
+    "SopsyCommandNotFoundError": "sopsy.errors",
+    "SopsyConfigNotFoundError": "sopsy.errors",
+    "SopsyError": "sopsy.errors",
+    "SopsyEvent": "sopsy.hooks",
+    "SopsyExecResult": "sopsy.utils",
+    "SopsyInOutType": "sopsy.sopsy",
+    "SopsyInputSource": "sopsy.sopsy",
+    "SopsyNativeError": "sopsy.errors",
+    "SopsyRotateSummary": "sopsy.batch",
+    "SopsyTimeoutError": "sopsy.errors",
+    "SopsyUnparsableOutpoutTypeError": "sopsy.errors",
+    "add_hook": "sopsy.hooks",
+    "binary_info": "sopsy.binary",
+    "config_files": "sopsy.utils",
+    "decrypt_many": "sopsy.batch",
+    "encrypt_many": "sopsy.batch",
+    "exec_many": "sopsy.batch",
+    "iter_many": "sopsy.batch",
+    "preload": "sopsy.shared",
+    "remove_hook": "sopsy.hooks",
+    "rotate_many": "sopsy.batch",
+    "rotate_tree": "sopsy.batch",
+}
 
 __all__ = [
+    "AsyncSops",
+    "DecryptCache",
     "Sops",
+    "SopsBinaryInfo",
+    "SopsConfig",
+    "SopsLatency",
+    "SopsLatencyRecorder",
+    "SopsPreload",
+    "SopsSession",
+    "SopsSnapshot",
+    "SopsStore",
+    "SopsWatcher",
+    "SopsyBatchResult",
     "SopsyCommandFailedError",
     "SopsyCommandNotFoundError",
     "SopsyConfigNotFoundError",
     "SopsyError",
+    "SopsyEvent",
+    "SopsyExecResult",
     "SopsyInOutType",
     "SopsyInputSource",
+    "SopsyNativeError",
+    "SopsyRotateSummary",
+    "SopsyTimeoutError",
     "SopsyUnparsableOutpoutTypeError",
+    "add_hook",
+    "binary_info",
+    "config_files",
+    "decrypt_many",
+    "encrypt_many",
+    "exec_many",
+    "iter_many",
+    "preload",
+    "remove_hook",
+    "rotate_many",
+    "rotate_tree",
 ]
+
+
+def __getattr__(name: str) -> Any:  # noqa: ANN401
+    """Import the public names from their module on first access."""
+    module = _EXPORTS.get(name)
+    if module is None:
+        msg = f"module {__name__!r} has no attribute {name!r}"
+        raise AttributeError(msg)
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    """List the public names, imported or not yet."""
+    return sorted({*globals(), *__all__})
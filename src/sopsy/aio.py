@@ -0,0 +1,512 @@
+"""SOPSy asyncio API."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import contextvars
+import functools
+import logging
+import os
+import signal
+import time
+import weakref
+from typing import TYPE_CHECKING
+from typing import Any
+from typing import Callable
+from typing import TypeVar
+
+from sopsy import hooks
+from sopsy.errors import SopsyCommandFailedError
+from sopsy.errors import SopsyTimeoutError
+from sopsy.sopsy import _MISSING
+from sopsy.sopsy import Sops
+from sopsy.sopsy import _export_environ
+from sopsy.utils import STREAM_CHUNK_SIZE
+from sopsy.utils import check_returncode
+from sopsy.utils import emit_cmd_event
+from sopsy.utils import is_transient_error
+from sopsy.utils import lookup_path
+from sopsy.utils import parse_output
+from sopsy.utils import parse_path
+from sopsy.utils import retry_delay
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from collections.abc import Sequence
+    from pathlib import Path
+    from typing import BinaryIO
+
+    from sopsy.utils import SopsyExecResult
+
+DEFAULT_MAX_CONCURRENCY = 16
+logger = logging.getLogger(__name__)
+
+_semaphores: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]
+_semaphores = weakref.WeakKeyDictionary()
+_T = TypeVar("_T")
+
+
+class AsyncSops(Sops):
+    """SOPS file object with non-blocking methods.
+
+    It accepts the same options as `Sops`, the `sops` commands are run with
+    `asyncio.create_subprocess_exec` so they do not block the event loop. The
+    native engine, and the methods writing files or running commands with their
+    own timeout (`set`, `update`, `exec_env`, `exec_file` and the `*_stream` ones),
+    run in the default executor instead; cancelling them does not stop the thread.
+
+    Attributes:
+        semaphore: Limit of sops commands running at the same time, shared by all
+            `AsyncSops` objects of the event loop by default.
+    """
+
+    def __init__(
+        self,
+        file: str | Path | bytes,
+        *,
+        timeout: float | None = None,
+        semaphore: asyncio.Semaphore | None = None,
+        **kwargs: Any,  # noqa: ANN401
+    ) -> None:
+        """Initialize async SOPS object.
+
+        Examples:
+            >>> from sopsy import AsyncSops
+            >>> sops = AsyncSops("secrets.json", timeout=10)
+            >>> await sops.get("hello")
+            'world'
+
+        Args:
+            file: Path to the SOPS file or content to encrypt/decrypt.
+            timeout: Default number of seconds after which a sops command is killed.
+            semaphore: Limit of sops commands running at the same time. If not set,
+                at most `DEFAULT_MAX_CONCURRENCY` commands run at the same time in
+                an event loop.
+            **kwargs: Same arguments as `Sops`.
+        """
+        super().__init__(file, timeout=timeout, **kwargs)
+        self.semaphore: asyncio.Semaphore | None = semaphore
+
+    async def decrypt(  # type: ignore[override]
+        self, *, to_dict: bool = True, timeout: float | None = None
+    ) -> str | bytes | dict[str, Any] | None:
+        """Decrypt SOPS file.
+
+        Args:
+            to_dict: Return the output as a Python dict.
+            timeout: Number of seconds after which the sops command is killed.
+
+        Returns:
+            The output of the sops command.
+        """
+        if self.native:
+            cache_key, out = await _to_thread(self._decrypt_local, to_dict=to_dict)
+        else:
+            cache_key, out = self._decrypt_local(to_dict=to_dict)
+        if out is None:
+            cmd, input_data = self._build_cmd("decrypt")
+            out = await self._run(cmd, to_dict, input_data, timeout)
+        self._cache_store(cache_key, out)
+        return out
+
+    async def encrypt(  # type: ignore[override]
+        self, *, to_dict: bool = True, timeout: float | None = None
+    ) -> str | bytes | dict[str, Any] | None:
+        """Encrypt SOPS file.
+
+        Args:
+            to_dict: Return the output as a Python dict.
+            timeout: Number of seconds after which the sops command is killed.
+
+        Returns:
+            The output of the sops command.
+        """
+        if self.native:
+            out = await _to_thread(self._native_encrypt, to_dict=to_dict)
+            if out is not _MISSING:
+                return out
+        cmd, input_data = self._build_cmd("encrypt")
+        return await self._run(cmd, to_dict, input_data, timeout)
+
+    async def rotate(  # type: ignore[override]
+        self, *, to_dict: bool = True, timeout: float | None = None
+    ) -> str | bytes | dict[str, Any] | None:
+        """Rotate encryption keys and re-encrypt values from SOPS file.
+
+        Args:
+            to_dict: Return the output as a Python dict.
+            timeout: Number of seconds after which the sops command is killed.
+
+        Returns:
+            The output of the sops command.
+        """
+        cmd = [str(self.bin), *self.config, "rotate", *self.global_args, str(self.file)]
+        return await self._run(cmd, to_dict, None, timeout)
+
+    async def get(  # type: ignore[override]
+        self,
+        key: str,
+        *,
+        default: Any = None,  # noqa: ANN401
+        verify_mac: bool = False,
+        timeout: float | None = None,
+    ) -> Any:  # noqa: ANN401
+        """Get a specific key from a SOPS encrypted file.
+
+        Args:
+            key: The key to fetch in the SOPS file content.
+            default: A default value in case the key does not exist or is empty.
+            verify_mac: Check the file integrity with the native engine.
+            timeout: Number of seconds after which the sops command is killed.
+
+        Returns:
+            The value of the given key, or the default value.
+        """
+        return await self.get_path(
+            [key], default=default, verify_mac=verify_mac, timeout=timeout
+        )
+
+    async def get_path(  # type: ignore[override]
+        self,
+        path: str | list[str | int],
+        *,
+        default: Any = None,  # noqa: ANN401
+        verify_mac: bool = False,
+        timeout: float | None = None,
+    ) -> Any:  # noqa: ANN401
+        """Get a nested value from a SOPS encrypted file.
+
+        Args:
+            path: Dotted path (`a.b.0`), JSON pointer (`/a/b/0`) or list of keys.
+            default: A default value in case the path does not exist or is empty.
+            verify_mac: Check the file integrity with the native engine.
+            timeout: Number of seconds after which the sops command is killed.
+
+        Returns:
+            The value found at the given path, or the default value.
+        """
+        components = parse_path(path)
+        value = _MISSING
+        if self.native and self.cache is None and self._preloaded() is None:
+            try:
+                value = await _to_thread(
+                    self._native_get_path, components, verify_mac=verify_mac
+                )
+            except KeyError:
+                return default
+        if value is _MISSING:
+            try:
+                data = await self.decrypt(timeout=timeout)
+                value = lookup_path(data, components)[0]
+            except KeyError:
+                return default
+        return value or default
+
+    async def as_environ(self, *, overwrite: bool = True) -> dict[str, str]:  # type: ignore[override]
+        """Decrypt SOPS file and export its top-level values to `os.environ`.
+
+        Args:
+            overwrite: Replace the variables already set in the environment.
+
+        Returns:
+            The variables set in the environment.
+
+        Raises:
+            SopsyError: A value is a mapping or a list.
+        """
+        return _export_environ(await self.decrypt(), overwrite=overwrite)
+
+    async def decrypt_stream(  # type: ignore[override]
+        self,
+        src: BinaryIO | Iterable[bytes] | None,
+        dst: BinaryIO,
+        *,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+        timeout: float | None = None,
+    ) -> int:
+        """Decrypt SOPS content, streaming it in fixed-size buffers.
+
+        Args:
+            src: Binary file-like object or iterable of bytes chunks to decrypt. If not
+                set, the SOPS file, or the content given with a stdin input source,
+                is decrypted.
+            dst: Binary file-like object the decrypted content is written to.
+            chunk_size: Size of the buffers, in bytes.
+            timeout: Number of seconds after which the sops command is killed.
+
+        Returns:
+            The number of bytes written to `dst`.
+        """
+        return await self._in_thread(
+            super().decrypt_stream, src, dst, chunk_size=chunk_size, timeout=timeout
+        )
+
+    async def encrypt_stream(  # type: ignore[override]
+        self,
+        src: BinaryIO | Iterable[bytes] | None,
+        dst: BinaryIO,
+        *,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+        timeout: float | None = None,
+    ) -> int:
+        """Encrypt content, streaming it in fixed-size buffers.
+
+        Args:
+            src: Binary file-like object or iterable of bytes chunks to encrypt. If not
+                set, the SOPS file, or the content given with a stdin input source,
+                is encrypted.
+            dst: Binary file-like object the encrypted content is written to.
+            chunk_size: Size of the buffers, in bytes.
+            timeout: Number of seconds after which the sops command is killed.
+
+        Returns:
+            The number of bytes written to `dst`.
+        """
+        return await self._in_thread(
+            super().encrypt_stream, src, dst, chunk_size=chunk_size, timeout=timeout
+        )
+
+    async def exec_env(  # type: ignore[override]
+        self,
+        command: str | Sequence[str],
+        *,
+        pristine: bool = False,
+        user: str | None = None,
+        timeout: float | None = None,
+        capture_output: bool = False,
+    ) -> SopsyExecResult:
+        """Run a command with the decrypted top-level values in its environment.
+
+        Args:
+            command: The command, run by a shell if it is a string.
+            pristine: Do not inherit the environment of this process.
+            user: Run the command as this user.
+            timeout: Number of seconds after which the command is terminated.
+            capture_output: Capture the command output instead of inheriting the
+                standard output and error of this process.
+
+        Returns:
+            The exit status and timings of the command.
+        """
+        return await self._in_thread(
+            super().exec_env,
+            command,
+            pristine=pristine,
+            user=user,
+            timeout=timeout,
+            capture_output=capture_output,
+        )
+
+    async def exec_file(  # type: ignore[override]
+        self,
+        command: str | Sequence[str],
+        *,
+        fifo: bool = True,
+        filename: str | None = None,
+        user: str | None = None,
+        timeout: float | None = None,
+        capture_output: bool = False,
+    ) -> SopsyExecResult:
+        """Run a command reading the decrypted content from a file.
+
+        Args:
+            command: The command, run by a shell if it is a string.
+            fifo: Pass the content through a FIFO, read once. Otherwise it is written
+                to a temporary file removed when the command exits.
+            filename: Name of the file, to give it an extension the command expects.
+            user: Run the command as this user.
+            timeout: Number of seconds after which the command is terminated.
+            capture_output: Capture the command output instead of inheriting the
+                standard output and error of this process.
+
+        Returns:
+            The exit status and timings of the command.
+        """
+        return await self._in_thread(
+            super().exec_file,
+            command,
+            fifo=fifo,
+            filename=filename,
+            user=user,
+            timeout=timeout,
+            capture_output=capture_output,
+        )
+
+    async def set(  # type: ignore[override]
+        self,
+        key: str | tuple[str | int, ...],
+        value: Any,  # noqa: ANN401
+    ) -> None:
+        """Set a value in the SOPS file, see `update()`.
+
+        Args:
+            key: The key to set, or a tuple of keys (and list indexes) leading to it.
+            value: The value to set.
+        """
+        await self.update({key: value})
+
+    async def update(  # type: ignore[override]
+        self, mapping: dict[str | tuple[str | int, ...], Any]
+    ) -> None:
+        """Set several values in the SOPS file, see `Sops.update()`.
+
+        Args:
+            mapping: Keys, or tuples of keys (and list indexes) leading to them, and
+                the values to set.
+        """
+        await self._in_thread(super().update, mapping)
+
+    async def _in_thread(
+        self,
+        func: Callable[..., _T],
+        *args: Any,  # noqa: ANN401
+        **kwargs: Any,  # noqa: ANN401
+    ) -> _T:
+        """Run a blocking method in the default executor, once a slot is available."""
+        async with self.semaphore or _default_semaphore():
+            return await _to_thread(func, *args, **kwargs)
+
+    async def _run(
+        self,
+        cmd: list[str],
+        to_dict: bool,  # noqa: FBT001
+        input_data: str | bytes | None,
+        timeout: float | None,
+    ) -> str | bytes | dict[str, Any] | None:
+        """Run the sops command once a slot is available, retrying transient errors."""
+        if timeout is None:
+            timeout = self.timeout
+        semaphore = self.semaphore or _default_semaphore()
+        attempt = 1
+        while True:
+            try:
+                async with semaphore:
+                    return await arun_cmd(
+                        cmd,
+                        to_dict=to_dict,
+                        input_data=input_data,
+                        timeout=timeout,
+                        file=self._event_file(),
+                        attempt=attempt,
+                    )
+            except SopsyCommandFailedError as err:  # noqa: PERF203
+                if (
+                    isinstance(err, SopsyTimeoutError)
+                    or attempt > self.retries
+                    or not is_transient_error(str(err))
+                ):
+                    raise
+                delay = retry_delay(attempt)
+                logger.warning(
+                    "sops command failed with a transient error, retry %d of %d in "
+                    "%.2f seconds: %s",
+                    attempt,
+                    self.retries,
+                    delay,
+                    err,
+                )
+                await asyncio.sleep(delay)
+                attempt += 1
+
+
+async def arun_cmd(
+    cmd: list[str],
+    *,
+    to_dict: bool,
+    input_data: str | bytes | None = None,
+    timeout: float | None = None,
+    file: str | None = None,
+    attempt: int = 1,
+) -> str | bytes | dict[str, Any] | None:
+    """Run the given SOPS command without blocking the event loop.
+
+    The process is killed if it does not complete in time or if the calling task
+    is cancelled, along with the processes it started when there is a timeout.
+    """
+    logger.debug("arun_cmd: %s", cmd)
+    started = time.time()
+    start = spawned = waited = time.perf_counter()
+    proc: asyncio.subprocess.Process | None = None
+    stdout = b""
+    error: BaseException | None = None
+    # a process group of its own, to kill the processes sops started on timeout
+    group = timeout is not None and os.name == "posix"
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.PIPE if input_data is not None else None,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=group,
+        )
+        spawned = time.perf_counter()
+        stdout, stderr = await _communicate(proc, input_data, timeout, group=group)
+        waited = time.perf_counter()
+        check_returncode(proc.returncode or 0, stderr)
+        out: str | bytes = stdout.decode() if isinstance(input_data, str) else stdout
+        return parse_output(cmd, out, to_dict=to_dict)
+    except BaseException as err:
+        error = err
+        raise
+    finally:
+        if hooks.enabled():
+            emit_cmd_event(
+                cmd,
+                file,
+                (started, start, spawned, waited),
+                bytes_in=len(input_data or b""),
+                bytes_out=len(stdout),
+                exit_code=None if proc is None else proc.returncode,
+                error=error,
+                attempt=attempt,
+            )
+
+
+async def _communicate(
+    proc: asyncio.subprocess.Process,
+    input_data: str | bytes | None,
+    timeout: float | None,
+    *,
+    group: bool,
+) -> tuple[bytes, bytes]:
+    """Exchange data with the process, killing it on timeout or cancellation."""
+    data = input_data.encode() if isinstance(input_data, str) else input_data
+    try:
+        return await asyncio.wait_for(proc.communicate(data), timeout)
+    except asyncio.TimeoutError as err:
+        await _kill(proc, group=group)
+        msg = f"sops command timed out after {timeout} seconds"
+        raise SopsyTimeoutError(msg) from err
+    except asyncio.CancelledError:
+        await _kill(proc, group=group)
+        raise
+
+
+async def _kill(proc: asyncio.subprocess.Process, *, group: bool) -> None:
+    if proc.returncode is None:
+        if group:
+            with contextlib.suppress(ProcessLookupError):
+                os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+        _ = await asyncio.shield(proc.wait())
+
+
+async def _to_thread(
+    func: Callable[..., _T],
+    *args: Any,  # noqa: ANN401
+    **kwargs: Any,  # noqa: ANN401
+) -> _T:
+    """Run a blocking function in the default executor, like `asyncio.to_thread`."""
+    loop = asyncio.get_running_loop()
+    call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+    return await loop.run_in_executor(None, call)
+
+
+def _default_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(DEFAULT_MAX_CONCURRENCY)
+    return semaphore
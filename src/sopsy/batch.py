@@ -0,0 +1,409 @@
+"""SOPSy batch operations over many files."""
+
+from __future__ import annotations
+
+import time
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
+from dataclasses import dataclass
+from dataclasses import field
+from datetime import datetime
+from datetime import timezone
+from pathlib import Path
+from typing import TYPE_CHECKING
+from typing import Any
+from typing import Callable
+
+from sopsy.errors import SopsyError
+from sopsy.sopsy import Sops
+from sopsy.utils import atomic_write
+from sopsy.utils import get_dict
+from sopsy.utils import output_type_of
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from collections.abc import Iterator
+    from collections.abc import Sequence
+
+    from sopsy.utils import SopsyExecResult
+
+DEFAULT_TREE_PATTERN = "**/*.enc.*"
+OPERATIONS = ("decrypt", "encrypt", "rotate")
+EXEC_MODES = ("env", "file")
+
+
+@dataclass(frozen=True)
+class SopsyBatchResult:
+    """Result of a SOPS operation on one file of a batch.
+
+    Attributes:
+        file: Path to the SOPS file.
+        output: The output of the sops command, if it succeeded.
+        error: The error raised by the sops command, if it failed.
+        elapsed: Wall time spent on this file, in seconds.
+        skipped: Whether the file was skipped by a rotation as recent enough.
+    """
+
+    file: str | Path
+    output: str | bytes | dict[str, Any] | None = None
+    error: SopsyError | None = None
+    elapsed: float = 0.0
+    skipped: bool = False
+
+    @property
+    def ok(self) -> bool:
+        """Tell if the operation succeeded."""
+        return self.error is None
+
+
+@dataclass(frozen=True)
+class SopsyRotateSummary:
+    """Summary of the rotation of a directory tree.
+
+    Attributes:
+        results: The result of each file, in completion order.
+        elapsed: Wall time spent on the whole tree, in seconds.
+    """
+
+    results: list[SopsyBatchResult] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def rotated(self) -> list[SopsyBatchResult]:
+        """Return the results of the rotated files."""
+        return [r for r in self.results if r.ok and not r.skipped]
+
+    @property
+    def skipped(self) -> list[SopsyBatchResult]:
+        """Return the results of the files skipped as recent enough."""
+        return [r for r in self.results if r.skipped]
+
+    @property
+    def failed(self) -> list[SopsyBatchResult]:
+        """Return the results of the files that could not be rotated."""
+        return [r for r in self.results if not r.ok]
+
+    @property
+    def files_per_second(self) -> float:
+        """Return the rotation throughput."""
+        return len(self.rotated) / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self) -> str:
+        """Return a human readable summary."""
+        lines = [
+            f"rotated {len(self.rotated)} file(s), skipped {len(self.skipped)}, "
+            f"failed {len(self.failed)} in {self.elapsed:.2f}s "
+            f"({self.files_per_second:.1f} files/s)"
+        ]
+        lines.extend(f"  {r.file}: {str(r.error).strip()}" for r in self.failed)
+        return "\n".join(lines)
+
+
+def decrypt_many(
+    files: Iterable[str | Path],
+    *,
+    max_workers: int | None = None,
+    to_dict: bool = True,
+    **sops_kwargs: Any,  # noqa: ANN401
+) -> list[SopsyBatchResult]:
+    """Decrypt many SOPS files concurrently.
+
+    Examples:
+        >>> from sopsy import decrypt_many
+        >>> results = decrypt_many(["a.json", "b.json"], max_workers=8)
+        >>> [r.output for r in results if r.ok]
+        [{'hello': 'world'}, {'foo': 'bar'}]
+
+    Args:
+        files: Paths to the SOPS files.
+        max_workers: Maximum number of sops commands running at the same time.
+        to_dict: Return the outputs as Python dicts.
+        **sops_kwargs: Arguments passed to each `Sops` object.
+
+    Returns:
+        The results, in the same order as the given files. A failure on one file
+        does not stop the others, its error is set on its result.
+    """
+    return _run_many("decrypt", files, max_workers, to_dict, sops_kwargs)
+
+
+def encrypt_many(
+    files: Iterable[str | Path],
+    *,
+    max_workers: int | None = None,
+    to_dict: bool = True,
+    **sops_kwargs: Any,  # noqa: ANN401
+) -> list[SopsyBatchResult]:
+    """Encrypt many SOPS files concurrently.
+
+    Args:
+        files: Paths to the SOPS files.
+        max_workers: Maximum number of sops commands running at the same time.
+        to_dict: Return the outputs as Python dicts.
+        **sops_kwargs: Arguments passed to each `Sops` object.
+
+    Returns:
+        The results, in the same order as the given files.
+    """
+    return _run_many("encrypt", files, max_workers, to_dict, sops_kwargs)
+
+
+def rotate_many(
+    files: Iterable[str | Path],
+    *,
+    max_workers: int | None = None,
+    to_dict: bool = True,
+    **sops_kwargs: Any,  # noqa: ANN401
+) -> list[SopsyBatchResult]:
+    """Rotate many SOPS files concurrently.
+
+    Args:
+        files: Paths to the SOPS files.
+        max_workers: Maximum number of sops commands running at the same time.
+        to_dict: Return the outputs as Python dicts.
+        **sops_kwargs: Arguments passed to each `Sops` object.
+
+    Returns:
+        The results, in the same order as the given files.
+    """
+    return _run_many("rotate", files, max_workers, to_dict, sops_kwargs)
+
+
+def iter_many(
+    operation: str,
+    files: Iterable[str | Path],
+    *,
+    max_workers: int | None = None,
+    to_dict: bool = True,
+    **sops_kwargs: Any,  # noqa: ANN401
+) -> Iterator[SopsyBatchResult]:
+    """Run a SOPS operation on many files concurrently, yield results as they come.
+
+    Examples:
+        >>> from sopsy import iter_many
+        >>> for result in iter_many("decrypt", ["a.json", "b.json"]):
+        >>>     print(result.file, result.elapsed)
+
+    Args:
+        operation: One of `decrypt`, `encrypt` or `rotate`.
+        files: Paths to the SOPS files.
+        max_workers: Maximum number of sops commands running at the same time.
+        to_dict: Return the outputs as Python dicts.
+        **sops_kwargs: Arguments passed to each `Sops` object.
+
+    Yields:
+        The results, in completion order.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = _submit(executor, operation, files, to_dict, sops_kwargs)
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # the caller may stop iterating early
+            for future in futures:
+                _ = future.cancel()
+
+
+def exec_many(
+    jobs: Iterable[tuple[str | Path, str | Sequence[str]]],
+    *,
+    mode: str = "env",
+    max_workers: int | None = None,
+    timeout: float | None = None,
+    capture_output: bool = False,
+    **sops_kwargs: Any,  # noqa: ANN401
+) -> list[SopsyExecResult]:
+    """Run many commands concurrently, each with the secrets of a SOPS file.
+
+    Each command is run by `sops exec-env` or `sops exec-file`, so the secrets are
+    never decrypted in this process.
+
+    Examples:
+        >>> from sopsy import exec_many
+        >>> jobs = [("worker.env", ["./worker", str(shard)]) for shard in range(8)]
+        >>> results = exec_many(jobs, max_workers=8, timeout=600)
+        >>> [(r.returncode, r.elapsed) for r in results]
+        [(0, 41.2), (0, 39.8), ...]
+
+    Args:
+        jobs: Pairs of SOPS file path and command.
+        mode: `env` to pass the secrets through the environment, `file` through a
+            file whose path replaces `{}` in the command.
+        max_workers: Maximum number of commands running at the same time.
+        timeout: Number of seconds after which a command is terminated.
+        capture_output: Capture the output of the commands.
+        **sops_kwargs: Arguments passed to each `Sops` object.
+
+    Returns:
+        The results, in the same order as the given jobs.
+
+    Raises:
+        SopsyError: The mode is unknown.
+    """
+    if mode not in EXEC_MODES:
+        msg = f"unsupported mode '{mode}', expected one of {EXEC_MODES}"
+        raise SopsyError(msg)
+
+    def _exec(file: str | Path, command: str | Sequence[str]) -> SopsyExecResult:
+        sops = Sops(file, **sops_kwargs)
+        run = sops.exec_env if mode == "env" else sops.exec_file
+        return run(command, timeout=timeout, capture_output=capture_output)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_exec, file, command) for file, command in jobs]
+        return [future.result() for future in futures]
+
+
+def rotate_tree(
+    root: str | Path,
+    pattern: str = DEFAULT_TREE_PATTERN,
+    *,
+    max_workers: int | None = None,
+    modified_before: datetime | None = None,
+    progress: Callable[[SopsyBatchResult], None] | None = None,
+    **sops_kwargs: Any,  # noqa: ANN401
+) -> SopsyRotateSummary:
+    """Rotate the keys of all SOPS files of a directory tree concurrently.
+
+    Each file is rotated to a temporary file next to it, then renamed over it, so an
+    interrupted run never leaves a partially written file.
+
+    Examples:
+        >>> from datetime import datetime, timezone
+        >>> from sopsy import rotate_tree
+        >>> summary = rotate_tree(
+        >>>     "secrets/",
+        >>>     max_workers=16,
+        >>>     modified_before=datetime(2024, 10, 1, tzinfo=timezone.utc),
+        >>> )
+        >>> print(summary)
+        rotated 498 file(s), skipped 0, failed 2 in 12.31s (40.5 files/s)
+          secrets/a.enc.json: ...
+          secrets/b.enc.yaml: ...
+
+    Args:
+        root: Directory to search the SOPS files in.
+        pattern: Glob pattern of the SOPS files, relative to `root`.
+        max_workers: Maximum number of sops commands running at the same time.
+        modified_before: Skip the files whose `sops.lastmodified` is after this
+            date, they were already rotated. Naive dates are taken as UTC.
+        progress: Called with the result of each file as soon as it is done.
+        **sops_kwargs: Arguments passed to each `Sops` object.
+
+    Returns:
+        The summary of the rotation.
+    """
+    start = time.perf_counter()
+    files = sorted(p for p in Path(root).glob(pattern) if p.is_file())
+    cutoff = _as_utc(modified_before) if modified_before else None
+    results = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(_rotate_file, file, cutoff, sops_kwargs) for file in files
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if progress is not None:
+                progress(result)
+    return SopsyRotateSummary(results, time.perf_counter() - start)
+
+
+def sops_lastmodified(file: str | Path) -> datetime | None:
+    """Return the `sops.lastmodified` date of a SOPS file, or None if unknown."""
+    path = Path(file)
+    data = path.read_bytes()
+    output_type = output_type_of([str(path)])
+    try:
+        document = get_dict(data, output_type=output_type)
+    except SopsyError:
+        return None
+    if not isinstance(document, dict):
+        return None
+    if output_type == "dotenv":
+        value = document.get("sops_lastmodified")
+    else:
+        metadata = document.get("sops")
+        value = metadata.get("lastmodified") if isinstance(metadata, dict) else None
+    if isinstance(value, datetime):
+        # unquoted YAML timestamps are parsed by PyYAML
+        return _as_utc(value)
+    if not isinstance(value, str):
+        return None
+    try:
+        return _as_utc(datetime.fromisoformat(value.replace("Z", "+00:00")))
+    except ValueError:
+        return None
+
+
+def _rotate_file(
+    file: Path, cutoff: datetime | None, sops_kwargs: dict[str, Any]
+) -> SopsyBatchResult:
+    start = time.perf_counter()
+    try:
+        if cutoff is not None:
+            lastmodified = sops_lastmodified(file)
+            if lastmodified is not None and lastmodified > cutoff:
+                return SopsyBatchResult(
+                    file, skipped=True, elapsed=time.perf_counter() - start
+                )
+        out = Sops(file, **sops_kwargs).rotate(to_dict=False)
+        if isinstance(out, str):
+            out = out.encode()
+        if isinstance(out, bytes):
+            # nothing to write when sops already did, e.g. with `in_place`
+            atomic_write(file, out)
+    except (OSError, SopsyError) as err:
+        error = err if isinstance(err, SopsyError) else SopsyError(str(err))
+        return SopsyBatchResult(file, error=error, elapsed=time.perf_counter() - start)
+    return SopsyBatchResult(file, elapsed=time.perf_counter() - start)
+
+
+def _as_utc(date: datetime) -> datetime:
+    return date.replace(tzinfo=timezone.utc) if date.tzinfo is None else date
+
+
+def _run_many(
+    operation: str,
+    files: Iterable[str | Path],
+    max_workers: int | None,
+    to_dict: bool,  # noqa: FBT001
+    sops_kwargs: dict[str, Any],
+) -> list[SopsyBatchResult]:
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = _submit(executor, operation, files, to_dict, sops_kwargs)
+        return [future.result() for future in futures]
+
+
+def _submit(
+    executor: ThreadPoolExecutor,
+    operation: str,
+    files: Iterable[str | Path],
+    to_dict: bool,  # noqa: FBT001
+    sops_kwargs: dict[str, Any],
+) -> list[Future[SopsyBatchResult]]:
+    if operation not in OPERATIONS:
+        msg = f"unsupported operation '{operation}', expected one of {OPERATIONS}"
+        raise SopsyError(msg)
+    return [
+        executor.submit(_run_one, operation, file, to_dict, sops_kwargs)
+        for file in files
+    ]
+
+
+def _run_one(
+    operation: str,
+    file: str | Path,
+    to_dict: bool,  # noqa: FBT001
+    sops_kwargs: dict[str, Any],
+) -> SopsyBatchResult:
+    start = time.perf_counter()
+    try:
+        sops = Sops(file, **sops_kwargs)
+        output = getattr(sops, operation)(to_dict=to_dict)
+    except (OSError, SopsyError) as err:
+        error = err if isinstance(err, SopsyError) else SopsyError(str(err))
+        return SopsyBatchResult(file, error=error, elapsed=time.perf_counter() - start)
+    return SopsyBatchResult(file, output=output, elapsed=time.perf_counter() - start)
@@ -0,0 +1,178 @@
+"""SOPSy sops binary resolution."""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+from dataclasses import dataclass
+from dataclasses import field
+from pathlib import Path
+
+from sopsy.errors import SopsyCommandNotFoundError
+from sopsy.errors import SopsyError
+
+DEFAULT_BINARY = "sops"
+PROBE_TIMEOUT = 10.0
+# sops subcommands and their options, with the sops version that introduced them
+FEATURES = {
+    "decrypt --extract": (3, 9, 0),
+    "edit": (3, 9, 0),
+    "set --value-stdin": (3, 9, 0),
+}
+logger = logging.getLogger(__name__)
+
+_VERSION_RE = re.compile(r"sops (\d+)\.(\d+)\.(\d+)")
+_COMMAND_RE = re.compile(r"^\s+([a-z][a-z0-9-]*)(?:,\s*[a-z0-9-]+)*\s{2,}\S")
+
+_binary_lock = threading.Lock()
+_binary_paths: dict[tuple[str, str], Path] = {}
+_binary_infos: dict[tuple[Path, int], SopsBinaryInfo] = {}
+
+
+@dataclass(frozen=True)
+class SopsBinaryInfo:
+    """Description of a sops binary.
+
+    Attributes:
+        path: Absolute path to the sops binary.
+        version: Version of the sops binary, `None` when it could not be probed.
+        subcommands: Names of the subcommands supported by the sops binary.
+    """
+
+    path: Path
+    version: tuple[int, int, int] | None = None
+    subcommands: frozenset[str] = field(default_factory=frozenset)
+
+    def supports(self, feature: str) -> bool:
+        """Tell if the sops binary supports a subcommand, or one of `FEATURES`.
+
+        What could not be probed is assumed to be supported, sops tells otherwise.
+        """
+        subcommand = feature.split()[0]
+        if self.subcommands and subcommand not in self.subcommands:
+            return False
+        minimum = FEATURES.get(feature)
+        return minimum is None or self.version is None or self.version >= minimum
+
+    def require(self, feature: str) -> None:
+        """Raise an error if the sops binary does not support the given feature.
+
+        Raises:
+            SopsyError: The feature is not supported.
+        """
+        if self.supports(feature):
+            return
+        version = ".".join(map(str, self.version)) if self.version else "unknown"
+        msg = f"sops {version} at {self.path} does not support {feature}"
+        if feature in FEATURES:
+            msg += f", sops >= {'.'.join(map(str, FEATURES[feature]))} is required"
+        raise SopsyError(msg)
+
+
+def resolve_binary(binary: str | Path = DEFAULT_BINARY) -> Path | None:
+    """Return the absolute path of the given sops binary, or None if not found.
+
+    The lookup is done once per binary name and `$PATH` value.
+    """
+    key = (str(binary), os.environ.get("PATH", ""))
+    with _binary_lock:
+        path = _binary_paths.get(key)
+    if path is not None:
+        return path
+    import shutil  # noqa: PLC0415
+
+    found = shutil.which(binary)
+    if not found:
+        return None
+    path = Path(found).absolute()
+    with _binary_lock:
+        _binary_paths[key] = path
+    return path
+
+
+def binary_info(binary: str | Path = DEFAULT_BINARY) -> SopsBinaryInfo:
+    """Return the description of the given sops binary.
+
+    The binary is probed once, and again only if it is modified.
+
+    Examples:
+        >>> from sopsy import binary_info
+        >>> info = binary_info()
+        >>> info.version
+        (3, 9, 1)
+        >>> info.supports("exec-env")
+        True
+
+    Args:
+        binary: Name of, or path to, the sops binary.
+
+    Returns:
+        The sops binary description.
+
+    Raises:
+        SopsyCommandNotFoundError: The sops binary could not be found.
+    """
+    path = resolve_binary(binary)
+    if path is None:
+        msg = f"{binary} command not found"
+        raise SopsyCommandNotFoundError(msg)
+    try:
+        key = (path, path.stat().st_mtime_ns)
+    except OSError:
+        key = (path, 0)
+    with _binary_lock:
+        info = _binary_infos.get(key)
+    if info is None:
+        info = _probe(path)
+        with _binary_lock:
+            _binary_infos[key] = info
+    return info
+
+
+def clear_binary_cache() -> None:
+    """Forget the sops binaries resolved and probed so far."""
+    with _binary_lock:
+        _binary_paths.clear()
+        _binary_infos.clear()
+
+
+def _probe(path: Path) -> SopsBinaryInfo:
+    # older sops versions query GitHub for the latest release unless told not to
+    env = {**os.environ, "SOPS_DISABLE_VERSION_CHECK": "true"}
+    version = None
+    match = _VERSION_RE.search(_probe_output([str(path), "--version"], env))
+    if match:
+        major, minor, patch = (int(g) for g in match.groups())
+        version = (major, minor, patch)
+    subcommands = set()
+    in_commands = False
+    for line in _probe_output([str(path), "--help"], env).splitlines():
+        if line.strip().upper() == "COMMANDS:":
+            in_commands = True
+        elif in_commands and (not line.strip() or not line[0].isspace()):
+            break
+        elif in_commands and (match := _COMMAND_RE.match(line)):
+            subcommands.add(match.group(1))
+    subcommands.discard("help")
+    return SopsBinaryInfo(path, version, frozenset(subcommands))
+
+
+def _probe_output(cmd: list[str], env: dict[str, str]) -> str:
+    import subprocess  # noqa: PLC0415
+
+    try:
+        proc = subprocess.run(  # noqa: S603
+            cmd,
+            capture_output=True,
+            check=False,
+            env=env,
+            stdin=subprocess.DEVNULL,
+            text=True,
+            timeout=PROBE_TIMEOUT,
+        )
+    except (OSError, subprocess.TimeoutExpired) as err:
+        logger.debug("could not probe %s: %s", cmd, err)
+        return ""
+    return proc.stdout
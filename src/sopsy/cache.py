@@ -0,0 +1,171 @@
+"""SOPSy in-memory caches."""
+
+from __future__ import annotations
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+from typing import Generic
+from typing import Hashable
+from typing import TypeVar
+
+V = TypeVar("V")
+
+DEFAULT_MAXSIZE = 128
+
+
+class LRUCache(Generic[V]):
+    """Thread-safe LRU cache with optional TTL.
+
+    Nothing is ever written to disk, entries only live in the current process.
+
+    Attributes:
+        maxsize: Maximum number of entries kept, least recently used ones are evicted
+            first.
+        ttl: Number of seconds an entry stays valid, `None` means forever.
+        hits: Number of lookups that found a valid entry.
+        misses: Number of lookups that did not find a valid entry.
+    """
+
+    def __init__(
+        self, *, maxsize: int = DEFAULT_MAXSIZE, ttl: float | None = None
+    ) -> None:
+        """Initialize cache object.
+
+        Args:
+            maxsize: Maximum number of entries kept.
+            ttl: Number of seconds an entry stays valid, `None` means forever.
+        """
+        self.maxsize: int = maxsize
+        self.ttl: float | None = ttl
+        self.hits: int = 0
+        self.misses: int = 0
+        self._data: OrderedDict[Hashable, tuple[float, V]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Return the number of entries currently stored."""
+        return len(self._data)
+
+    def get(self, key: Hashable) -> V | None:
+        """Return the value stored for the given key, or None."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                self._discard(value)
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: V) -> None:
+        """Store a value, evicting the least recently used entries if needed."""
+        expires = time.monotonic() + self.ttl if self.ttl is not None else float("inf")
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None and old[1] is not value:
+                self._discard(old[1])
+            self._data[key] = (expires, value)
+            while len(self._data) > self.maxsize:
+                _, (_, evicted) = self._data.popitem(last=False)
+                self._discard(evicted)
+
+    def pop(self, key: Hashable) -> None:
+        """Remove the entry stored for the given key, if any."""
+        with self._lock:
+            item = self._data.pop(key, None)
+            if item is not None:
+                self._discard(item[1])
+
+    def clear(self) -> None:
+        """Remove all entries and reset counters."""
+        with self._lock:
+            for _, value in self._data.values():
+                self._discard(value)
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def _discard(self, value: V) -> None:
+        """Release an evicted value, called with the lock held."""
+
+
+class DecryptCache(LRUCache[Any]):
+    """Cache of decrypted SOPS documents.
+
+    Entries are keyed on the file identity (resolved path, mtime, size and inode) and
+    on everything that shapes the `sops` output, so a modified file is never served
+    from the cache. A single instance can be shared by several `Sops` objects.
+
+    Examples:
+        >>> from sopsy import DecryptCache, Sops
+        >>> cache = DecryptCache(maxsize=32, ttl=300)
+        >>> Sops("secrets.json", cache=cache).get("hello")
+        'world'
+        >>> Sops("secrets.json", cache=cache).get("hello")
+        'world'
+        >>> cache.hits, cache.misses
+        (1, 1)
+    """
+
+    def get(self, key: Hashable) -> Any:  # noqa: ANN401
+        """Return a copy of the document stored for the given key, or None."""
+        return copy.deepcopy(super().get(key))
+
+    def set(self, key: Hashable, value: Any) -> None:  # noqa: ANN401
+        """Store a copy of the given document."""
+        super().set(key, copy.deepcopy(value))
+
+    def invalidate(self, file: str | Path) -> None:
+        """Remove all entries related to the given file."""
+        path = str(Path(file).resolve())
+        with self._lock:
+            for key in [k for k in self._data if _key_path(k) == path]:
+                del self._data[key]
+
+
+class DataKeyCache(LRUCache[bytearray]):
+    """Cache of unwrapped SOPS data keys, used by the native engine.
+
+    Keys are overwritten with zeros when they are evicted, expired or cleared.
+    """
+
+    def _discard(self, value: bytearray) -> None:
+        value[:] = bytes(len(value))
+
+
+def stat_signature(file: str | Path) -> tuple[int, int, int]:
+    """Return the modification time, size and inode of a file.
+
+    Raises:
+        OSError: The file cannot be stat'ed.
+    """
+    stat = Path(file).stat()
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+def file_signature(file: str | Path) -> tuple[int, int, int] | None:
+    """Return the `stat_signature()` of a file, or None if it cannot be stat'ed."""
+    try:
+        return stat_signature(file)
+    except OSError:
+        return None
+
+
+def file_key(file: str | Path, *args: Hashable) -> tuple[Hashable, ...]:
+    """Build a cache key from a file identity and extra hashable arguments."""
+    path = Path(file).resolve()
+    return (str(path), *stat_signature(path), *args)
+
+
+def _key_path(key: Hashable) -> Any:  # noqa: ANN401
+    return key[0] if isinstance(key, tuple) and key else None
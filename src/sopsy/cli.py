@@ -0,0 +1,96 @@
+"""SOPSy command line interface."""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from datetime import datetime
+from datetime import timezone
+from typing import TYPE_CHECKING
+
+from sopsy.batch import DEFAULT_TREE_PATTERN
+from sopsy.batch import SopsyBatchResult
+from sopsy.batch import rotate_tree
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Run the `sopsy` command.
+
+    Examples:
+        $ sopsy rotate secrets/ --workers 16 --modified-before 2024-10-01
+
+    Args:
+        argv: Command line arguments, `sys.argv` ones by default.
+
+    Returns:
+        The exit code: 0 on success, 1 if a file could not be processed.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    return int(args.func(args))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the `sopsy` command arguments parser."""
+    parser = argparse.ArgumentParser(prog="sopsy", description="SOPS Python wrapper")
+    subparsers = parser.add_subparsers(required=True, dest="command")
+
+    rotate = subparsers.add_parser(
+        "rotate", help="rotate the keys of all SOPS files of a directory tree"
+    )
+    rotate.add_argument("root", help="directory to search the SOPS files in")
+    rotate.add_argument(
+        "--pattern",
+        default=DEFAULT_TREE_PATTERN,
+        help="glob pattern of the SOPS files (default: %(default)s)",
+    )
+    rotate.add_argument(
+        "--workers", type=int, help="maximum number of sops commands run at once"
+    )
+    rotate.add_argument(
+        "--modified-before",
+        type=_parse_date,
+        help="skip files whose sops.lastmodified is after this ISO 8601 date (UTC)",
+    )
+    rotate.add_argument("--binary-path", help="path to the sops binary")
+    rotate.add_argument("--config", help="path to a custom SOPS config file")
+    rotate.add_argument(
+        "--quiet", action="store_true", help="do not print each processed file"
+    )
+    rotate.set_defaults(func=_rotate)
+    return parser
+
+
+def _parse_date(value: str) -> datetime:
+    """Parse an ISO 8601 date, the `Z` suffix included, as UTC if naive."""
+    try:
+        date = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        msg = f"invalid ISO 8601 date: '{value}'"
+        raise argparse.ArgumentTypeError(msg) from None
+    return date.replace(tzinfo=timezone.utc) if date.tzinfo is None else date
+
+
+def _rotate(args: argparse.Namespace) -> int:
+    def _progress(result: SopsyBatchResult) -> None:
+        status = "skipped" if result.skipped else "rotated" if result.ok else "failed"
+        _ = sys.stderr.write(f"{status} {result.file} ({result.elapsed:.2f}s)\n")
+
+    summary = rotate_tree(
+        args.root,
+        args.pattern,
+        max_workers=args.workers,
+        modified_before=args.modified_before,
+        progress=None if args.quiet else _progress,
+        binary_path=args.binary_path,
+        config=args.config,
+    )
+    _ = sys.stdout.write(f"{summary}\n")
+    return 1 if summary.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""SOPSy config, with its creation rules compiled once."""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING
+from typing import Any
+
+from sopsy.errors import SopsyError
+from sopsy.utils import DEFAULT_CONFIG_FILE
+from sopsy.utils import build_config
+from sopsy.utils import find_sops_config_cached
+from sopsy.utils import load_sops_config
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+# creation rule fields telling which keys encrypt the data key
+KEY_FIELDS = (
+    "age",
+    "pgp",
+    "kms",
+    "gcp_kms",
+    "azure_keyvault",
+    "hc_vault_transit_uri",
+    "key_groups",
+    "shamir_threshold",
+)
+
+_files_lock = threading.Lock()
+_files: dict[Path, tuple[tuple[int, int], SopsConfig]] = {}
+
+
+class SopsConfig:
+    """SOPS config, with the `path_regex` of its creation rules compiled once.
+
+    As with sops, the first creation rule whose `path_regex` is found in the file
+    path applies, paths under the config file directory are relative to it. A rule
+    without `path_regex` matches any file.
+
+    Examples:
+        >>> from sopsy import SopsConfig
+        >>> config = SopsConfig.load()
+        >>> config.rule_for("secrets/prod/db.yaml")
+        {'path_regex': '^secrets/prod/', 'age': 'age1...'}
+        >>> config.group(Path("secrets").rglob("*.yaml"))
+        {0: [PosixPath('/app/secrets/prod/db.yaml')], None: [...]}
+
+    Attributes:
+        config: The config content.
+        directory: Directory of the config file, if any.
+        rules: The creation rules, they must not be modified.
+    """
+
+    def __init__(self, config: dict[str, Any], directory: Path | None = None) -> None:
+        """Initialize config object, compiling its creation rules.
+
+        Args:
+            config: The config content, as returned by `build_config`.
+            directory: Directory of the config file, if any.
+
+        Raises:
+            SopsyError: A `path_regex` is not a valid regular expression.
+        """
+        self.config: dict[str, Any] = config
+        self.directory: Path | None = directory
+        self.rules: list[dict[str, Any]] = list(config.get("creation_rules") or [])
+        try:
+            self._patterns = [
+                re.compile(rule["path_regex"]) if rule.get("path_regex") else None
+                for rule in self.rules
+            ]
+        except re.error as err:
+            msg = f"invalid creation rule path_regex: {err}"
+            raise SopsyError(msg) from err
+        # rules sharing the same keys are grouped under the first of them
+        key_sets: dict[str, int] = {}
+        self._groups = [
+            key_sets.setdefault(_key_set(rule), index)
+            for index, rule in enumerate(self.rules)
+        ]
+
+    @classmethod
+    def load(
+        cls,
+        config_path: str | Path | None = None,
+        config_dict: dict[str, Any] | None = None,
+    ) -> SopsConfig:
+        """Return the config `Sops` objects use for the given arguments.
+
+        Args:
+            config_path: Path to a custom SOPS config file, `.sops.yaml` is searched
+                from the working directory by default.
+            config_dict: Config merged into the config file one.
+
+        Returns:
+            The config, shared by the callers while the config file is unchanged
+            when there is no config dict.
+        """
+        path = Path(config_path) if config_path else None
+        found = find_sops_config_cached(path or DEFAULT_CONFIG_FILE)
+        if config_dict:
+            config = build_config(config_path=path, config_dict=config_dict)
+            return cls(config, found.absolute().parent if found else None)
+        if found is None:
+            return cls({})
+        return cls.from_file(found)
+
+    @classmethod
+    def from_file(cls, config_path: Path) -> SopsConfig:
+        """Return the config of a file, only compiled again when the file changed."""
+        config_path = config_path.absolute()
+        stat = config_path.stat()
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with _files_lock:
+            cached = _files.get(config_path)
+        if cached is None or cached[0] != signature:
+            config = cls(load_sops_config(config_path), config_path.parent)
+            cached = (signature, config)
+            with _files_lock:
+                _files[config_path] = cached
+        return cached[1]
+
+    def rule_index(self, file: str | Path) -> int | None:
+        """Return the index of the creation rule applying to a file, or None."""
+        path = str(Path(file).absolute())
+        if self.directory is not None:
+            prefix = f"{self.directory}{os.sep}"
+            if path.startswith(prefix):
+                path = path[len(prefix) :]
+        for index, pattern in enumerate(self._patterns):
+            if pattern is None or pattern.search(path):
+                return index
+        return None
+
+    def rule_for(self, file: str | Path) -> dict[str, Any] | None:
+        """Return a copy of the creation rule applying to a file, or None."""
+        index = self.rule_index(file)
+        return None if index is None else dict(self.rules[index])
+
+    def resolve(self, files: Iterable[str | Path]) -> dict[Path, int | None]:
+        """Return the index of the creation rule each file resolves to."""
+        return {Path(file): self.rule_index(file) for file in files}
+
+    def group(self, files: Iterable[str | Path]) -> dict[int | None, list[Path]]:
+        """Group files by the keys their creation rule encrypts them with.
+
+        Files are grouped under the index of the first rule with their keys, or
+        under None when no rule applies, so that each group can be processed with
+        the same configuration.
+        """
+        groups: dict[int | None, list[Path]] = {}
+        for file, index in self.resolve(files).items():
+            group = None if index is None else self._groups[index]
+            groups.setdefault(group, []).append(file)
+        return groups
+
+
+def _key_set(rule: dict[str, Any]) -> str:
+    """Return a hashable representation of the keys of a creation rule."""
+    keys = {field: rule[field] for field in KEY_FIELDS if rule.get(field)}
+    return json.dumps(keys, sort_keys=True, default=str)
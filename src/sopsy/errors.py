@@ -19,3 +19,11 @@ class SopsyCommandFailedError(SopsyError):
 
 class SopsyConfigNotFoundError(SopsyError):
     """Sopsy could not find the given configuration file."""
+
+
+class SopsyNativeError(SopsyError):
+    """Sopsy native engine could not process the SOPS content."""
+
+
+class SopsyTimeoutError(SopsyCommandFailedError):
+    """Sopsy killed a SOPS command that did not complete in time."""
@@ -0,0 +1,289 @@
+"""SOPSy instrumentation hooks.
+
+Hooks are called with a `SopsyEvent` after each sops command, cache lookup or
+in-process decryption. Events never hold secret payloads, only their sizes.
+"""
+
+from __future__ import annotations
+
+import importlib
+import logging
+import threading
+from collections import deque
+from dataclasses import asdict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+from typing import Any
+from typing import Callable
+
+from sopsy.errors import SopsyError
+from sopsy.errors import SopsyTimeoutError
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+SOPS_SUBCOMMANDS = (
+    "decrypt",
+    "encrypt",
+    "rotate",
+    "set",
+    "unset",
+    "exec-env",
+    "exec-file",
+    "keyservice",
+    "updatekeys",
+    "filestatus",
+    "publish",
+    "edit",
+)
+DEFAULT_MAX_SAMPLES = 1000
+logger = logging.getLogger(__name__)
+
+SopsyHook = Callable[["SopsyEvent"], None]
+_hooks: tuple[SopsyHook, ...] = ()
+
+
+@dataclass(frozen=True)
+class SopsyEvent:
+    """What happened during a sopsy operation.
+
+    Attributes:
+        kind: The sops subcommand (`decrypt`, `encrypt`, `set`...).
+        backend: `binary` for a sops command, `native` for an in-process decryption,
+            `cache` for a decrypt cache lookup or `preload` for a read of the
+            secrets loaded by `sopsy.preload()`.
+        file: Path to the SOPS file, None when its content went through stdin.
+        started: Start time, in seconds since the epoch.
+        spawn: Number of seconds spent starting the sops process.
+        wait: Number of seconds spent waiting for the sops process to exit.
+        parse: Number of seconds spent parsing the output (or decrypting, for the
+            `native` backend).
+        bytes_in: Size of the data sent to the process standard input.
+        bytes_out: Size of the process output.
+        exit_code: Exit code of the process, if one was run and exited.
+        cache_hit: Whether the cache lookup succeeded, for the `cache` backend.
+        error: Type name of the raised exception, if any.
+        attempt: Number of the attempt, greater than 1 when a sops command is run
+            again after a transient failure.
+    """
+
+    kind: str
+    backend: str = "binary"
+    file: str | None = None
+    started: float = 0.0
+    spawn: float = 0.0
+    wait: float = 0.0
+    parse: float = 0.0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    exit_code: int | None = None
+    cache_hit: bool | None = None
+    error: str | None = None
+    attempt: int = 1
+
+    @property
+    def duration(self) -> float:
+        """Return the wall time of the operation, in seconds."""
+        return self.spawn + self.wait + self.parse
+
+    def attributes(self) -> dict[str, str | int | float | bool]:
+        """Return the event fields that are set, with a `sopsy.` prefix."""
+        return {f"sopsy.{k}": v for k, v in asdict(self).items() if v is not None}
+
+
+def add_hook(hook: SopsyHook) -> SopsyHook:
+    """Call the given function with each event, it can be used as a decorator.
+
+    Hooks run in the thread doing the operation, they should be quick. Exceptions
+    they raise are logged and ignored.
+
+    Examples:
+        >>> from sopsy import add_hook
+        >>> @add_hook
+        >>> def log_slow(event):
+        >>>     if event.duration > 0.5:
+        >>>         print(f"slow sops {event.kind} of {event.file}")
+    """
+    global _hooks  # noqa: PLW0603
+    _hooks = (*_hooks, hook)
+    return hook
+
+
+def remove_hook(hook: SopsyHook) -> None:
+    """Stop calling the given function with events."""
+    global _hooks  # noqa: PLW0603
+    _hooks = tuple(h for h in _hooks if h != hook)
+
+
+def clear_hooks() -> None:
+    """Remove all hooks."""
+    global _hooks  # noqa: PLW0603
+    _hooks = ()
+
+
+def enabled() -> bool:
+    """Return whether any hook is registered, so events are worth building."""
+    return bool(_hooks)
+
+
+def emit(event: SopsyEvent) -> None:
+    """Call the registered hooks with the given event."""
+    for hook in _hooks:
+        _call(hook, event)
+
+
+def command_kind(cmd: Sequence[str]) -> str:
+    """Return the sops subcommand of the given command."""
+    return next((arg for arg in cmd[1:] if arg in SOPS_SUBCOMMANDS), "sops")
+
+
+def otel_hook(tracer: Any = None) -> SopsyHook:  # noqa: ANN401
+    """Return a hook recording each event as an OpenTelemetry span.
+
+    Examples:
+        >>> from sopsy import add_hook
+        >>> from sopsy.hooks import otel_hook
+        >>> add_hook(otel_hook())
+
+    Args:
+        tracer: The tracer creating the spans, the `sopsy` tracer of the global
+            tracer provider by default.
+
+    Returns:
+        The hook, to register with `add_hook`.
+
+    Raises:
+        SopsyError: No tracer is given and opentelemetry-api is not installed.
+    """
+    if tracer is None:
+        try:
+            trace = importlib.import_module("opentelemetry.trace")
+        except ImportError as err:
+            msg = "opentelemetry-api package is required, install sopsy[otel]"
+            raise SopsyError(msg) from err
+        tracer = trace.get_tracer("sopsy")
+
+    def _hook(event: SopsyEvent) -> None:
+        start = int(event.started * 1e9)
+        span = tracer.start_span(
+            f"sops {event.kind}", start_time=start, attributes=event.attributes()
+        )
+        span.end(end_time=start + int(event.duration * 1e9))
+
+    return _hook
+
+
+@dataclass(frozen=True)
+class SopsLatency:
+    """Latency of a series of sops commands, in seconds.
+
+    Attributes:
+        calls: Number of commands measured.
+        mean: Mean latency.
+        p50: Median latency.
+        p95: 95th percentile latency.
+        p99: 99th percentile latency.
+    """
+
+    calls: int = 0
+    mean: float = 0.0
+    p50: float = 0.0
+    p95: float = 0.0
+    p99: float = 0.0
+
+    @classmethod
+    def from_samples(cls, samples: list[float]) -> SopsLatency:
+        """Compute the latency of the given samples."""
+        if not samples:
+            return cls()
+        ordered = sorted(samples)
+        return cls(
+            calls=len(ordered),
+            mean=sum(ordered) / len(ordered),
+            p50=_percentile(ordered, 50),
+            p95=_percentile(ordered, 95),
+            p99=_percentile(ordered, 99),
+        )
+
+
+class SopsLatencyRecorder:
+    """Hook recording the latency of sops commands, by outcome.
+
+    Each run of a sops command is recorded under its outcome: `ok`, `failed` or
+    `timeout`. The runs following a transient failure are also recorded under
+    `retry`. Only the most recent samples of each outcome are kept.
+
+    Examples:
+        >>> from sopsy import SopsLatencyRecorder, add_hook
+        >>> recorder = add_hook(SopsLatencyRecorder())
+        >>> recorder.summary()
+        {'ok': SopsLatency(calls=120, ...), 'timeout': SopsLatency(calls=2, ...)}
+
+    Attributes:
+        max_samples: Number of samples kept for each outcome.
+    """
+
+    OUTCOMES = ("ok", "failed", "timeout", "retry")
+
+    def __init__(self, max_samples: int = DEFAULT_MAX_SAMPLES) -> None:
+        """Initialize recorder object, register it with `add_hook`.
+
+        Args:
+            max_samples: Number of samples kept for each outcome.
+        """
+        self.max_samples: int = max_samples
+        self._samples: dict[str, deque[float]] = {
+            outcome: deque(maxlen=max_samples) for outcome in self.OUTCOMES
+        }
+        self._lock = threading.Lock()
+
+    def __call__(self, event: SopsyEvent) -> None:
+        """Record the duration of a sops command."""
+        if event.backend != "binary":
+            return
+        if event.error == SopsyTimeoutError.__name__:
+            outcome = "timeout"
+        else:
+            outcome = "ok" if event.error is None else "failed"
+        with self._lock:
+            self._samples[outcome].append(event.duration)
+            if event.attempt > 1:
+                self._samples["retry"].append(event.duration)
+
+    def latency(self, outcome: str = "ok") -> SopsLatency:
+        """Return the latency of the recorded commands with the given outcome."""
+        with self._lock:
+            samples = list(self._samples[outcome])
+        return SopsLatency.from_samples(samples)
+
+    def summary(self) -> dict[str, SopsLatency]:
+        """Return the latency of the recorded commands, for each seen outcome."""
+        latencies = {outcome: self.latency(outcome) for outcome in self.OUTCOMES}
+        return {outcome: lat for outcome, lat in latencies.items() if lat.calls}
+
+    def log(self, level: int = logging.INFO) -> None:
+        """Log the latency of the recorded commands, for each seen outcome."""
+        for outcome, lat in self.summary().items():
+            logger.log(
+                level,
+                "sops %s: %d calls, mean %.3fs, p50 %.3fs, p95 %.3fs, p99 %.3fs",
+                outcome,
+                lat.calls,
+                lat.mean,
+                lat.p50,
+                lat.p95,
+                lat.p99,
+            )
+
+
+def _call(hook: SopsyHook, event: SopsyEvent) -> None:
+    try:
+        hook(event)
+    except Exception:
+        logger.exception("sopsy hook failed")
+
+
+def _percentile(ordered: list[float], percent: int) -> float:
+    """Return the nearest-rank percentile of sorted samples."""
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[rank - 1]
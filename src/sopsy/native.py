@@ -0,0 +1,972 @@
+"""SOPSy native engine.
+
+Decrypt, encrypt and update SOPS documents in-process, without running the `sops`
+binary.
+Only the age master keys and the AES256_GCM data cipher are supported, anything
+else raises `SopsyNativeError` so that callers can fall back to the `sops` binary.
+
+It requires the `cryptography` package, available with the `sopsy[native]` extra.
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import datetime
+import hashlib
+import hmac
+import json
+import os
+import re
+from decimal import Decimal
+from pathlib import Path
+from typing import Any
+from typing import Callable
+
+import yaml
+
+try:
+    from cryptography.exceptions import InvalidTag
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey
+    from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PublicKey
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    from cryptography.hazmat.primitives.ciphers.aead import ChaCha20Poly1305
+    from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+except ImportError:  # pragma: no cover
+    HAS_CRYPTOGRAPHY = False
+else:
+    HAS_CRYPTOGRAPHY = True
+
+from sopsy.cache import DataKeyCache
+from sopsy.errors import SopsyNativeError
+from sopsy.utils import json_loads
+from sopsy.utils import lookup_path
+from sopsy.utils import yaml_load
+
+AGE_IDENTITY_HRP = "age-secret-key-"
+AGE_RECIPIENT_HRP = "age"
+AGE_VERSION_LINE = b"age-encryption.org/v1"
+AGE_X25519_INFO = b"age-encryption.org/v1/X25519"
+AGE_CHUNK_SIZE = 64 * 1024
+AGE_ARMOR_BEGIN = "-----BEGIN AGE ENCRYPTED FILE-----"
+AGE_ARMOR_END = "-----END AGE ENCRYPTED FILE-----"
+AGE_FILE_KEY_SIZE = 16
+AGE_COLUMNS = 64
+SOPS_METADATA_KEY = "sops"
+SOPS_IV_SIZE = 32
+SOPS_TAG_SIZE = 16
+SOPS_DATA_KEY_SIZE = 32
+SOPS_FORMAT_VERSION = "3.9.1"
+DEFAULT_UNENCRYPTED_SUFFIX = "_unencrypted"
+DATA_KEY_CACHE_MAXSIZE = 64
+DATA_KEY_CACHE_TTL = 300
+
+_MISSING_NODE = object()
+_SELECTORS = (
+    "unencrypted_suffix",
+    "encrypted_suffix",
+    "unencrypted_regex",
+    "encrypted_regex",
+)
+# creation rule keys the native engine cannot encrypt for
+_UNSUPPORTED_RULE_KEYS = (
+    "key_groups",
+    "pgp",
+    "kms",
+    "gcp_kms",
+    "azure_keyvault",
+    "hc_vault_transit_uri",
+)
+
+data_key_cache = DataKeyCache(maxsize=DATA_KEY_CACHE_MAXSIZE, ttl=DATA_KEY_CACHE_TTL)
+
+_BECH32_CHARSET = "qpzry9x8gf2tvdw0s3jn54khce6mua7l"
+_BECH32_GENERATOR = (0x3B6A57B2, 0x26508E6D, 0x1EA119FA, 0x3D4233DD, 0x2A1462B3)
+_YAML_COMMENT_RE = re.compile(r"^\s*#", re.MULTILINE)
+_JSON_GO_ESCAPES = {
+    "<": "\\u003c",
+    ">": "\\u003e",
+    "&": "\\u0026",
+    "\u2028": "\\u2028",
+    "\u2029": "\\u2029",
+}
+_ENC_RE = re.compile(
+    r"^ENC\[AES256_GCM,data:(?P<data>[^,]*),iv:(?P<iv>[^,]*),"
+    r"tag:(?P<tag>[^,]*),type:(?P<type>[^,\]]*)\]$"
+)
+
+
+def load_document(content: str | bytes, input_type: str) -> dict[str, Any]:
+    """Parse a SOPS document of the given type (`json` or `yaml`), encrypted or not."""
+    if isinstance(content, bytes):
+        content = content.decode()
+    if input_type == "yaml" and _YAML_COMMENT_RE.search(content):
+        # sops encrypts YAML comments and includes them in the MAC
+        msg = "YAML comments are not supported"
+        raise SopsyNativeError(msg)
+    try:
+        if input_type == "json":
+            document = json_loads(content)
+        elif input_type == "yaml":
+            document = yaml_load(content)
+        else:
+            msg = f"unsupported input type {input_type}"
+            raise SopsyNativeError(msg)
+    except (ValueError, yaml.YAMLError) as err:
+        msg = f"could not parse {input_type} content"
+        raise SopsyNativeError(msg) from err
+    if not isinstance(document, dict):
+        msg = "document is not a mapping"
+        raise SopsyNativeError(msg)
+    return document
+
+
+def decrypt_document(
+    document: dict[str, Any],
+    *,
+    identities: list[bytes] | None = None,
+    verify_mac: bool = True,
+    key_cache: DataKeyCache | None = data_key_cache,
+) -> dict[str, Any]:
+    """Decrypt a parsed SOPS document.
+
+    Args:
+        document: The encrypted document, as parsed from a JSON or YAML SOPS file.
+        identities: Age X25519 private keys, loaded from the environment if not set.
+        verify_mac: Check the document integrity against its MAC.
+        key_cache: Cache of unwrapped data keys, `None` to always unwrap it.
+
+    Returns:
+        The decrypted document, without its `sops` metadata.
+    """
+    metadata = get_metadata(document)
+    data_key = unwrap_data_key(metadata, identities=identities, key_cache=key_cache)
+    tree = {k: v for k, v in document.items() if k != SOPS_METADATA_KEY}
+    digest = hashlib.sha512()
+    out = walk_tree(tree, _leaf_decryptor(data_key, metadata, digest))
+    if verify_mac:
+        check_mac(metadata, data_key, digest.hexdigest().upper())
+    return out
+
+
+def decrypt_path(
+    document: dict[str, Any],
+    path: list[str | int],
+    *,
+    identities: list[bytes] | None = None,
+    verify_mac: bool = False,
+    key_cache: DataKeyCache | None = data_key_cache,
+) -> Any:  # noqa: ANN401
+    """Decrypt only the values found at the given path of a parsed SOPS document.
+
+    Args:
+        document: The encrypted document, as parsed from a JSON or YAML SOPS file.
+        path: Keys (and list indexes) leading to the wanted value.
+        identities: Age X25519 private keys, loaded from the environment if not set.
+        verify_mac: Check the document integrity against its MAC, it requires to
+            decrypt the whole document.
+        key_cache: Cache of unwrapped data keys, `None` to always unwrap it.
+
+    Returns:
+        The decrypted value or branch.
+
+    Raises:
+        KeyError: The path does not exist in the document.
+    """
+    if verify_mac:
+        tree = decrypt_document(
+            document, identities=identities, verify_mac=True, key_cache=key_cache
+        )
+        return lookup_path(tree, path)[0]
+    metadata = get_metadata(document)
+    tree = {k: v for k, v in document.items() if k != SOPS_METADATA_KEY}
+    node, keys = lookup_path(tree, path)
+    data_key = unwrap_data_key(metadata, identities=identities, key_cache=key_cache)
+    return walk_tree(node, _leaf_decryptor(data_key, metadata), keys)
+
+
+def update_document(
+    document: dict[str, Any],
+    changes: list[tuple[list[str | int], Any]],
+    *,
+    identities: list[bytes] | None = None,
+    key_cache: DataKeyCache | None = data_key_cache,
+) -> dict[str, Any]:
+    """Set values in a parsed SOPS document, only re-encrypting what changed.
+
+    The document MAC is checked first. Values set to what they already are do not
+    count as changes. Unchanged values are kept as-is, so their `ENC[...]` strings
+    do not change. The changed ones are encrypted under the existing data key, then
+    `lastmodified` and the MAC are updated.
+
+    Args:
+        document: The encrypted document, as parsed from a JSON or YAML SOPS file.
+        changes: Paths (keys and list indexes) and the values to set there. Missing
+            mapping keys are created.
+        identities: Age X25519 private keys, loaded from the environment if not set.
+        key_cache: Cache of unwrapped data keys, `None` to always unwrap it.
+
+    Returns:
+        The updated document, or the given one if nothing changed.
+    """
+    metadata = get_metadata(document)
+    data_key = unwrap_data_key(metadata, identities=identities, key_cache=key_cache)
+    tree = {k: v for k, v in document.items() if k != SOPS_METADATA_KEY}
+    digest = hashlib.sha512()
+    plain = walk_tree(tree, _leaf_decryptor(data_key, metadata, digest))
+    check_mac(metadata, data_key, digest.hexdigest().upper())
+    changed = set()
+    for path, value in changes:
+        position = _assign(plain, path, value)
+        if position is not None:
+            changed.add(position)
+    if not changed:
+        return document
+    aead = AESGCM(data_key)
+    digest = hashlib.sha512()
+    out = _reencrypt(plain, tree, aead, metadata, digest, changed, (), [])
+    new_metadata = dict(metadata)
+    new_metadata["lastmodified"] = _lastmodified_now()
+    new_metadata["mac"] = encrypt_value(
+        digest.hexdigest().upper(), aead, new_metadata["lastmodified"]
+    )
+    out[SOPS_METADATA_KEY] = new_metadata
+    return out
+
+
+def encrypt_document(
+    tree: dict[str, Any],
+    recipients: list[str],
+    *,
+    unencrypted_suffix: str | None = None,
+    encrypted_suffix: str | None = None,
+    unencrypted_regex: str | None = None,
+    encrypted_regex: str | None = None,
+    mac_only_encrypted: bool = False,
+) -> dict[str, Any]:
+    """Encrypt a plain document for age recipients, as `sops encrypt` does.
+
+    A new data key is generated and wrapped for each recipient. Each value is
+    encrypted with its path as additional data, unless the selector leaves it in
+    clear, and the MAC of the values is stored in the `sops` metadata.
+
+    Args:
+        tree: The plain document.
+        recipients: Age X25519 recipients (`age1...`) allowed to decrypt it.
+        unencrypted_suffix: Leave the values under keys with this suffix in clear,
+            `_unencrypted` if no other selector is set.
+        encrypted_suffix: Only encrypt the values under keys with this suffix.
+        unencrypted_regex: Leave the values under keys matching it in clear.
+        encrypted_regex: Only encrypt the values under keys matching it.
+        mac_only_encrypted: Only include the encrypted values in the MAC.
+
+    Returns:
+        The encrypted document, with its `sops` metadata.
+    """
+    if not HAS_CRYPTOGRAPHY:
+        msg = "cryptography package is required, install sopsy[native]"
+        raise SopsyNativeError(msg)
+    if SOPS_METADATA_KEY in tree:
+        msg = "document is already encrypted"
+        raise SopsyNativeError(msg)
+    if not recipients:
+        msg = "no age recipient to encrypt the data key for"
+        raise SopsyNativeError(msg)
+    public_keys = [_age_recipient_key(r) for r in recipients]
+    values = (unencrypted_suffix, encrypted_suffix, unencrypted_regex, encrypted_regex)
+    metadata: dict[str, Any] = {k: v for k, v in zip(_SELECTORS, values) if v}
+    if len(metadata) > 1:
+        msg = f"only one of {', '.join(_SELECTORS)} can be set"
+        raise SopsyNativeError(msg)
+    if not metadata:
+        metadata["unencrypted_suffix"] = DEFAULT_UNENCRYPTED_SUFFIX
+    if mac_only_encrypted:
+        metadata["mac_only_encrypted"] = True
+    data_key = os.urandom(SOPS_DATA_KEY_SIZE)
+    aead = AESGCM(data_key)
+    digest = hashlib.sha512()
+    out = walk_tree(tree, _leaf_encryptor(aead, metadata, digest))
+    lastmodified = _lastmodified_now()
+    out[SOPS_METADATA_KEY] = {
+        "age": [
+            {"recipient": recipient, "enc": age_encrypt(data_key, public_key)}
+            for recipient, public_key in zip(recipients, public_keys)
+        ],
+        "lastmodified": lastmodified,
+        "mac": encrypt_value(digest.hexdigest().upper(), aead, lastmodified),
+        **metadata,
+        "version": SOPS_FORMAT_VERSION,
+    }
+    return out
+
+
+def creation_settings(rule: dict[str, Any] | None) -> dict[str, Any]:
+    """Return the `encrypt_document` arguments for a sops creation rule.
+
+    As with sops, the `SOPS_AGE_RECIPIENTS` environment variable takes precedence
+    over the keys of the rule.
+
+    Args:
+        rule: The creation rule matching the file, if any.
+
+    Returns:
+        The recipients and the encryption settings of the rule.
+
+    Raises:
+        SopsyNativeError: The rule uses other keys than age ones.
+    """
+    rule = rule or {}
+    recipients: str | list[str] | None = os.environ.get("SOPS_AGE_RECIPIENTS")
+    if not recipients:
+        unsupported = [k for k in _UNSUPPORTED_RULE_KEYS if rule.get(k)]
+        if unsupported:
+            msg = f"unsupported creation rule keys: {', '.join(unsupported)}"
+            raise SopsyNativeError(msg)
+        recipients = rule.get("age") or ""
+    if isinstance(recipients, str):
+        recipients = recipients.split(",")
+    settings = {k: rule[k] for k in (*_SELECTORS, "mac_only_encrypted") if rule.get(k)}
+    settings["recipients"] = [r.strip() for r in recipients if r.strip()]
+    return settings
+
+
+def dump_document(
+    document: dict[str, Any], output_type: str, *, like: str | bytes = ""
+) -> bytes:
+    """Serialize a SOPS document the way sops does.
+
+    Only JSON is supported, sops YAML formatting cannot be reproduced exactly.
+
+    Args:
+        document: The encrypted document.
+        output_type: Format of the output, only `json` is supported.
+        like: Original content, to keep its trailing new line.
+
+    Returns:
+        The serialized document.
+    """
+    if output_type != "json":
+        msg = f"unsupported output type {output_type}"
+        raise SopsyNativeError(msg)
+    text = json.dumps(document, indent="\t", ensure_ascii=False)
+    # sops is written in Go, which escapes these characters in JSON strings
+    for char, escaped in _JSON_GO_ESCAPES.items():
+        text = text.replace(char, escaped)
+    ending = like[-1:] in {"\n", b"\n"}
+    return (text + "\n" if ending else text).encode()
+
+
+def get_metadata(document: dict[str, Any]) -> dict[str, Any]:
+    """Return the `sops` metadata of a document, if supported."""
+    if not HAS_CRYPTOGRAPHY:
+        msg = "cryptography package is required, install sopsy[native]"
+        raise SopsyNativeError(msg)
+    metadata = document.get(SOPS_METADATA_KEY) if isinstance(document, dict) else None
+    if not isinstance(metadata, dict):
+        msg = "sops metadata not found"
+        raise SopsyNativeError(msg)
+    if metadata.get("key_groups") or not metadata.get("age"):
+        msg = "only age master keys without key groups are supported"
+        raise SopsyNativeError(msg)
+    return metadata
+
+
+def unwrap_data_key(
+    metadata: dict[str, Any],
+    *,
+    identities: list[bytes] | None = None,
+    key_cache: DataKeyCache | None = None,
+) -> bytes:
+    """Decrypt the data key of a SOPS document with one of the age identities.
+
+    The data key only changes when the file is rotated, along with the encrypted
+    key blobs, so the cache is keyed on those blobs and on the identities used.
+    """
+    if identities is None:
+        identities = load_age_identities()
+    cache_key = None
+    if key_cache is not None:
+        digest = hashlib.sha256()
+        stanzas = [s for s in metadata["age"] if isinstance(s, dict)]
+        for blob in sorted(str(s.get("enc")) for s in stanzas):
+            digest.update(blob.encode() + b"\0")
+        for identity in identities:
+            digest.update(hashlib.sha256(identity).digest())
+        cache_key = digest.hexdigest()
+        cached = key_cache.get(cache_key)
+        if cached is not None:
+            return bytes(cached)
+    data_key = _unwrap_age_data_key(metadata, identities)
+    if key_cache is not None:
+        key_cache.set(cache_key, bytearray(data_key))
+    return data_key
+
+
+def _unwrap_age_data_key(metadata: dict[str, Any], identities: list[bytes]) -> bytes:
+    for stanza in metadata["age"]:
+        enc = stanza.get("enc") if isinstance(stanza, dict) else None
+        if not isinstance(enc, str):
+            continue
+        for identity in identities:
+            data_key = _try_age_decrypt(enc, identity)
+            if data_key is not None:
+                return data_key
+    msg = "no age identity can decrypt the data key"
+    raise SopsyNativeError(msg)
+
+
+def check_mac(metadata: dict[str, Any], data_key: bytes, computed: str) -> None:
+    """Compare the computed hash of the values to the document MAC."""
+    mac = metadata.get("mac")
+    if not isinstance(mac, str):
+        msg = "sops metadata has no mac"
+        raise SopsyNativeError(msg)
+    expected = decrypt_value(mac, data_key, format_lastmodified(metadata))
+    if not hmac.compare_digest(str(expected), computed):
+        msg = "MAC mismatch, the file may have been tampered with"
+        raise SopsyNativeError(msg)
+
+
+def walk_tree(
+    tree: Any,  # noqa: ANN401
+    on_leaf: Callable[[Any, list[str]], Any],
+    path: list[str] | None = None,
+) -> Any:  # noqa: ANN401
+    """Apply a function to every leaf of a tree, in the same order as sops does.
+
+    List items share the path of the list, as in sops.
+    """
+    if path is None:
+        path = []
+    if isinstance(tree, dict):
+        out = {}
+        for key, value in tree.items():
+            if not isinstance(key, str):
+                msg = f"unsupported key type {type(key).__name__}"
+                raise SopsyNativeError(msg)
+            out[key] = walk_tree(value, on_leaf, [*path, key])
+        return out
+    if isinstance(tree, list):
+        return [walk_tree(item, on_leaf, path) for item in tree]
+    if tree is None:
+        return None
+    return on_leaf(tree, path)
+
+
+def is_encrypted(path: list[str], metadata: dict[str, Any]) -> bool:
+    """Tell if the value at the given path is encrypted, according to metadata."""
+    unencrypted_suffix = metadata.get("unencrypted_suffix")
+    encrypted_suffix = metadata.get("encrypted_suffix")
+    unencrypted_regex = metadata.get("unencrypted_regex")
+    encrypted_regex = metadata.get("encrypted_regex")
+    if unencrypted_suffix:
+        return not any(k.endswith(unencrypted_suffix) for k in path)
+    if encrypted_suffix:
+        return any(k.endswith(encrypted_suffix) for k in path)
+    if unencrypted_regex:
+        return not any(re.search(unencrypted_regex, k) for k in path)
+    if encrypted_regex:
+        return any(re.search(encrypted_regex, k) for k in path)
+    return True
+
+
+def decrypt_value(value: str, key: bytes | AESGCM, additional_data: str) -> Any:  # noqa: ANN401
+    """Decrypt a single `ENC[AES256_GCM,...]` value.
+
+    The key can be given as an `AESGCM` object, to reuse it for several values.
+    """
+    if value == "":
+        return ""
+    match = _ENC_RE.match(value)
+    if not match:
+        msg = "value does not match sops data format"
+        raise SopsyNativeError(msg)
+    try:
+        data = base64.b64decode(match["data"])
+        iv = base64.b64decode(match["iv"])
+        tag = base64.b64decode(match["tag"])
+        aead = key if isinstance(key, AESGCM) else AESGCM(key)
+        plaintext = aead.decrypt(iv, data + tag, additional_data.encode())
+    except (binascii.Error, InvalidTag, ValueError) as err:
+        msg = "could not decrypt value"
+        raise SopsyNativeError(msg) from err
+    return _from_plaintext(plaintext, match["type"])
+
+
+def encrypt_value(value: Any, key: bytes | AESGCM, additional_data: str) -> str:  # noqa: ANN401
+    """Encrypt a single value into the `ENC[AES256_GCM,...]` format.
+
+    The key can be given as an `AESGCM` object, to reuse it for several values.
+    """
+    if value == "":
+        return ""
+    plaintext, value_type = _to_plaintext(value)
+    iv = os.urandom(SOPS_IV_SIZE)
+    aead = key if isinstance(key, AESGCM) else AESGCM(key)
+    sealed = aead.encrypt(iv, plaintext, additional_data.encode())
+    data, tag = sealed[:-SOPS_TAG_SIZE], sealed[-SOPS_TAG_SIZE:]
+    return (
+        f"ENC[AES256_GCM,data:{base64.b64encode(data).decode()},"
+        f"iv:{base64.b64encode(iv).decode()},"
+        f"tag:{base64.b64encode(tag).decode()},type:{value_type}]"
+    )
+
+
+def value_to_bytes(value: Any) -> bytes:  # noqa: ANN401
+    """Return the bytes representation sops uses to compute the MAC of a value."""
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, str):
+        return value.encode()
+    if isinstance(value, bool):
+        return b"True" if value else b"False"
+    if isinstance(value, int):
+        return str(value).encode()
+    if isinstance(value, float):
+        return _format_float(value).encode()
+    msg = f"unsupported value type {type(value).__name__}"
+    raise SopsyNativeError(msg)
+
+
+def format_lastmodified(metadata: dict[str, Any]) -> str:
+    """Return the `lastmodified` metadata as written by sops."""
+    lastmodified = metadata.get("lastmodified")
+    if isinstance(lastmodified, datetime.datetime):
+        # YAML timestamps are parsed by PyYAML
+        lastmodified = lastmodified.astimezone(datetime.timezone.utc)
+        return lastmodified.strftime("%Y-%m-%dT%H:%M:%SZ")
+    if not isinstance(lastmodified, str):
+        msg = "sops metadata has no lastmodified"
+        raise SopsyNativeError(msg)
+    return lastmodified
+
+
+def load_age_identities() -> list[bytes]:
+    """Load age X25519 identities the same way sops does.
+
+    Identities are read from the `SOPS_AGE_KEY` environment variable, the file set
+    in `SOPS_AGE_KEY_FILE`, and the default `sops/age/keys.txt` user config file.
+    """
+    sources = [os.environ.get("SOPS_AGE_KEY", "")]
+    key_file = os.environ.get("SOPS_AGE_KEY_FILE")
+    config_home = os.environ.get("XDG_CONFIG_HOME") or Path.home() / ".config"
+    paths = (key_file, Path(config_home) / "sops" / "age" / "keys.txt")
+    sources.extend(Path(p).read_text() for p in paths if p and Path(p).is_file())
+    identities = []
+    for source in sources:
+        for line in source.splitlines():
+            line = line.strip()  # noqa: PLW2901
+            if line.upper().startswith(AGE_IDENTITY_HRP.upper()):
+                hrp, key = bech32_decode(line)
+                if hrp == AGE_IDENTITY_HRP and len(key) == 32:  # noqa: PLR2004
+                    identities.append(key)
+    return identities
+
+
+def age_decrypt(armored: str, identity: bytes) -> bytes:
+    """Decrypt an armored age file with a X25519 identity."""
+    data = _age_dearmor(armored)
+    try:
+        header_end = data.index(b"\n--- ")
+        mac_end = data.index(b"\n", header_end + 1)
+    except ValueError as err:
+        msg = "invalid age header"
+        raise SopsyNativeError(msg) from err
+    lines = data[:header_end].split(b"\n")
+    if lines[0] != AGE_VERSION_LINE:
+        msg = "unsupported age version"
+        raise SopsyNativeError(msg)
+    private_key = X25519PrivateKey.from_private_bytes(identity)
+    recipient = private_key.public_key().public_bytes_raw()
+    file_key = None
+    for args, body in _age_stanzas(lines[1:]):
+        if len(args) != 2 or args[0] != "X25519":  # noqa: PLR2004
+            continue
+        share = _b64decode_raw(args[1])
+        try:
+            shared = private_key.exchange(X25519PublicKey.from_public_bytes(share))
+            wrap_key = _hkdf(shared, share + recipient, AGE_X25519_INFO)
+            file_key = ChaCha20Poly1305(wrap_key).decrypt(bytes(12), body, None)
+            break
+        except (InvalidTag, ValueError):
+            continue
+    if file_key is None:
+        msg = "age identity does not match any recipient"
+        raise SopsyNativeError(msg)
+    mac_key = _hkdf(file_key, b"", b"header")
+    mac = hmac.new(mac_key, data[: header_end + 4], hashlib.sha256).digest()
+    if not hmac.compare_digest(mac, _b64decode_raw(data[header_end + 5 : mac_end])):
+        msg = "age header MAC mismatch"
+        raise SopsyNativeError(msg)
+    return _age_payload_decrypt(file_key, data[mac_end + 1 :])
+
+
+def age_encrypt(data: bytes, recipient: bytes) -> str:
+    """Encrypt data for a X25519 recipient public key into an armored age file."""
+    file_key = os.urandom(AGE_FILE_KEY_SIZE)
+    ephemeral = X25519PrivateKey.generate()
+    share = ephemeral.public_key().public_bytes_raw()
+    shared = ephemeral.exchange(X25519PublicKey.from_public_bytes(recipient))
+    wrap_key = _hkdf(shared, share + recipient, AGE_X25519_INFO)
+    body = ChaCha20Poly1305(wrap_key).encrypt(bytes(12), file_key, None)
+    header = b"\n".join(
+        [
+            AGE_VERSION_LINE,
+            b"-> X25519 " + _b64encode_raw(share),
+            *_age_wrap(_b64encode_raw(body)),
+            b"---",
+        ]
+    )
+    mac_key = _hkdf(file_key, b"", b"header")
+    mac = hmac.new(mac_key, header, hashlib.sha256).digest()
+    data = (
+        header
+        + b" "
+        + _b64encode_raw(mac)
+        + b"\n"
+        + _age_payload_encrypt(file_key, data)
+    )
+    encoded = base64.b64encode(data)
+    lines = [
+        encoded[i : i + AGE_COLUMNS].decode()
+        for i in range(0, len(encoded), AGE_COLUMNS)
+    ]
+    return "\n".join([AGE_ARMOR_BEGIN, *lines, AGE_ARMOR_END]) + "\n"
+
+
+def bech32_decode(value: str) -> tuple[str, bytes]:
+    """Decode a Bech32 string into its human readable part and data."""
+    value = value.lower()
+    pos = value.rfind("1")
+    hrp = value[:pos]
+    data = [_BECH32_CHARSET.find(c) for c in value[pos + 1 :]]
+    if pos < 1 or len(data) < 6 or -1 in data:  # noqa: PLR2004
+        msg = "invalid bech32 string"
+        raise SopsyNativeError(msg)
+    if _bech32_polymod(_bech32_hrp_expand(hrp) + data) != 1:
+        msg = "invalid bech32 checksum"
+        raise SopsyNativeError(msg)
+    return hrp, bytes(_convert_bits(data[:-6], 5, 8, pad=False))
+
+
+def bech32_encode(hrp: str, data: bytes) -> str:
+    """Encode data as a Bech32 string with the given human readable part."""
+    values = _convert_bits(list(data), 8, 5, pad=True)
+    polymod = _bech32_polymod([*_bech32_hrp_expand(hrp), *values, 0, 0, 0, 0, 0, 0])
+    checksum = [(polymod ^ 1) >> 5 * (5 - i) & 31 for i in range(6)]
+    return hrp + "1" + "".join(_BECH32_CHARSET[d] for d in values + checksum)
+
+
+def _try_age_decrypt(armored: str, identity: bytes) -> bytes | None:
+    try:
+        return age_decrypt(armored, identity)
+    except SopsyNativeError:
+        return None
+
+
+def _leaf_decryptor(
+    data_key: bytes,
+    metadata: dict[str, Any],
+    digest: Any = None,  # noqa: ANN401
+) -> Callable[[Any, list[str]], Any]:
+    mac_only_encrypted = bool(metadata.get("mac_only_encrypted"))
+    aead = AESGCM(data_key)
+
+    def _decrypt_leaf(value: Any, path: list[str]) -> Any:  # noqa: ANN401
+        encrypted = is_encrypted(path, metadata)
+        if encrypted:
+            if not isinstance(value, str):
+                msg = "encrypted value is not a string"
+                raise SopsyNativeError(msg)
+            value = decrypt_value(value, aead, ":".join(path) + ":")
+        if digest is not None and (encrypted or not mac_only_encrypted):
+            digest.update(value_to_bytes(value))
+        return value
+
+    return _decrypt_leaf
+
+
+def _leaf_encryptor(
+    aead: AESGCM,
+    metadata: dict[str, Any],
+    digest: Any,  # noqa: ANN401
+) -> Callable[[Any, list[str]], Any]:
+    mac_only_encrypted = bool(metadata.get("mac_only_encrypted"))
+
+    def _encrypt_leaf(value: Any, path: list[str]) -> Any:  # noqa: ANN401
+        encrypted = is_encrypted(path, metadata)
+        if encrypted or not mac_only_encrypted:
+            digest.update(value_to_bytes(value))
+        if encrypted:
+            return encrypt_value(value, aead, ":".join(path) + ":")
+        return value
+
+    return _encrypt_leaf
+
+
+def _assign(
+    tree: Any,  # noqa: ANN401
+    path: list[str | int],
+    value: Any,  # noqa: ANN401
+) -> tuple[str | int, ...] | None:
+    """Set a value in a plain tree, return its normalized path if it changed.
+
+    Raises:
+        KeyError: A list index of the path is out of range.
+    """
+    if not path:
+        msg = "cannot set the document root"
+        raise SopsyNativeError(msg)
+    position: list[str | int] = []
+    node = tree
+    for i, component in enumerate(path):
+        if isinstance(node, dict):
+            key: str | int = str(component)
+        elif isinstance(node, list) and isinstance(component, int):
+            if not -len(node) <= component < len(node):
+                raise KeyError(component)
+            key = component % len(node)
+        else:
+            msg = f"cannot set a value under {position}"
+            raise SopsyNativeError(msg)
+        position.append(key)
+        if i < len(path) - 1:
+            node = node.setdefault(key, {}) if isinstance(node, dict) else node[key]
+    current = node.get(key, _MISSING_NODE) if isinstance(node, dict) else node[key]
+    if type(current) is type(value) and current == value:
+        return None
+    node[key] = value
+    return tuple(position)
+
+
+def _reencrypt(
+    plain: Any,  # noqa: ANN401
+    original: Any,  # noqa: ANN401
+    aead: AESGCM,
+    metadata: dict[str, Any],
+    digest: Any,  # noqa: ANN401
+    changed: set[tuple[str | int, ...]],
+    position: tuple[str | int, ...],
+    path: list[str],
+) -> Any:  # noqa: ANN401
+    """Encrypt the changed leaves of a plain tree, reuse the original ones otherwise.
+
+    The MAC digest is updated with all plain values, in sops order.
+    """
+    if position in changed:
+        # everything under a changed path is new
+        original = _MISSING_NODE
+    if isinstance(plain, dict):
+        originals = original if isinstance(original, dict) else {}
+        return {
+            key: _reencrypt(
+                value,
+                originals.get(key, _MISSING_NODE),
+                aead,
+                metadata,
+                digest,
+                changed,
+                (*position, key),
+                [*path, key],
+            )
+            for key, value in plain.items()
+        }
+    if isinstance(plain, list):
+        items = original if isinstance(original, list) else []
+        return [
+            _reencrypt(
+                value,
+                items[i] if i < len(items) else _MISSING_NODE,
+                aead,
+                metadata,
+                digest,
+                changed,
+                (*position, i),
+                path,
+            )
+            for i, value in enumerate(plain)
+        ]
+    if plain is None:
+        return None
+    encrypted = is_encrypted(path, metadata)
+    if encrypted or not metadata.get("mac_only_encrypted"):
+        digest.update(value_to_bytes(plain))
+    if original is not _MISSING_NODE:
+        return original
+    if not encrypted:
+        return plain
+    return encrypt_value(plain, aead, ":".join(path) + ":")
+
+
+def _to_plaintext(value: Any) -> tuple[bytes, str]:  # noqa: ANN401
+    if isinstance(value, bytes):
+        return value, "bytes"
+    if isinstance(value, str):
+        return value.encode(), "str"
+    if isinstance(value, bool):
+        return (b"true" if value else b"false"), "bool"
+    if isinstance(value, int):
+        return str(value).encode(), "int"
+    if isinstance(value, float):
+        return _format_float(value).encode(), "float"
+    msg = f"unsupported value type {type(value).__name__}"
+    raise SopsyNativeError(msg)
+
+
+def _from_plaintext(plaintext: bytes, value_type: str) -> Any:  # noqa: ANN401
+    if value_type == "bytes":
+        return plaintext
+    text = plaintext.decode()
+    if value_type == "str":
+        return text
+    if value_type == "int":
+        return int(text)
+    if value_type == "float":
+        return float(text)
+    if value_type == "bool":
+        return text.lower() == "true"
+    msg = f"unsupported value type {value_type}"
+    raise SopsyNativeError(msg)
+
+
+def _format_float(value: float) -> str:
+    """Format a float as Go `strconv.FormatFloat(value, 'f', -1, 64)` does."""
+    text = format(Decimal(repr(value)), "f")
+    if "." in text:
+        text = text.rstrip("0").rstrip(".")
+    return text
+
+
+def _lastmodified_now() -> str:
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return now.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _age_recipient_key(recipient: str) -> bytes:
+    hrp, key = bech32_decode(recipient)
+    if hrp != AGE_RECIPIENT_HRP or len(key) != 32:  # noqa: PLR2004
+        msg = f"invalid age recipient {recipient}"
+        raise SopsyNativeError(msg)
+    return key
+
+
+def _hkdf(ikm: bytes, salt: bytes, info: bytes) -> bytes:
+    return HKDF(algorithm=hashes.SHA256(), length=32, salt=salt, info=info).derive(ikm)
+
+
+def _b64decode_raw(value: bytes | str) -> bytes:
+    if isinstance(value, str):
+        value = value.encode()
+    try:
+        return base64.b64decode(value + b"=" * (-len(value) % 4), validate=True)
+    except binascii.Error as err:
+        msg = "invalid base64 data"
+        raise SopsyNativeError(msg) from err
+
+
+def _b64encode_raw(value: bytes) -> bytes:
+    return base64.b64encode(value).rstrip(b"=")
+
+
+def _age_wrap(encoded: bytes) -> list[bytes]:
+    """Split a stanza body in lines, the last one is always shorter than a full one."""
+    lines = [encoded[i : i + AGE_COLUMNS] for i in range(0, len(encoded), AGE_COLUMNS)]
+    if not lines or len(lines[-1]) == AGE_COLUMNS:
+        lines.append(b"")
+    return lines
+
+
+def _age_dearmor(armored: str) -> bytes:
+    armored = armored.strip()
+    if not armored.startswith(AGE_ARMOR_BEGIN) or not armored.endswith(AGE_ARMOR_END):
+        msg = "invalid age armor"
+        raise SopsyNativeError(msg)
+    body = armored[len(AGE_ARMOR_BEGIN) : -len(AGE_ARMOR_END)]
+    try:
+        return base64.b64decode("".join(body.split()), validate=True)
+    except binascii.Error as err:
+        msg = "invalid age armor"
+        raise SopsyNativeError(msg) from err
+
+
+def _age_stanzas(lines: list[bytes]) -> list[tuple[list[str], bytes]]:
+    stanzas = []
+    i = 0
+    while i < len(lines):
+        if not lines[i].startswith(b"-> "):
+            msg = "invalid age stanza"
+            raise SopsyNativeError(msg)
+        args = lines[i].decode().split(" ")[1:]
+        body = b""
+        i += 1
+        while i < len(lines):
+            body += lines[i]
+            i += 1
+            if len(lines[i - 1]) < 64:  # noqa: PLR2004
+                break
+        stanzas.append((args, _b64decode_raw(body)))
+    return stanzas
+
+
+def _age_payload_decrypt(file_key: bytes, payload: bytes) -> bytes:
+    nonce, payload = payload[:16], payload[16:]
+    aead = ChaCha20Poly1305(_hkdf(file_key, nonce, b"payload"))
+    chunk_size = AGE_CHUNK_SIZE + 16
+    chunks = [payload[i : i + chunk_size] for i in range(0, len(payload), chunk_size)]
+    out = []
+    for counter, chunk in enumerate(chunks):
+        last = b"\x01" if counter == len(chunks) - 1 else b"\x00"
+        try:
+            out.append(aead.decrypt(counter.to_bytes(11, "big") + last, chunk, None))
+        except InvalidTag as err:
+            msg = "could not decrypt age payload"
+            raise SopsyNativeError(msg) from err
+    return b"".join(out)
+
+
+def _age_payload_encrypt(file_key: bytes, data: bytes) -> bytes:
+    nonce = os.urandom(16)
+    aead = ChaCha20Poly1305(_hkdf(file_key, nonce, b"payload"))
+    chunks = [data[i : i + AGE_CHUNK_SIZE] for i in range(0, len(data), AGE_CHUNK_SIZE)]
+    chunks = chunks or [b""]
+    out = [nonce]
+    for counter, chunk in enumerate(chunks):
+        last = b"\x01" if counter == len(chunks) - 1 else b"\x00"
+        out.append(aead.encrypt(counter.to_bytes(11, "big") + last, chunk, None))
+    return b"".join(out)
+
+
+def _bech32_polymod(values: list[int]) -> int:
+    chk = 1
+    for value in values:
+        top = chk >> 25
+        chk = (chk & 0x1FFFFFF) << 5 ^ value
+        for i, gen in enumerate(_BECH32_GENERATOR):
+            chk ^= gen if (top >> i) & 1 else 0
+    return chk
+
+
+def _bech32_hrp_expand(hrp: str) -> list[int]:
+    return [ord(c) >> 5 for c in hrp] + [0] + [ord(c) & 31 for c in hrp]
+
+
+def _convert_bits(
+    data: list[int], from_bits: int, to_bits: int, *, pad: bool
+) -> list[int]:
+    acc = 0
+    bits = 0
+    out = []
+    maxv = (1 << to_bits) - 1
+    for value in data:
+        acc = (acc << from_bits) | value
+        bits += from_bits
+        while bits >= to_bits:
+            bits -= to_bits
+            out.append((acc >> bits) & maxv)
+    if pad and bits:
+        out.append((acc << (to_bits - bits)) & maxv)
+    elif not pad and (bits >= from_bits or (acc << (to_bits - bits)) & maxv):
+        msg = "invalid bech32 padding"
+        raise SopsyNativeError(msg)
+    return out
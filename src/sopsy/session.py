@@ -0,0 +1,250 @@
+"""SOPSy sessions, backed by a long-running sops key service."""
+
+from __future__ import annotations
+
+import logging
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import TYPE_CHECKING
+from typing import Any
+
+from sopsy.binary import DEFAULT_BINARY
+from sopsy.errors import SopsyCommandFailedError
+from sopsy.errors import SopsyError
+from sopsy.errors import SopsyTimeoutError
+from sopsy.hooks import DEFAULT_MAX_SAMPLES
+from sopsy.hooks import SopsLatency
+from sopsy.utils import run_cmd
+
+if TYPE_CHECKING:
+    from typing_extensions import Self
+
+    from sopsy.sopsy import Sops
+
+DEFAULT_STARTUP_TIMEOUT = 10.0
+DEFAULT_SHUTDOWN_TIMEOUT = 5.0
+DEFAULT_STDERR_LINES = 20
+SOCKET_NAME = "keyservice.sock"
+logger = logging.getLogger(__name__)
+
+
+class SopsSession:
+    """Keep a `sops keyservice` process alive while doing several sops operations.
+
+    The `Sops` objects of the session send their key operations (data key
+    encryption and decryption) to this warm key service, over a unix socket, instead
+    of loading the key material again in each sops process.
+
+    Examples:
+        >>> from sopsy import SopsSession
+        >>> with SopsSession() as session:
+        >>>     session.sops("secrets.json").get("hello")
+        >>>     session.sops("other.json").get("foo")
+        >>>     session.latency()
+        SopsLatency(calls=2, mean=0.031, p50=0.031, p95=0.032, p99=0.032)
+
+    Attributes:
+        bin: Path to the SOPS binary.
+        socket: Path to the key service unix socket.
+        latencies: Duration of the most recent commands run in the session, in
+            seconds, at most `DEFAULT_MAX_SAMPLES` of them.
+    """
+
+    def __init__(
+        self,
+        *,
+        binary_path: str | Path | None = None,
+        startup_timeout: float = DEFAULT_STARTUP_TIMEOUT,
+    ) -> None:
+        """Initialize session object, the key service is started when entering it.
+
+        Args:
+            binary_path: Path to the SOPS binary. If not defined it will search for it
+                in the PATH environment variable.
+            startup_timeout: Number of seconds to wait for the key service to listen.
+        """
+        self.bin: Path = Path(binary_path) if binary_path else Path(DEFAULT_BINARY)
+        self.startup_timeout: float = startup_timeout
+        self.socket: Path | None = None
+        self.latencies: deque[float] = deque(maxlen=DEFAULT_MAX_SAMPLES)
+        self._proc: subprocess.Popen[bytes] | None = None
+        self._stderr: deque[bytes] = deque(maxlen=DEFAULT_STDERR_LINES)
+        self._reader: threading.Thread | None = None
+        self._dir: Path | None = None
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> Self:
+        """Start the key service."""
+        self.start()
+        return self
+
+    def __exit__(self, *_args: object) -> None:
+        """Stop the key service."""
+        self.stop()
+
+    @property
+    def args(self) -> list[str]:
+        """Return the sops arguments pointing a command at the key service."""
+        if self.socket is None:
+            msg = "session is not started"
+            raise SopsyError(msg)
+        return [
+            "--keyservice",
+            f"unix://{self.socket}",
+            "--enable-local-keyservice=false",
+        ]
+
+    def start(self) -> None:
+        """Start the key service and wait for it to listen on its socket.
+
+        Raises:
+            SopsyCommandFailedError: The key service exited during startup.
+            SopsyTimeoutError: The key service did not listen in time.
+        """
+        if self._proc is not None:
+            return
+        self._dir = Path(tempfile.mkdtemp(prefix="sopsy-"))
+        socket = self._dir / SOCKET_NAME
+        cmd = [str(self.bin), "keyservice", "--network", "unix", "--address", socket]
+        logger.debug("start keyservice: %s", cmd)
+        self._proc = subprocess.Popen(  # noqa: S603
+            [str(arg) for arg in cmd],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        # a full pipe would block the key service, its output is always read
+        self._stderr.clear()
+        self._reader = threading.Thread(
+            target=self._read_stderr, args=(self._proc,), daemon=True
+        )
+        self._reader.start()
+        deadline = time.monotonic() + self.startup_timeout
+        while not socket.exists():
+            if self._proc.poll() is not None:
+                self._reader.join(DEFAULT_SHUTDOWN_TIMEOUT)
+                stderr = b"".join(self._stderr)
+                self.stop()
+                raise SopsyCommandFailedError(stderr.decode())
+            if time.monotonic() > deadline:
+                self.stop()
+                msg = f"sops keyservice not ready after {self.startup_timeout} seconds"
+                raise SopsyTimeoutError(msg)
+            time.sleep(0.01)
+        self.socket = socket
+
+    def stop(self) -> None:
+        """Stop the key service and remove its socket."""
+        proc, self._proc = self._proc, None
+        if proc is not None:
+            proc.terminate()
+            try:
+                _ = proc.wait(DEFAULT_SHUTDOWN_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                _ = proc.wait()
+        reader, self._reader = self._reader, None
+        if reader is not None:
+            reader.join(DEFAULT_SHUTDOWN_TIMEOUT)
+        if self._dir is not None:
+            shutil.rmtree(self._dir, ignore_errors=True)
+        self._dir = None
+        self.socket = None
+
+    def _read_stderr(self, proc: subprocess.Popen[bytes]) -> None:
+        """Log the key service output, keeping its last lines for error reports."""
+        assert proc.stderr is not None  # noqa: S101
+        with proc.stderr:
+            for line in proc.stderr:
+                self._stderr.append(line)
+                logger.debug("keyservice: %s", line.decode(errors="replace").rstrip())
+
+    def sops(self, file: str | Path | bytes, **kwargs: Any) -> Sops:  # noqa: ANN401
+        """Return a `Sops` object using this session.
+
+        Args:
+            file: Path to the SOPS file or content to encrypt/decrypt.
+            **kwargs: Arguments passed to the `Sops` object.
+
+        Returns:
+            The `Sops` object.
+        """
+        from sopsy.sopsy import Sops  # noqa: PLC0415
+
+        return Sops(file, binary_path=self.bin, session=self, **kwargs)
+
+    def run_cmd(
+        self,
+        cmd: list[str],
+        *,
+        to_dict: bool,
+        input_data: str | bytes | None = None,
+        file: str | None = None,
+        timeout: float | None = None,
+        retries: int = 0,
+        env: dict[str, str] | None = None,
+    ) -> str | bytes | dict[str, Any] | None:
+        """Run the given SOPS command and record its latency."""
+        start = time.perf_counter()
+        try:
+            return run_cmd(
+                cmd,
+                to_dict=to_dict,
+                input_data=input_data,
+                file=file,
+                timeout=timeout,
+                retries=retries,
+                env=env,
+            )
+        finally:
+            with self._lock:
+                self.latencies.append(time.perf_counter() - start)
+
+    def latency(self) -> SopsLatency:
+        """Return the latency of the commands run in this session so far."""
+        with self._lock:
+            return SopsLatency.from_samples(list(self.latencies))
+
+    def compare(
+        self,
+        file: str | Path,
+        *,
+        runs: int = 5,
+        **kwargs: Any,  # noqa: ANN401
+    ) -> dict[str, SopsLatency]:
+        """Measure the decryption latency of a file with and without the session.
+
+        Examples:
+            >>> from sopsy import SopsSession
+            >>> with SopsSession() as session:
+            >>>     session.compare("secrets.json", runs=10)
+            {'session': SopsLatency(...), 'standalone': SopsLatency(...)}
+
+        Args:
+            file: Path to the SOPS file to decrypt.
+            runs: Number of decryptions measured in each mode.
+            **kwargs: Arguments passed to the `Sops` objects.
+
+        Returns:
+            The latencies, with (`session`) and without (`standalone`) the session.
+        """
+        from sopsy.sopsy import Sops  # noqa: PLC0415
+
+        modes = {
+            "session": self.sops(file, **kwargs),
+            "standalone": Sops(file, binary_path=self.bin, **kwargs),
+        }
+        results = {}
+        for mode, sops in modes.items():
+            samples = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                _ = sops.decrypt(to_dict=False)
+                samples.append(time.perf_counter() - start)
+            results[mode] = SopsLatency.from_samples(samples)
+        return results
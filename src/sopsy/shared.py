@@ -0,0 +1,230 @@
+"""SOPSy preloading, sharing decrypted secrets with forked worker processes."""
+
+from __future__ import annotations
+
+import copy
+import mmap
+import pickle
+import struct
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING
+from typing import Any
+from typing import Mapping
+
+from sopsy.errors import SopsyError
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from typing_extensions import Self
+
+# generation, then the payload length of each of the two slots
+_HEADER = struct.Struct("<QQQ")
+MIN_CAPACITY = 64 * 1024
+
+# the store read by `Sops` objects, installed by `preload()`
+active: SopsPreload | None = None
+
+
+class SopsPreload:
+    """Decrypted SOPS files, shared with the processes forked after it is filled.
+
+    The decrypted content is pickled once into an anonymous shared memory
+    mapping, so values keep their types (bytes, dates...). Forked processes
+    inherit it, and `Sops` objects read it instead of running sops. A refresh in
+    the parent process is seen by every child.
+
+    The mapping holds two slots: a writer fills the unused one then bumps the
+    generation, readers retry if the generation changed while they were copying
+    (a seqlock), so they never lock nor see a partial write. Each process decodes
+    a generation once.
+
+    Attributes:
+        files: Absolute paths of the preloaded files.
+        capacity: Maximum size of the serialized secrets, in bytes.
+    """
+
+    def __init__(
+        self,
+        files: Iterable[str | Path],
+        *,
+        capacity: int | None = None,
+        **sops_kwargs: Any,  # noqa: ANN401
+    ) -> None:
+        """Initialize preload object, files are decrypted on refresh.
+
+        Args:
+            files: Paths to the SOPS files to preload.
+            capacity: Maximum size of the serialized secrets, in bytes. If not set,
+                twice the size of the first refresh, at least `MIN_CAPACITY`.
+            **sops_kwargs: Arguments passed to each `Sops` object.
+        """
+        self.files: list[Path] = [Path(f).absolute() for f in files]
+        self.capacity: int | None = capacity
+        self._sops_kwargs = sops_kwargs
+        self._lock = threading.Lock()
+        self._mmap: mmap.mmap | None = None
+        self._decoded: tuple[int, dict[str, Any]] = (0, {})
+
+    def __enter__(self) -> Self:
+        """Return the preload object."""
+        return self
+
+    def __exit__(self, *_args: object) -> None:
+        """Release the shared memory."""
+        self.close()
+
+    @property
+    def generation(self) -> int:
+        """Return the number of times secrets were published."""
+        if self._mmap is None:
+            return 0
+        return int(_HEADER.unpack_from(self._mmap)[0])
+
+    def get(self, file: str | Path) -> Any:  # noqa: ANN401
+        """Return a copy of the decrypted content of a preloaded file, or None."""
+        return copy.deepcopy(self.lookup(file))
+
+    def lookup(self, file: str | Path) -> Any:  # noqa: ANN401
+        """Return the decrypted content of a preloaded file, or None.
+
+        The returned value is shared by the callers, it must not be modified.
+        """
+        return self.secrets().get(str(Path(file).absolute()))
+
+    def secrets(self) -> dict[str, Any]:
+        """Return the decrypted content of the preloaded files, by absolute path.
+
+        The returned dict is shared by the callers of the same generation, it must
+        not be modified.
+        """
+        buf = self._mmap
+        if buf is None:
+            return {}
+        while True:
+            generation, *lengths = _HEADER.unpack_from(buf)
+            if generation == self._decoded[0]:
+                return self._decoded[1]
+            start = _HEADER.size + generation % 2 * self._slot_size(buf)
+            data = buf[start : start + lengths[generation % 2]]
+            if _HEADER.unpack_from(buf)[0] == generation:
+                break
+        # only this process and its parent wrote to the mapping
+        secrets = pickle.loads(data) if data else {}  # noqa: S301
+        self._decoded = (generation, secrets)
+        return secrets
+
+    def refresh(self) -> int:
+        """Decrypt the files again, and publish their content to all processes.
+
+        Returns:
+            The new generation.
+
+        Raises:
+            SopsyError: A file could not be decrypted, or the secrets exceed the
+                capacity. The previous content stays published.
+        """
+        from sopsy.batch import decrypt_many  # noqa: PLC0415
+
+        secrets: dict[str | Path, Any] = {}
+        results = decrypt_many(self.files, preloaded=False, **self._sops_kwargs)
+        for result in results:
+            if result.error is not None:
+                raise result.error
+            secrets[result.file] = result.output
+        return self.publish(secrets)
+
+    def publish(self, secrets: Mapping[str | Path, Any]) -> int:
+        """Publish new decrypted content for some files to all processes.
+
+        Files missing from `secrets` keep their current content, which makes this
+        a suitable `SopsWatcher` subscriber.
+
+        Args:
+            secrets: Decrypted content of the files, by path.
+
+        Returns:
+            The new generation.
+
+        Raises:
+            SopsyError: The secrets exceed the capacity.
+        """
+        with self._lock:
+            merged = {
+                **self.secrets(),
+                **{str(Path(f).absolute()): v for f, v in secrets.items()},
+            }
+            data = pickle.dumps(merged, protocol=pickle.HIGHEST_PROTOCOL)
+            buf = self._mmap
+            if buf is None:
+                self.capacity = self.capacity or max(2 * len(data), MIN_CAPACITY)
+                buf = self._mmap = mmap.mmap(-1, _HEADER.size + 2 * self.capacity)
+            if len(data) > self._slot_size(buf):
+                msg = (
+                    f"preloaded secrets take {len(data)} bytes, "
+                    f"more than the {self.capacity} bytes capacity"
+                )
+                raise SopsyError(msg)
+            generation, *lengths = _HEADER.unpack_from(buf)
+            generation += 1
+            slot = generation % 2
+            start = _HEADER.size + slot * self._slot_size(buf)
+            buf[start : start + len(data)] = data
+            # the slot length first, the generation last: it publishes the slot
+            struct.pack_into("<Q", buf, 8 + 8 * slot, len(data))
+            struct.pack_into("<Q", buf, 0, generation)
+            self._decoded = (generation, merged)
+        return generation
+
+    def close(self) -> None:
+        """Release the shared memory, and stop serving `Sops` objects from it."""
+        global active  # noqa: PLW0603
+        if active is self:
+            active = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._decoded = (0, {})
+
+    @staticmethod
+    def _slot_size(buf: mmap.mmap) -> int:
+        return (len(buf) - _HEADER.size) // 2
+
+
+def preload(
+    files: Iterable[str | Path],
+    *,
+    capacity: int | None = None,
+    **sops_kwargs: Any,  # noqa: ANN401
+) -> SopsPreload:
+    """Decrypt SOPS files once, and serve them to `Sops` objects of this process.
+
+    Call it in the parent process of a pre-fork server (gunicorn, uWSGI...) before
+    workers are forked: they inherit the secrets, and `Sops.decrypt()`, `get()`...
+    of the preloaded files read them without running sops. Calling `refresh()` in
+    the parent process publishes new values to all workers.
+
+    Examples:
+        >>> import sopsy
+        >>> store = sopsy.preload(["secrets.json"])
+        >>> sopsy.Sops("secrets.json").get("hello")  # no sops process
+        'world'
+        >>> store.refresh()
+        2
+
+    Args:
+        files: Paths to the SOPS files to preload.
+        capacity: Maximum size of the serialized secrets, in bytes.
+        **sops_kwargs: Arguments passed to each `Sops` object.
+
+    Returns:
+        The preloaded secrets, now used by `Sops` objects.
+    """
+    global active  # noqa: PLW0603
+    store = SopsPreload(files, capacity=capacity, **sops_kwargs)
+    _ = store.refresh()
+    if active is not None:
+        active.close()
+    active = store
+    return store
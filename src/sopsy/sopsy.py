@@ -2,18 +2,93 @@
 
 from __future__ import annotations
 
-import shutil
-import tempfile
+import copy
+import json
+import logging
+import os
+import re
+import shlex
+import time
 from enum import Enum
 from pathlib import Path
+from typing import TYPE_CHECKING
 from typing import Any
 
-import yaml
-
+from sopsy import hooks
+from sopsy import shared
+from sopsy.binary import SopsBinaryInfo
+from sopsy.binary import binary_info
+from sopsy.binary import resolve_binary
+from sopsy.cache import DecryptCache
+from sopsy.cache import file_key
+from sopsy.config import SopsConfig
+from sopsy.errors import SopsyCommandFailedError
 from sopsy.errors import SopsyCommandNotFoundError
 from sopsy.errors import SopsyError
-from sopsy.utils import build_config
+from sopsy.errors import SopsyTimeoutError
+from sopsy.utils import STREAM_CHUNK_SIZE
+from sopsy.utils import atomic_write
+from sopsy.utils import config_args
+from sopsy.utils import exec_cmd
+from sopsy.utils import extract_expr
+from sopsy.utils import json_loads
+from sopsy.utils import lookup_path
+from sopsy.utils import parse_path
 from sopsy.utils import run_cmd
+from sopsy.utils import stream_cmd
+from sopsy.utils import yaml_dump
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from collections.abc import Sequence
+    from typing import BinaryIO
+
+    from sopsy.session import SopsSession
+    from sopsy.utils import SopsyExecResult
+
+logger = logging.getLogger(__name__)
+
+_NATIVE_EXTENSIONS = {".json": "json", ".yaml": "yaml", ".yml": "yaml"}
+_MISSING = object()
+# sops arguments followed by a value, the other ones are flags
+_VALUE_OPTIONS = {
+    "--extract",
+    "--input-type",
+    "--keyservice",
+    "--output",
+    "--output-type",
+}
+# sops output options, left out by the commands choosing their own output
+_OUTPUT_OPTIONS = {"--extract", "--in-place", "--output", "--output-type"}
+# run by sops edit as the editor of the decrypted file: sets the values read from
+# stdin as JSON, then writes the file back in its format
+_EDITOR_SCRIPT = """
+import json
+import sys
+
+import yaml
+
+fmt, path = sys.argv[1:]
+with open(path) as fp:
+    tree = json.load(fp) if fmt == "json" else yaml.safe_load(fp)
+for keys, value in json.load(sys.stdin):
+    node = tree
+    for key in keys[:-1]:
+        node = node.setdefault(str(key), {}) if isinstance(node, dict) else node[key]
+    node[str(keys[-1]) if isinstance(node, dict) else keys[-1]] = value
+with open(path, "w") as fp:
+    if fmt == "json":
+        json.dump(tree, fp, indent=4, ensure_ascii=False)
+    else:
+        yaml.safe_dump(tree, fp, sort_keys=False, allow_unicode=True)
+"""
+# sops edit error when the content did not change
+_EDIT_UNCHANGED = re.compile(r"file has not changed", re.IGNORECASE)
+# sops decrypt --extract errors telling the path does not exist
+_EXTRACT_NOT_FOUND = re.compile(
+    r"component \[.*\] not found|invalid array index|index .* out of (?:bounds|range)",
+    re.IGNORECASE,
+)
 
 
 class SopsyInOutType(Enum):
@@ -24,12 +99,14 @@ class SopsyInOutType(Enum):
     Attributes:
         BINARY (str): Binary type.
         DOTENV (str): DotEnv type.
+        INI (str): INI type.
         JSON (str): JSON type.
         YAML (str): YAML type.
     """
 
     BINARY = "binary"
     DOTENV = "dotenv"
+    INI = "ini"
     JSON = "json"
     YAML = "yaml"
 
@@ -62,9 +139,16 @@ class Sops:
             command. It can be used to customize it. Use it only if you know what you
             are doing.
         input_source: Wether input data come from a file or stdin.
+        cache: Cache of decrypted documents, if any.
+        native: Wether to decrypt in-process when possible, never with a session.
+        session: Session the sops commands are run in, if any.
+        preloaded: Wether to read the secrets loaded by `sopsy.preload()`.
+        timeout: Default number of seconds after which a sops command is killed.
+        retries: Number of times a sops command failing with a transient error is
+            run again.
     """
 
-    def __init__(  # noqa: C901
+    def __init__(  # noqa: C901, PLR0913
         self,
         file: str | Path | bytes,
         *,
@@ -77,6 +161,12 @@ class Sops:
         output: str | Path | None = None,
         output_type: str | SopsyInOutType | None = None,
         input_source: SopsyInputSource = SopsyInputSource.FILE,
+        cache: DecryptCache | None = None,
+        native: bool = False,
+        session: SopsSession | None = None,
+        preloaded: bool = True,
+        timeout: float | None = None,
+        retries: int = 0,
     ) -> None:
         """Initialize SOPS object.
 
@@ -104,11 +194,37 @@ class Sops:
             binary_path: Path to the SOPS binary. If not defined it will search for it
                 in the PATH environment variable.
             input_source: Wether input data come from a file or stdin.
+            cache: Cache decrypted documents in memory, it can be shared between
+                several `Sops` objects.
+            native: Decrypt and encrypt age encrypted JSON and YAML documents
+                in-process instead of running the `sops` binary, it requires the
+                `sopsy[native]` extra. It falls back to the `sops` binary for
+                unsupported documents. It is not used with a session.
+            session: Run the sops commands in the given session, sending key
+                operations to its key service. The native engine is then not used,
+                as its key operations would bypass the key service.
+            preloaded: Read the decrypted content of files loaded by
+                `sopsy.preload()` instead of running sops.
+            timeout: Default number of seconds after which a sops command is killed,
+                with the processes it started.
+            retries: Number of times a sops command failing with a transient error
+                (KMS network errors, throttling...) is run again, after a jittered
+                backoff.
         """
         self.bin: Path = Path(binary_path) if binary_path else Path("sops")
         self.file: str | Path | bytes = file
         self.global_args: list[str] = []
         self.input_source: SopsyInputSource = input_source
+        self.cache: DecryptCache | None = cache
+        self.native: bool = native and session is None
+        if native and session is not None:
+            logger.info("native engine not used, key operations go to the session")
+        self.session: SopsSession | None = session
+        self.preloaded: bool = preloaded
+        self.timeout: float | None = timeout
+        self.retries: int = retries
+        if session:
+            self.global_args.extend(session.args)
         if extract:
             self.global_args.extend(["--extract", extract])
         if in_place:
@@ -123,13 +239,9 @@ class Sops:
 
         if isinstance(config, str):
             config = Path(config)
-        if config_dict is None:
-            config_dict = {}
-        config_dict = build_config(config_path=config, config_dict=config_dict)
-        with tempfile.NamedTemporaryFile(mode="w", delete=False) as fp:
-            yaml.dump(config_dict, fp)
-            config_tmp = fp.name
-        self.config: list[str] = ["--config", config_tmp]
+        self.config: list[str] = config_args(
+            config_path=config, config_dict=config_dict
+        )
 
         if input_source == SopsyInputSource.STDIN and not input_type:
             msg = "When using stdin source, input MUST be specified"
@@ -139,14 +251,21 @@ class Sops:
             msg = "Path type cannot be used with stdin input source."
             raise SopsyError(msg)
 
-        if not shutil.which(self.bin):
+        if resolve_binary(self.bin) is None:
             msg = (
                 f"{self.bin} command not found, "
                 "you may need to install it and/or add it to your PATH"
             )
             raise SopsyCommandNotFoundError(msg)
 
-    def decrypt(self, *, to_dict: bool = True) -> str | bytes | dict[str, Any] | None:
+    @property
+    def binary_info(self) -> SopsBinaryInfo:
+        """Return the description of the sops binary, probed once per process."""
+        return binary_info(self.bin)
+
+    def decrypt(
+        self, *, to_dict: bool = True, timeout: float | None = None
+    ) -> str | bytes | dict[str, Any] | None:
         """Decrypt SOPS file.
 
         Examples:
@@ -157,23 +276,28 @@ class Sops:
 
         Args:
             to_dict: Return the output as a Python dict.
+            timeout: Number of seconds after which the sops command is killed.
 
         Returns:
             The output of the sops command.
         """
-        cmd = [str(self.bin), *self.config, "decrypt", *self.global_args]
-        if self.input_source == SopsyInputSource.STDIN:
-            cmd.extend(["--filename-override", f"dummy.{self.input_type}"])
-            input_data = self.file
-            assert not isinstance(input_data, Path)  # noqa: S101
-        else:
-            cmd.append(str(self.file))
-            input_data = None
-        return run_cmd(cmd, to_dict=to_dict, input_data=input_data)
+        cache_key, out = self._decrypt_local(to_dict=to_dict)
+        if out is None:
+            cmd, input_data = self._build_cmd("decrypt")
+            out = self._run_cmd(
+                cmd, to_dict=to_dict, input_data=input_data, timeout=timeout
+            )
+        self._cache_store(cache_key, out)
+        return out
 
-    def encrypt(self, *, to_dict: bool = True) -> str | bytes | dict[str, Any] | None:
+    def encrypt(
+        self, *, to_dict: bool = True, timeout: float | None = None
+    ) -> str | bytes | dict[str, Any] | None:
         """Encrypt SOPS file.
 
+        With the native engine, JSON and YAML documents are encrypted in-process for
+        the age recipients of `SOPS_AGE_RECIPIENTS` or of the matching creation rule.
+
         Examples:
             >>> import json
             >>> from pathlib import Path
@@ -185,23 +309,95 @@ class Sops:
 
         Args:
             to_dict: Return the output as a Python dict.
+            timeout: Number of seconds after which the sops command is killed.
 
         Returns:
             The output of the sops command.
         """
-        cmd = [str(self.bin), *self.config, "encrypt", *self.global_args]
-        if self.input_source == SopsyInputSource.STDIN:
-            cmd.extend(["--filename-override", f"dummy.{self.input_type}"])
-            input_data = self.file
-            assert not isinstance(input_data, Path)  # noqa: S101
-        else:
-            cmd.append(str(self.file))
-            input_data = None
-        return run_cmd(cmd, to_dict=to_dict, input_data=input_data)
+        out = self._native_encrypt(to_dict=to_dict)
+        if out is not _MISSING:
+            return out
+        cmd, input_data = self._build_cmd("encrypt")
+        return self._run_cmd(
+            cmd, to_dict=to_dict, input_data=input_data, timeout=timeout
+        )
+
+    def decrypt_stream(
+        self,
+        src: BinaryIO | Iterable[bytes] | None,
+        dst: BinaryIO,
+        *,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+        timeout: float | None = None,
+    ) -> int:
+        """Decrypt SOPS content, streaming it in fixed-size buffers.
+
+        Examples:
+            >>> from sopsy import Sops
+            >>> with open("backup.tar.gz", "wb") as dst:
+            >>>     Sops("backup.tar.gz.enc", input_type="binary").decrypt_stream(
+            >>>         None, dst
+            >>>     )
+
+        Args:
+            src: Binary file-like object or iterable of bytes chunks to decrypt. If not
+                set, the SOPS file, or the content given with a stdin input source,
+                is decrypted.
+            dst: Binary file-like object the decrypted content is written to.
+            chunk_size: Size of the buffers, in bytes.
+            timeout: Number of seconds after which the sops command is killed.
+
+        Returns:
+            The number of bytes written to `dst`.
+        """
+        cmd, src = self._build_stream_cmd("decrypt", src)
+        return self._stream_cmd(cmd, dst, src, chunk_size=chunk_size, timeout=timeout)
+
+    def encrypt_stream(
+        self,
+        src: BinaryIO | Iterable[bytes] | None,
+        dst: BinaryIO,
+        *,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+        timeout: float | None = None,
+    ) -> int:
+        """Encrypt content, streaming it in fixed-size buffers.
+
+        Examples:
+            >>> from sopsy import Sops, SopsyInputSource
+            >>> sops = Sops(
+            >>>     b"", input_source=SopsyInputSource.STDIN, input_type="binary"
+            >>> )
+            >>> with open("backup.tar.gz", "rb") as src:
+            >>>     with open("backup.tar.gz.enc", "wb") as dst:
+            >>>         sops.encrypt_stream(src, dst)
+
+        Args:
+            src: Binary file-like object or iterable of bytes chunks to encrypt. If not
+                set, the SOPS file, or the content given with a stdin input source,
+                is encrypted.
+            dst: Binary file-like object the encrypted content is written to.
+            chunk_size: Size of the buffers, in bytes.
+            timeout: Number of seconds after which the sops command is killed.
+
+        Returns:
+            The number of bytes written to `dst`.
+        """
+        cmd, src = self._build_stream_cmd("encrypt", src)
+        return self._stream_cmd(cmd, dst, src, chunk_size=chunk_size, timeout=timeout)
 
-    def get(self, key: str, *, default: Any = None) -> Any:  # noqa: ANN401
+    def get(
+        self,
+        key: str,
+        *,
+        default: Any = None,  # noqa: ANN401
+        verify_mac: bool = False,
+        timeout: float | None = None,
+    ) -> Any:  # noqa: ANN401
         """Get a specific key from a SOPS encrypted file.
 
+        With the native engine, only the values of the given key are decrypted.
+
         Examples:
             >>> from sopsy import Sops
             >>> sops = Sops("secrets.json")
@@ -213,14 +409,211 @@ class Sops:
         Args:
             key: The key to fetch in the SOPS file content.
             default: A default value in case the key does not exist or is empty.
+            verify_mac: Check the file integrity with the native engine, it requires
+                to decrypt the whole file. The `sops` binary always checks it.
+            timeout: Number of seconds after which the sops command is killed.
 
         Returns:
             The value of the given key, or the default value.
         """
-        data: dict[Any, Any] = self.decrypt()  # type: ignore[assignment]
-        return data.get(key) or default
+        return self.get_path(
+            [key], default=default, verify_mac=verify_mac, timeout=timeout
+        )
+
+    def get_path(
+        self,
+        path: str | list[str | int],
+        *,
+        default: Any = None,  # noqa: ANN401
+        verify_mac: bool = False,
+        timeout: float | None = None,
+    ) -> Any:  # noqa: ANN401
+        """Get a nested value from a SOPS encrypted file.
+
+        With the native engine, only the values found at the given path are
+        decrypted, otherwise the `sops --extract` option is used.
+
+        Examples:
+            >>> from sopsy import Sops
+            >>> sops = Sops("secrets.yaml")
+            >>> sops.get_path("database.password")
+            's3cr3t'
+            >>> sops.get_path("/database/hosts/0")
+            'db1.example.com'
+
+        Args:
+            path: Dotted path (`a.b.0`), JSON pointer (`/a/b/0`) or list of keys.
+            default: A default value in case the path does not exist or is empty.
+            verify_mac: Check the file integrity with the native engine, it requires
+                to decrypt the whole file. The `sops` binary always checks it.
+            timeout: Number of seconds after which the sops command is killed.
+
+        Returns:
+            The value found at the given path, or the default value.
+        """
+        components = parse_path(path)
+        try:
+            value = self._get_path(components, verify_mac=verify_mac, timeout=timeout)
+        except KeyError:
+            return default
+        return value or default
+
+    def as_environ(self, *, overwrite: bool = True) -> dict[str, str]:
+        """Decrypt SOPS file and export its top-level values to `os.environ`.
+
+        Examples:
+            >>> import os
+            >>> from sopsy import Sops
+            >>> Sops("secrets.env").as_environ()
+            {'HELLO': 'world'}
+            >>> os.environ["HELLO"]
+            'world'
+
+        Args:
+            overwrite: Replace the variables already set in the environment.
+
+        Returns:
+            The variables set in the environment.
+
+        Raises:
+            SopsyError: A value is a mapping or a list.
+        """
+        return _export_environ(self.decrypt(), overwrite=overwrite)
+
+    def exec_env(
+        self,
+        command: str | Sequence[str],
+        *,
+        pristine: bool = False,
+        user: str | None = None,
+        timeout: float | None = None,
+        capture_output: bool = False,
+    ) -> SopsyExecResult:
+        """Run a command with the decrypted top-level values in its environment.
+
+        The command is run by `sops exec-env`: the secrets are never decrypted in
+        this process.
+
+        Examples:
+            >>> from sopsy import Sops
+            >>> result = Sops("secrets.env").exec_env(["./manage.py", "migrate"])
+            >>> result.returncode, result.elapsed
+            (0, 1.42)
+
+        Args:
+            command: The command, run by a shell if it is a string.
+            pristine: Do not inherit the environment of this process.
+            user: Run the command as this user.
+            timeout: Number of seconds after which the command is terminated.
+            capture_output: Capture the command output instead of inheriting the
+                standard output and error of this process.
+
+        Returns:
+            The exit status and timings of the command.
+        """
+        options = ["--pristine"] if pristine else []
+        return self._exec("exec-env", options, command, user, timeout, capture_output)
+
+    def exec_file(
+        self,
+        command: str | Sequence[str],
+        *,
+        fifo: bool = True,
+        filename: str | None = None,
+        user: str | None = None,
+        timeout: float | None = None,
+        capture_output: bool = False,
+    ) -> SopsyExecResult:
+        """Run a command reading the decrypted content from a file.
+
+        The command is run by `sops exec-file`, `{}` in the command is replaced
+        with the path of the file, a FIFO by default: the secrets are never
+        decrypted in this process, nor written to disk.
+
+        Examples:
+            >>> from sopsy import Sops
+            >>> Sops("kubeconfig.yaml").exec_file("kubectl --kubeconfig {} apply -f .")
+            SopsyExecResult(command='kubectl --kubeconfig {} apply -f .', ...)
+
+        Args:
+            command: The command, run by a shell if it is a string.
+            fifo: Pass the content through a FIFO, read once. Otherwise it is written
+                to a temporary file removed when the command exits.
+            filename: Name of the file, to give it an extension the command expects.
+            user: Run the command as this user.
+            timeout: Number of seconds after which the command is terminated.
+            capture_output: Capture the command output instead of inheriting the
+                standard output and error of this process.
+
+        Returns:
+            The exit status and timings of the command.
+        """
+        options = [] if fifo else ["--no-fifo"]
+        if filename:
+            options.extend(["--filename", filename])
+        for flag in ("--input-type", "--output-type"):
+            if flag in self.global_args:
+                index = self.global_args.index(flag)
+                options.extend(self.global_args[index : index + 2])
+        return self._exec("exec-file", options, command, user, timeout, capture_output)
+
+    def set(self, key: str | tuple[str | int, ...], value: Any) -> None:  # noqa: ANN401
+        """Set a value in the SOPS file, see `update()`.
+
+        Examples:
+            >>> from sopsy import Sops
+            >>> sops = Sops("secrets.json", native=True)
+            >>> sops.set("hello", "world")
+            >>> sops.set(("database", "password"), "s3cr3t")
 
-    def rotate(self, *, to_dict: bool = True) -> str | bytes | dict[str, Any] | None:
+        Args:
+            key: The key to set, or a tuple of keys (and list indexes) leading to it.
+            value: The value to set.
+        """
+        self.update({key: value})
+
+    def update(self, mapping: dict[str | tuple[str | int, ...], Any]) -> None:
+        """Set several values in the SOPS file.
+
+        With `native`, age encrypted JSON files are updated in-process: unchanged
+        `ENC[...]` values stay byte-for-byte identical, the changed ones are
+        encrypted under the existing data key, and the MAC is recomputed.
+
+        Otherwise sops decrypts and re-encrypts the whole file, with new IVs for
+        all the values. JSON and YAML files are updated with a single `sops edit`
+        run, whatever the number of values, and replaced atomically; YAML comments
+        are not kept. Values in other formats are set one by one with `sops set`,
+        each of them re-encrypting and rewriting the whole file in place.
+
+        Args:
+            mapping: Keys, or tuples of keys (and list indexes) leading to them, and
+                the values to set.
+
+        Raises:
+            SopsyError: The values must be set with sops, and it is older than 3.9,
+                or a key is empty.
+        """
+        changes: list[tuple[list[str | int], Any]] = []
+        for key, value in mapping.items():
+            path: list[str | int] = [key] if isinstance(key, str) else list(key)
+            if not path:
+                msg = "cannot set the document root"
+                raise SopsyError(msg)
+            changes.append((path, value))
+        if not self._native_update(changes) and not self._edit_update(changes):
+            self.binary_info.require("set --value-stdin")
+            # sops set edits the file in place, and has no output options
+            args = _without_options(self.global_args, _OUTPUT_OPTIONS)
+            for path, value in changes:
+                cmd = [str(self.bin), *self.config, "set", *args]
+                cmd.extend(["--value-stdin", str(self.file), extract_expr(path)])
+                _ = self._run_cmd(cmd, to_dict=False, input_data=json.dumps(value))
+        if self.cache is not None and isinstance(self.file, (str, Path)):
+            self.cache.invalidate(self.file)
+
+    def rotate(
+        self, *, to_dict: bool = True, timeout: float | None = None
+    ) -> str | bytes | dict[str, Any] | None:
         """Rotate encryption keys and re-encrypt values from SOPS file.
 
         Examples:
@@ -230,9 +623,522 @@ class Sops:
 
         Args:
             to_dict: Return the output as a Python dict.
+            timeout: Number of seconds after which the sops command is killed.
 
         Returns:
             The output of the sops command.
         """
         cmd = [str(self.bin), *self.config, "rotate", *self.global_args, str(self.file)]
-        return run_cmd(cmd, to_dict=to_dict)
+        return self._run_cmd(cmd, to_dict=to_dict, timeout=timeout)
+
+    def _exec(
+        self,
+        subcommand: str,
+        options: list[str],
+        command: str | Sequence[str],
+        user: str | None,
+        timeout: float | None,
+        capture_output: bool,  # noqa: FBT001
+    ) -> SopsyExecResult:
+        """Run a command through the given sops exec subcommand."""
+        if self.input_source != SopsyInputSource.FILE:
+            msg = f"sops {subcommand} requires a file input source"
+            raise SopsyError(msg)
+        if not isinstance(command, str):
+            command = shlex.join(command)
+        session_args = self.session.args if self.session else []
+        cmd = [str(self.bin), *self.config, subcommand, *session_args, *options]
+        if user:
+            cmd.extend(["--user", user])
+        cmd.extend([str(self.file), command])
+        return exec_cmd(
+            cmd,
+            file=str(self.file),
+            timeout=self.timeout if timeout is None else timeout,
+            capture_output=capture_output,
+        )
+
+    def _run_cmd(
+        self,
+        cmd: list[str],
+        *,
+        to_dict: bool,
+        input_data: str | bytes | None = None,
+        timeout: float | None = None,
+        env: dict[str, str] | None = None,
+    ) -> str | bytes | dict[str, Any] | None:
+        """Run the given sops command, in the session if any."""
+        runner = run_cmd if self.session is None else self.session.run_cmd
+        return runner(
+            cmd,
+            to_dict=to_dict,
+            input_data=input_data,
+            file=self._event_file(),
+            timeout=self.timeout if timeout is None else timeout,
+            retries=self.retries,
+            env=env,
+        )
+
+    def _stream_cmd(
+        self,
+        cmd: list[str],
+        dst: BinaryIO,
+        src: BinaryIO | Iterable[bytes] | None,
+        *,
+        chunk_size: int,
+        timeout: float | None,
+    ) -> int:
+        """Run the given sops command, streaming its input and output."""
+        return stream_cmd(
+            cmd,
+            dst,
+            src,
+            chunk_size=chunk_size,
+            file=self._event_file(),
+            timeout=self.timeout if timeout is None else timeout,
+            retries=self.retries,
+        )
+
+    def _event_file(self) -> str | None:
+        """Return the SOPS file path reported to the hooks, if any."""
+        if self.input_source == SopsyInputSource.FILE:
+            return str(self.file)
+        return None
+
+    def _build_cmd(self, subcommand: str) -> tuple[list[str], str | bytes | None]:
+        """Build the sops command and its input data for the given subcommand."""
+        cmd = [str(self.bin), *self.config, subcommand, *self.global_args]
+        if self.input_source == SopsyInputSource.STDIN:
+            cmd.extend(["--filename-override", f"dummy.{self.input_type}"])
+            input_data = self.file
+            assert not isinstance(input_data, Path)  # noqa: S101
+        else:
+            cmd.append(str(self.file))
+            input_data = None
+        return cmd, input_data
+
+    def _build_stream_cmd(
+        self, subcommand: str, src: BinaryIO | Iterable[bytes] | None
+    ) -> tuple[list[str], BinaryIO | Iterable[bytes] | None]:
+        """Build the sops command and its input stream for the given subcommand."""
+        cmd, input_data = self._build_cmd(subcommand)
+        if src is None and isinstance(input_data, str):
+            return cmd, [input_data.encode()]
+        if src is None and isinstance(input_data, bytes):
+            return cmd, [input_data]
+        if src is not None and self.input_source == SopsyInputSource.FILE:
+            # read stdin instead of the file, its name still tells the format
+            file = cmd.pop()
+            cmd.extend(["--filename-override", file])
+        return cmd, src
+
+    def _decrypt_local(
+        self, *, to_dict: bool
+    ) -> tuple[tuple[Any, ...] | None, str | bytes | dict[str, Any] | None]:
+        """Decrypt from the cache or in-process, without running the sops binary.
+
+        Returns:
+            The cache key, and the decrypted output or None if sops must be run.
+        """
+        if to_dict:
+            started, start = time.time(), time.perf_counter()
+            preloaded = self._preloaded()
+            if preloaded is not None:
+                if hooks.enabled():
+                    hooks.emit(
+                        hooks.SopsyEvent(
+                            kind="decrypt",
+                            backend="preload",
+                            file=self._event_file(),
+                            started=started,
+                            parse=time.perf_counter() - start,
+                        )
+                    )
+                return None, copy.deepcopy(preloaded)
+        cache_key = self._cache_key(to_dict=to_dict)
+        if self.cache is not None and cache_key is not None:
+            started, start = time.time(), time.perf_counter()
+            cached = self.cache.get(cache_key)
+            if hooks.enabled():
+                hooks.emit(
+                    hooks.SopsyEvent(
+                        kind="decrypt",
+                        backend="cache",
+                        file=self._event_file(),
+                        started=started,
+                        parse=time.perf_counter() - start,
+                        cache_hit=cached is not None,
+                    )
+                )
+            if cached is not None:
+                return cache_key, cached
+        if self.native and to_dict:
+            started, start = time.time(), time.perf_counter()
+            error: str | None = None
+            out = None
+            try:
+                out = self._native_decrypt()
+            except Exception as err:
+                error = type(err).__name__
+                raise
+            finally:
+                # no event when falling back to the binary, it reports its own
+                if hooks.enabled() and (out is not None or error is not None):
+                    hooks.emit(
+                        hooks.SopsyEvent(
+                            kind="decrypt",
+                            backend="native",
+                            file=self._event_file(),
+                            started=started,
+                            parse=time.perf_counter() - start,
+                            error=error,
+                        )
+                    )
+            self._cache_store(cache_key, out)
+            return cache_key, out
+        return cache_key, None
+
+    def _cache_store(
+        self,
+        cache_key: tuple[Any, ...] | None,
+        out: str | bytes | dict[str, Any] | None,
+    ) -> None:
+        """Store a decrypted output in the cache, if any."""
+        if self.cache is not None and cache_key is not None and out is not None:
+            self.cache.set(cache_key, out)
+
+    def _cache_key(self, *, to_dict: bool) -> tuple[Any, ...] | None:
+        """Return the decrypt cache key of this object, or None if not cacheable."""
+        if self.cache is None or self.input_source != SopsyInputSource.FILE:
+            return None
+        if {"--in-place", "--output"}.intersection(self.global_args):
+            return None
+        assert not isinstance(self.file, bytes)  # noqa: S101
+        try:
+            return file_key(
+                self.file,
+                str(self.bin),
+                tuple(self.global_args),
+                tuple(self.config),
+                to_dict,
+            )
+        except OSError:
+            # let sops report missing or unreadable files
+            return None
+
+    def _preloaded(self) -> Any:  # noqa: ANN401
+        """Return the shared content loaded by `sopsy.preload()`, or None."""
+        store = shared.active
+        if store is None or not self.preloaded:
+            return None
+        if self.input_source != SopsyInputSource.FILE:
+            return None
+        if {"--extract", "--in-place", "--output"}.intersection(self.global_args):
+            return None
+        assert not isinstance(self.file, bytes)  # noqa: S101
+        return store.lookup(self.file)
+
+    def _native_input_type(self, args: list[str] | None = None) -> str | None:
+        """Return the input type if the native engine can be used, or None.
+
+        Only `--input-type` and `--output-type` arguments are supported, in the
+        given arguments or in the global ones.
+        """
+        input_type = None
+        remaining = iter(self.global_args if args is None else args)
+        for arg in remaining:
+            value = next(remaining, None)
+            if arg not in {"--input-type", "--output-type"}:
+                return None
+            if value not in {str(SopsyInOutType.JSON), str(SopsyInOutType.YAML)}:
+                return None
+            if arg == "--input-type":
+                input_type = value
+        if input_type is None and isinstance(self.file, Path):
+            input_type = _NATIVE_EXTENSIONS.get(self.file.suffix)
+        if input_type is None and isinstance(self.file, str):
+            input_type = _NATIVE_EXTENSIONS.get(Path(self.file).suffix)
+        return input_type
+
+    def _native_decrypt(self) -> dict[str, Any] | None:
+        """Decrypt in-process, return None if the sops binary must be used."""
+        input_type = self._native_input_type()
+        if input_type is None:
+            return None
+        from sopsy import native  # noqa: PLC0415
+
+        try:
+            document = native.load_document(self._read_input(), input_type)
+            return native.decrypt_document(document)
+        except (OSError, SopsyError) as err:
+            logger.debug("native decryption failed, falling back to sops: %s", err)
+            return None
+
+    def _native_encrypt(self, *, to_dict: bool) -> Any:  # noqa: ANN401
+        """Encrypt in-process, return _MISSING if the sops binary must be used."""
+        if not self.native:
+            return _MISSING
+        args, output = self._native_output()
+        input_type = self._native_input_type(args)
+        if input_type is None:
+            return _MISSING
+        output_type = input_type
+        if "--output-type" in args:
+            output_type = args[args.index("--output-type") + 1]
+        from sopsy import native  # noqa: PLC0415
+
+        started, start = time.time(), time.perf_counter()
+        name = self.file if isinstance(self.file, (str, Path)) else None
+        rule_file = name or f"dummy.{input_type}"
+        try:
+            tree = native.load_document(self._read_input(), input_type)
+            rule = None
+            if self.config:
+                rule = SopsConfig.from_file(Path(self.config[1])).rule_for(rule_file)
+            settings = native.creation_settings(rule)
+            document = native.encrypt_document(tree, **settings)
+            if output_type == "json":
+                data = native.dump_document(document, "json", like="\n")
+            else:
+                data = yaml_dump(document, sort_keys=False).encode()
+            if output is not None:
+                atomic_write(output, data)
+        except (OSError, SopsyError) as err:
+            logger.debug("native encryption failed, falling back to sops: %s", err)
+            return _MISSING
+        if hooks.enabled():
+            hooks.emit(
+                hooks.SopsyEvent(
+                    kind="encrypt",
+                    backend="native",
+                    file=self._event_file(),
+                    started=started,
+                    parse=time.perf_counter() - start,
+                    bytes_out=len(data),
+                )
+            )
+        if output is not None:
+            return None
+        return document if to_dict else data
+
+    def _native_output(self) -> tuple[list[str], Path | None]:
+        """Return the global arguments without the output ones, and the output file."""
+        args = list(self.global_args)
+        output = None
+        if "--in-place" in args and isinstance(self.file, (str, Path)):
+            args.remove("--in-place")
+            output = Path(self.file)
+        if "--output" in args:
+            index = args.index("--output")
+            output = Path(args[index + 1])
+            del args[index : index + 2]
+        return args, output
+
+    def _native_update(self, changes: list[tuple[list[str | int], Any]]) -> bool:
+        """Update in-process, return False if the sops binary must be used."""
+        if not self.native or self.input_source != SopsyInputSource.FILE:
+            return False
+        # only JSON documents can be written back the way sops does
+        if self._native_input_type() != "json":
+            return False
+        from sopsy import native  # noqa: PLC0415
+
+        assert not isinstance(self.file, bytes)  # noqa: S101
+        file = Path(self.file)
+        try:
+            content = file.read_bytes()
+            document = native.load_document(content, "json")
+            updated = native.update_document(document, changes)
+            if updated is not document:
+                data = native.dump_document(updated, "json", like=content)
+                atomic_write(file, data)
+        except (KeyError, OSError, SopsyError) as err:
+            logger.debug("native update failed, falling back to sops: %s", err)
+            return False
+        return True
+
+    def _edit_update(self, changes: list[tuple[list[str | int], Any]]) -> bool:
+        """Update with a single sops edit run, return False if sops set must be used."""
+        if self.input_source != SopsyInputSource.FILE:
+            return False
+        assert not isinstance(self.file, bytes)  # noqa: S101
+        file = Path(self.file)
+        args = _without_options(self.global_args, _OUTPUT_OPTIONS)
+        fmt = _NATIVE_EXTENSIONS.get(file.suffix)
+        if "--input-type" in args:
+            fmt = args[args.index("--input-type") + 1]
+        if fmt not in {"json", "yaml"}:
+            return False
+        self.binary_info.require("edit")
+        import sys  # noqa: PLC0415
+        import tempfile  # noqa: PLC0415
+
+        editor = shlex.join([sys.executable, "-c", _EDITOR_SCRIPT, fmt])
+        env = {**os.environ, "EDITOR": editor, "SOPS_EDITOR": editor}
+        # sops edit rewrites the file in place, it edits a copy replacing the file
+        fd, tmp = tempfile.mkstemp(
+            dir=file.parent, prefix=f".{file.stem}.", suffix=file.suffix
+        )
+        try:
+            with os.fdopen(fd, "wb") as fp:
+                _ = fp.write(file.read_bytes())
+            cmd = [str(self.bin), *self.config, "edit", *args, tmp]
+            try:
+                _ = self._run_cmd(
+                    cmd, to_dict=False, input_data=json.dumps(changes), env=env
+                )
+            except SopsyCommandFailedError as err:
+                if isinstance(err, SopsyTimeoutError) or not _EDIT_UNCHANGED.search(
+                    str(err)
+                ):
+                    raise
+                return True
+            atomic_write(file, Path(tmp).read_bytes())
+        finally:
+            Path(tmp).unlink(missing_ok=True)
+        return True
+
+    def _get_path(
+        self, path: list[str | int], *, verify_mac: bool, timeout: float | None = None
+    ) -> Any:  # noqa: ANN401
+        """Return the decrypted value at the given path, or raise KeyError."""
+        preloaded = self._preloaded()
+        if preloaded is not None:
+            return copy.deepcopy(lookup_path(preloaded, path)[0])
+        if self.native and self.cache is None:
+            value = self._native_get_path(path, verify_mac=verify_mac)
+            if value is not _MISSING:
+                return value
+        if self.cache is None and self.input_source == SopsyInputSource.FILE:
+            value = self._extract_path(path, timeout=timeout)
+            if value is not _MISSING:
+                return value
+        return lookup_path(self.decrypt(timeout=timeout), path)[0]
+
+    def _extract_path(
+        self, path: list[str | int], *, timeout: float | None = None
+    ) -> Any:  # noqa: ANN401
+        """Return the value at the given path with `sops decrypt --extract`.
+
+        Returns:
+            The value, or _MISSING when the whole file has to be decrypted instead.
+
+        Raises:
+            KeyError: The path does not exist in the file.
+        """
+        try:
+            out = self._run_cmd(self._extract_cmd(path), to_dict=False, timeout=timeout)
+        except SopsyTimeoutError:
+            raise
+        except SopsyCommandFailedError as err:
+            if _EXTRACT_NOT_FOUND.search(str(err)):
+                raise KeyError(extract_expr(path)) from err
+            # the binary is only probed when the extraction failed
+            if self.binary_info.supports("decrypt --extract"):
+                raise
+            return _MISSING
+        return _parse_extracted(out)
+
+    def _extract_cmd(self, path: list[str | int]) -> list[str]:
+        """Build the sops command printing the value at the given path as JSON."""
+        extract = extract_expr(path)
+        if "--extract" in self.global_args:
+            # the path is relative to the branch extracted by the object
+            extract = (
+                self.global_args[self.global_args.index("--extract") + 1] + extract
+            )
+        args = _without_options(self.global_args, _OUTPUT_OPTIONS)
+        cmd = [str(self.bin), *self.config, "decrypt", *args]
+        cmd.extend(["--extract", extract, "--output-type", "json", str(self.file)])
+        return cmd
+
+    def _native_get_path(self, path: list[str | int], *, verify_mac: bool) -> Any:  # noqa: ANN401
+        """Decrypt in-process, return _MISSING if the sops binary must be used."""
+        input_type = self._native_input_type()
+        if input_type is None:
+            return _MISSING
+        from sopsy import native  # noqa: PLC0415
+
+        try:
+            document = native.load_document(self._read_input(), input_type)
+            return native.decrypt_path(document, path, verify_mac=verify_mac)
+        except (OSError, SopsyError) as err:
+            logger.debug("native decryption failed, falling back to sops: %s", err)
+            return _MISSING
+
+    def _read_input(self) -> str | bytes:
+        """Return the encrypted content, from stdin data or from the file."""
+        if self.input_source == SopsyInputSource.STDIN:
+            assert not isinstance(self.file, Path)  # noqa: S101
+            return self.file
+        assert not isinstance(self.file, bytes)  # noqa: S101
+        return Path(self.file).read_bytes()
+
+
+def _parse_extracted(out: str | bytes | dict[str, Any] | None) -> Any:  # noqa: ANN401
+    """Parse the output of `sops decrypt --extract --output-type json`.
+
+    sops prints string leaves as they are, and other values as JSON. An output
+    starting like a JSON object or array is taken as a branch, an output that is
+    not JSON is a string. Any other output is an ambiguous scalar (`123` is printed
+    for the number and for the string) and _MISSING is returned.
+    """
+    if isinstance(out, bytes):
+        out = out.decode()
+    if not isinstance(out, str):
+        return _MISSING
+    try:
+        value = json_loads(out)
+    except ValueError:
+        return out
+    return value if out[:1] in {"{", "["} else _MISSING
+
+
+def _without_options(args: list[str], options: set[str]) -> list[str]:
+    """Return sops arguments without the given options, and their values."""
+    kept: list[str] = []
+    remaining = iter(args)
+    for arg in remaining:
+        if arg not in options:
+            kept.append(arg)
+        elif arg in _VALUE_OPTIONS:
+            _ = next(remaining, None)
+    return kept
+
+
+def _export_environ(out: Any, *, overwrite: bool = True) -> dict[str, str]:  # noqa: ANN401
+    """Export the top-level values of a decrypted document to `os.environ`.
+
+    Args:
+        out: The decrypted document.
+        overwrite: Replace the variables already set in the environment.
+
+    Returns:
+        The variables set in the environment.
+
+    Raises:
+        SopsyError: The document is not a mapping, or a value is a mapping or a
+            list.
+    """
+    if not isinstance(out, dict):
+        msg = "cannot export a non-mapping document to the environment"
+        raise SopsyError(msg)
+    environ = {
+        str(key): _environ_value(key, value)
+        for key, value in out.items()
+        if overwrite or str(key) not in os.environ
+    }
+    os.environ.update(environ)
+    return environ
+
+
+def _environ_value(key: Any, value: Any) -> str:  # noqa: ANN401
+    """Format a decrypted value the way sops does for dotenv files."""
+    if isinstance(value, (dict, list)):
+        msg = f"cannot export complex value of {key} to the environment"
+        raise SopsyError(msg)
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return str(value).lower()
+    return str(value)
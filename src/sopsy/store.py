@@ -0,0 +1,198 @@
+"""SOPSy store, layering several SOPS files under a single namespace."""
+
+from __future__ import annotations
+
+import copy
+import sys
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING
+from typing import Any
+from typing import Iterator
+from typing import Mapping
+
+from sopsy.cache import file_signature
+from sopsy.errors import SopsyError
+from sopsy.utils import lookup_path
+from sopsy.utils import parse_path
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+PRECEDENCES = ("last", "first")
+
+
+class SopsStore(Mapping[str, Any]):
+    """Decrypted content of several SOPS files, merged under dotted keys.
+
+    Files are layered: mappings are merged key by key, any other value of a layer
+    with a higher precedence replaces the lower ones, lists included. The leaves
+    are indexed under their dotted path, so a lookup is a single dict access. Keys
+    holding a dot would make these paths ambiguous: what is under them is left out
+    of the index and of iteration, and reachable through a JSON pointer
+    (`/smtp.host`) or from its branch.
+
+    Leaves are immutable (lists are stored as tuples), equal values share one
+    object, and layers share the branches nothing overrides. Lookups of a branch
+    return a copy of it.
+
+    Examples:
+        >>> from sopsy import SopsStore
+        >>> store = SopsStore(["base.enc.yaml", "prod.enc.yaml", "region.enc.yaml"])
+        >>> store["db.password"]
+        's3cr3t'
+        >>> store.reload()  # only decrypts the files that changed
+        [PosixPath('/app/prod.enc.yaml')]
+
+    Attributes:
+        files: Resolved paths of the layers, in the given order.
+        precedence: `last` if a file overrides the ones before it, `first` if it
+            overrides the ones after it.
+    """
+
+    def __init__(
+        self,
+        files: Iterable[str | Path],
+        *,
+        precedence: str = "last",
+        max_workers: int | None = None,
+        **sops_kwargs: Any,  # noqa: ANN401
+    ) -> None:
+        """Initialize store object, decrypting all the files concurrently.
+
+        Args:
+            files: Paths to the SOPS files, in layering order.
+            precedence: `last` if a file overrides the ones before it, `first` if
+                it overrides the ones after it.
+            max_workers: Maximum number of files decrypted at the same time.
+            **sops_kwargs: Arguments passed to each `Sops` object.
+
+        Raises:
+            SopsyError: The precedence is unknown, or a file could not be decrypted
+                or does not hold a mapping.
+        """
+        if precedence not in PRECEDENCES:
+            msg = f"precedence must be one of {', '.join(PRECEDENCES)}"
+            raise SopsyError(msg)
+        self.files: list[Path] = [Path(f).resolve() for f in files]
+        self.precedence: str = precedence
+        self._max_workers = max_workers
+        self._sops_kwargs = sops_kwargs
+        self._lock = threading.Lock()
+        self._layers: dict[Path, dict[str, Any]] = {}
+        self._signatures: dict[Path, tuple[int, int, int] | None] = {}
+        self._tree: dict[str, Any] = {}
+        self._index: dict[str, Any] = {}
+        _ = self.reload()
+
+    def __getitem__(self, key: str) -> Any:  # noqa: ANN401
+        """Return the value at a dotted path (`a.b.0`) or JSON pointer (`/a/b/0`)."""
+        try:
+            return self._index[key]
+        except KeyError:
+            pass
+        # branches, list items and JSON pointers are looked up in the merged tree
+        value = lookup_path(self._tree, parse_path(key))[0]
+        return copy.deepcopy(value) if isinstance(value, dict) else value
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the dotted paths of the leaves."""
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        """Return the number of leaves."""
+        return len(self._index)
+
+    def reload(self) -> list[Path]:
+        """Decrypt again the files that changed, and rebuild the index.
+
+        Returns:
+            The files decrypted again.
+
+        Raises:
+            SopsyError: A changed file could not be decrypted or does not hold a
+                mapping, the previous content of all files is kept.
+        """
+        from sopsy.batch import decrypt_many  # noqa: PLC0415
+
+        with self._lock:
+            signatures = {f: file_signature(f) for f in self.files}
+            changed = [
+                f
+                for f in self.files
+                if f not in self._layers or signatures[f] != self._signatures.get(f)
+            ]
+            if not changed:
+                return []
+            results = decrypt_many(
+                changed, max_workers=self._max_workers, **self._sops_kwargs
+            )
+            shared: dict[tuple[type, Any], Any] = {}
+            for value in self._index.values():
+                _ = _freeze(value, shared)
+            layers = {}
+            for result in results:
+                if result.error is not None:
+                    raise result.error
+                if not isinstance(result.output, dict):
+                    msg = f"{result.file} does not hold a mapping"
+                    raise SopsyError(msg)
+                layers[Path(result.file)] = _freeze(result.output, shared)
+            self._layers.update(layers)
+            self._signatures.update({f: signatures[f] for f in changed})
+            self._rebuild()
+            return changed
+
+    def _rebuild(self) -> None:
+        layers = [self._layers[f] for f in self.files]
+        if self.precedence == "first":
+            layers.reverse()
+        tree: dict[str, Any] = {}
+        for layer in layers:
+            tree = _merge(tree, layer)
+        index: dict[str, Any] = {}
+        _flatten(tree, "", index)
+        # publishing is a reference assignment, readers never need a lock
+        self._tree, self._index = tree, index
+
+
+def _freeze(value: Any, shared: dict[tuple[type, Any], Any]) -> Any:  # noqa: ANN401
+    """Return an immutable copy of the leaves of a tree, sharing equal values."""
+    if isinstance(value, dict):
+        return {sys.intern(str(k)): _freeze(v, shared) for k, v in value.items()}
+    if isinstance(value, list):
+        value = tuple(_freeze(v, shared) for v in value)
+    try:
+        return shared.setdefault(_share_key(value), value)
+    except TypeError:
+        # unhashable leaves, e.g. tuples holding mappings, are not shared
+        return value
+
+
+def _share_key(value: Any) -> tuple[type, Any]:  # noqa: ANN401
+    # 1, 1.0 and True are equal, their type tells them apart
+    return (type(value), value)
+
+
+def _merge(base: dict[str, Any], layer: dict[str, Any]) -> dict[str, Any]:
+    """Overlay a layer on a tree, sharing the branches of both it does not merge."""
+    merged = dict(base)
+    for key, value in layer.items():
+        current = merged.get(key)
+        if isinstance(value, dict) and isinstance(current, dict):
+            merged[key] = _merge(current, value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def _flatten(tree: dict[str, Any], prefix: str, index: dict[str, Any]) -> None:
+    for key, value in tree.items():
+        if "." in key:
+            # its dotted path would be ambiguous
+            continue
+        path = sys.intern(prefix + key)
+        if isinstance(value, dict):
+            _flatten(value, path + ".", index)
+        else:
+            index[path] = value
@@ -2,21 +2,65 @@
 
 from __future__ import annotations
 
+import atexit
+import contextlib
+import copy
+import functools
 import json
 import logging
-import subprocess
+import os
+import re
+import signal
+import threading
+import time
+from dataclasses import dataclass
 from pathlib import Path
+from typing import TYPE_CHECKING
 from typing import Any
 
-import yaml
-
+from sopsy import hooks
 from sopsy.errors import SopsyCommandFailedError
 from sopsy.errors import SopsyConfigNotFoundError
+from sopsy.errors import SopsyTimeoutError
 from sopsy.errors import SopsyUnparsableOutpoutTypeError
 
+if TYPE_CHECKING:
+    import subprocess
+    from collections.abc import Iterable
+    from types import ModuleType
+    from typing import BinaryIO
+
+    from typing_extensions import Self
+
 DEFAULT_CONFIG_FILE = Path(".sops.yaml")
+STREAM_CHUNK_SIZE = 64 * 1024
+DEFAULT_RETRY_BACKOFF = 0.2
+MAX_RETRY_BACKOFF = 5.0
+EXEC_KILL_DELAY = 5.0
 logger = logging.getLogger(__name__)
 
+# network and throttling errors of the key management services, worth retrying
+_TRANSIENT_ERRORS = re.compile(
+    r"connection (?:refused|reset)|broken pipe|i/o timeout|timed? ?out|"
+    r"temporary failure|no such host|unexpected eof|deadline exceeded|"
+    r"throttl|rate exceeded|too many requests|service unavailable|"
+    r"internal server error|bad gateway|\b(?:429|500|502|503|504)\b",
+    re.IGNORECASE,
+)
+
+_FORMAT_EXTENSIONS = {
+    ".env": "dotenv",
+    ".ini": "ini",
+    ".json": "json",
+    ".yaml": "yaml",
+    ".yml": "yaml",
+}
+_DOTENV_ESCAPES = {"n": "\n", "r": "\r", "t": "\t", '"': '"', "\\": "\\"}
+_NOT_CACHED = object()
+_config_lock = threading.Lock()
+_config_paths: dict[tuple[str, str], Path | None] = {}
+_config_contents: dict[Path, tuple[tuple[int, int], dict[str, Any]]] = {}
+
 
 def build_config(
     config_path: Path | None, config_dict: dict[str, Any] | None
@@ -25,9 +69,9 @@ def build_config(
     config: dict[str, Any] = {}
     if not config_path:
         config_path = DEFAULT_CONFIG_FILE
-    config_path = find_sops_config(Path(config_path))
+    config_path = find_sops_config_cached(Path(config_path))
     if config_path:
-        config = yaml.safe_load(config_path.read_text())
+        config = load_sops_config(config_path)
     if config_dict:
         for k in config_dict:
             if k not in config:
@@ -42,6 +86,130 @@ def build_config(
     return config
 
 
+class ConfigFiles:
+    """Registry of the SOPS config files generated from Python dicts.
+
+    Files are content-addressed: the same config is written once and shared by all
+    `Sops` objects. They live in a private temporary directory, removed at
+    interpreter exit, or when leaving the context manager. Only the process that
+    created the directory removes it, forked workers leave it to their parent.
+
+    Examples:
+        >>> from sopsy import Sops, config_files
+        >>> with config_files:
+        >>>     Sops("secrets.json", config_dict={"creation_rules": []}).decrypt()
+    """
+
+    def __init__(self) -> None:
+        """Initialize config files registry."""
+        self._dir: Path | None = None
+        self._owner: int | None = None
+        self._files: dict[str, Path] = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> Self:
+        """Return the registry itself."""
+        return self
+
+    def __exit__(self, *_args: object) -> None:
+        """Remove the generated config files."""
+        self.cleanup()
+
+    def path_for(self, config: dict[str, Any]) -> Path:
+        """Return the path of a file holding the given config, writing it if needed."""
+        import hashlib  # noqa: PLC0415
+
+        key = json.dumps(config, sort_keys=True, default=str)
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        with self._lock:
+            path = self._files.get(digest)
+            if path is not None and path.exists():
+                return path
+            content = yaml_dump(config)
+            if self._dir is None or not self._dir.exists():
+                import tempfile  # noqa: PLC0415
+
+                self._dir = Path(tempfile.mkdtemp(prefix="sopsy-"))
+                self._owner = os.getpid()
+            path = self._dir / f"{digest}.yaml"
+            tmp = path.with_suffix(".tmp")
+            _ = tmp.write_text(content)
+            _ = tmp.replace(path)
+            self._files[digest] = path
+            return path
+
+    def cleanup(self) -> None:
+        """Remove all generated config files, if created by the current process."""
+        with self._lock:
+            if self._dir is not None and self._owner == os.getpid():
+                import shutil  # noqa: PLC0415
+
+                shutil.rmtree(self._dir, ignore_errors=True)
+            self._dir = None
+            self._owner = None
+            self._files.clear()
+
+
+config_files = ConfigFiles()
+_ = atexit.register(config_files.cleanup)
+
+
+def config_args(
+    config_path: Path | None, config_dict: dict[str, Any] | None
+) -> list[str]:
+    """Return the sops `--config` arguments for the given config file and dict.
+
+    The config file is passed as-is when there is no config dict to merge into it.
+    Without any of them an empty config is generated, so that sops never looks up
+    a config file of its own.
+    """
+    if config_dict:
+        config = build_config(config_path=config_path, config_dict=config_dict)
+        return ["--config", str(config_files.path_for(config))]
+    found = find_sops_config_cached(Path(config_path or DEFAULT_CONFIG_FILE))
+    return ["--config", str(found or config_files.path_for({}))]
+
+
+def find_sops_config_cached(config_path: Path = DEFAULT_CONFIG_FILE) -> Path | None:
+    """Memoized `find_sops_config`, keyed on the working directory and given path.
+
+    A config file found once is only checked for existence afterwards, a config
+    file created after a lookup is not seen until `clear_config_cache()` is called.
+    """
+    key = (str(Path.cwd()), str(config_path))
+    with _config_lock:
+        found = _config_paths.get(key, _NOT_CACHED)
+    if found is None or (isinstance(found, Path) and found.exists()):
+        return found
+    found = find_sops_config(config_path)
+    with _config_lock:
+        _config_paths[key] = found
+    return found
+
+
+def load_sops_config(config_path: Path) -> dict[str, Any]:
+    """Return the parsed content of a config file, only parsing it when it changed.
+
+    The returned dict is a copy, it can be freely modified.
+    """
+    stat = config_path.stat()
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _config_lock:
+        cached = _config_contents.get(config_path)
+    if cached is None or cached[0] != signature:
+        cached = (signature, yaml_load(config_path.read_text()) or {})
+        with _config_lock:
+            _config_contents[config_path] = cached
+    return copy.deepcopy(cached[1])
+
+
+def clear_config_cache() -> None:
+    """Forget the config files found and parsed so far."""
+    with _config_lock:
+        _config_paths.clear()
+        _config_contents.clear()
+
+
 def find_sops_config(config_path: Path = DEFAULT_CONFIG_FILE) -> Path | None:
     """Try to find the configuration file until the filesystem root."""
     if config_path.is_absolute():
@@ -66,49 +234,870 @@ def find_sops_config(config_path: Path = DEFAULT_CONFIG_FILE) -> Path | None:
         cwd = cwd.parent
 
 
-def get_dict(data: bytes | str) -> dict[str, Any]:
-    """Parse data and return a dict from it."""
+def get_dict(data: bytes | str, *, output_type: str | None = None) -> dict[str, Any]:
+    """Parse data and return a dict from it.
+
+    Args:
+        data: The data to parse.
+        output_type: Format of the data, `dotenv`, `ini`, `json` or `yaml`. If not
+            set, JSON or YAML is guessed from the data.
+
+    Returns:
+        The parsed data.
+    """
     out = {}
 
-    if isinstance(data, bytes):
-        data = data.decode()
+    if output_type is None:
+        start = data[:1]
+        output_type = "json" if start in {"{", b"{"} else "yaml"
 
-    if data.startswith("{"):
+    if output_type == "json":
         try:
-            out = json.loads(data)
+            out = json_loads(data)
         except json.JSONDecodeError as json_err:
             raise SopsyUnparsableOutpoutTypeError from json_err
+    elif output_type == "dotenv":
+        out = parse_dotenv(data)
+    elif output_type == "ini":
+        out = parse_ini(data)
     else:
+        import yaml  # noqa: PLC0415
+
         try:
-            out = yaml.safe_load(data)
+            out = yaml_load(data)
         except yaml.YAMLError as yaml_err:
             raise SopsyUnparsableOutpoutTypeError from yaml_err
 
     return out
 
 
+def parse_dotenv(data: bytes | str, *, quoted: bool = False) -> dict[str, str]:
+    r"""Parse dotenv data, as output by sops or written by hand.
+
+    Sops writes values raw: a line is split on its first `=`, and `\n` in the value
+    escapes a new line. Empty lines and comments are ignored.
+
+    Args:
+        data: The data to parse.
+        quoted: Parse hand-written data instead: `export` prefixes and blanks around
+            keys and values are dropped, double-quoted values handle escape
+            sequences, single-quoted values are literal, both may span several
+            lines.
+
+    Returns:
+        The parsed variables.
+
+    Raises:
+        SopsyUnparsableOutpoutTypeError: A line is not a variable, or a quoted value
+            is not terminated.
+    """
+    if isinstance(data, bytes):
+        data = data.decode()
+    if quoted:
+        return _parse_quoted_dotenv(data)
+    out: dict[str, str] = {}
+    for line in data.split("\n"):
+        if not line or line.startswith("#"):
+            continue
+        key, sep, value = line.partition("=")
+        if not sep:
+            msg = f"invalid dotenv line: {line}"
+            raise SopsyUnparsableOutpoutTypeError(msg)
+        out[key] = value.replace("\\n", "\n")
+    return out
+
+
+def _parse_quoted_dotenv(data: str) -> dict[str, str]:
+    out: dict[str, str] = {}
+    lines = iter(data.splitlines())
+    for line in lines:
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        if stripped.startswith("export "):
+            stripped = stripped[len("export ") :]
+        key, sep, value = stripped.partition("=")
+        if not sep:
+            msg = f"invalid dotenv line: {line}"
+            raise SopsyUnparsableOutpoutTypeError(msg)
+        key, value = key.strip(), value.lstrip()
+        quote = value[:1]
+        if quote not in {'"', "'"}:
+            out[key] = value.rstrip().replace("\\n", "\n")
+            continue
+        value = value[1:]
+        while (end := _closing_quote(value, quote)) < 0:
+            next_line = next(lines, None)
+            if next_line is None:
+                msg = f"unterminated quoted value for {key}"
+                raise SopsyUnparsableOutpoutTypeError(msg)
+            value = f"{value}\n{next_line}"
+        value = value[:end]
+        out[key] = _unescape_dotenv(value) if quote == '"' else value
+    return out
+
+
+def _closing_quote(value: str, quote: str) -> int:
+    """Return the index of the unescaped closing quote, or -1."""
+    index = 0
+    while (index := value.find(quote, index)) >= 0:
+        escapes = len(value[:index]) - len(value[:index].rstrip("\\"))
+        if quote == "'" or escapes % 2 == 0:
+            return index
+        index += 1
+    return -1
+
+
+def _unescape_dotenv(value: str) -> str:
+    if "\\" not in value:
+        return value
+    out = []
+    chars = iter(value)
+    for char in chars:
+        if char == "\\":
+            escaped = next(chars, "")
+            out.append(_DOTENV_ESCAPES.get(escaped, f"\\{escaped}"))
+        else:
+            out.append(char)
+    return "".join(out)
+
+
+def parse_ini(data: bytes | str) -> dict[str, dict[str, str]]:
+    """Parse INI data into a dict of sections.
+
+    Keys are case-sensitive and values are not interpolated. Values may span several
+    lines when continuation lines are indented.
+    """
+    import configparser  # noqa: PLC0415
+
+    if isinstance(data, bytes):
+        data = data.decode()
+    # an empty default section name cannot match any section header, so a DEFAULT
+    # section is kept as-is instead of being merged into the other ones
+    parser = configparser.ConfigParser(interpolation=None, default_section="")
+    parser.optionxform = str  # type: ignore[assignment,method-assign]
+    try:
+        parser.read_string(data)
+    except configparser.Error as ini_err:
+        raise SopsyUnparsableOutpoutTypeError from ini_err
+    return {name: dict(section) for name, section in parser.items() if name}
+
+
+def json_loads(data: bytes | str) -> Any:  # noqa: ANN401
+    """Parse JSON data, with `orjson` when it is installed."""
+    orjson = _orjson()
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # let the standard library parse what orjson refuses (e.g. big integers)
+            # and raise the error otherwise
+            pass
+    return json.loads(data)
+
+
+def yaml_load(data: bytes | str) -> Any:  # noqa: ANN401
+    """Parse YAML data, with the libyaml loader when it is available."""
+    yaml, loader, _ = _yaml()
+    return yaml.load(data, Loader=loader)
+
+
+def yaml_dump(data: Any, *, sort_keys: bool = True) -> str:  # noqa: ANN401
+    """Serialize data to YAML, with the libyaml dumper when it is available."""
+    yaml, _, dumper = _yaml()
+    return yaml.dump(data, Dumper=dumper, sort_keys=sort_keys)
+
+
+@functools.lru_cache(maxsize=None)
+def _orjson() -> ModuleType | None:
+    """Import `orjson` on first use, return None if it is not installed."""
+    try:
+        import orjson  # noqa: PLC0415
+    except ImportError:  # pragma: no cover
+        return None
+    return orjson
+
+
+@functools.lru_cache(maxsize=None)
+def _yaml() -> tuple[ModuleType, Any, Any]:
+    """Import `yaml` on first use, return it with its fastest safe loader and dumper.
+
+    Importing yaml is the most expensive part of importing sopsy, it is deferred
+    until a YAML document is actually parsed or written.
+    """
+    import yaml  # noqa: PLC0415
+
+    try:
+        from yaml import CSafeDumper as SafeDumper  # noqa: PLC0415
+        from yaml import CSafeLoader as SafeLoader  # noqa: PLC0415
+    except ImportError:  # pragma: no cover
+        from yaml import SafeDumper  # type: ignore[assignment]  # noqa: PLC0415
+        from yaml import SafeLoader  # type: ignore[assignment]  # noqa: PLC0415
+    return yaml, SafeLoader, SafeDumper
+
+
+def output_type_of(cmd: list[str]) -> str | None:
+    """Return the format of the given SOPS command output, or None if unknown."""
+    if "--extract" in cmd:
+        # extracted scalars are output as-is
+        return None
+    args = cmd[:-1]
+    if "--output-type" in args:
+        return _known_type(args[args.index("--output-type") + 1])
+    from_file = _FORMAT_EXTENSIONS.get(Path(cmd[-1]).suffix) if cmd else None
+    if from_file is None and "--input-type" in args:
+        return _known_type(args[args.index("--input-type") + 1])
+    return from_file
+
+
+def _known_type(value: str) -> str | None:
+    return value if value in {"dotenv", "ini", "json", "yaml"} else None
+
+
+def parse_path(path: str | list[str | int]) -> list[str | int]:
+    """Split a dotted (`a.b.0`) or JSON pointer (`/a/b/0`) path into its components.
+
+    Numeric components are returned as integers, to be used as list indexes.
+    """
+    if isinstance(path, list):
+        return path
+    if path.startswith("/"):
+        parts = [p.replace("~1", "/").replace("~0", "~") for p in path[1:].split("/")]
+    else:
+        parts = path.split(".")
+    return [int(p) if p.isdigit() else p for p in parts]
+
+
+def lookup_path(tree: Any, path: list[str | int]) -> tuple[Any, list[str]]:  # noqa: ANN401
+    """Return the node found at the given path and the keys leading to it.
+
+    Raises:
+        KeyError: The path does not exist in the tree.
+    """
+    node = tree
+    keys = []
+    for component in path:
+        if isinstance(node, dict) and str(component) in node:
+            keys.append(str(component))
+            node = node[str(component)]
+        elif (
+            isinstance(node, (list, tuple))
+            and isinstance(component, int)
+            and -len(node) <= component < len(node)
+        ):
+            node = node[component]
+        else:
+            raise KeyError(component)
+    return node, keys
+
+
+def extract_expr(path: list[str | int]) -> str:
+    """Build a sops `--extract` expression from path components."""
+    return "".join(
+        f"[{c}]" if isinstance(c, int) else f"[{json.dumps(c)}]" for c in path
+    )
+
+
+def atomic_write(file: Path, data: bytes) -> None:
+    """Replace the content of a file, through a temporary file and a rename.
+
+    The file is never left partially written, even if the process is interrupted.
+    """
+    import tempfile  # noqa: PLC0415
+
+    fd, tmp = tempfile.mkstemp(dir=file.parent, prefix=f".{file.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fp:
+            _ = fp.write(data)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.chmod(tmp, file.stat().st_mode & 0o7777)  # noqa: PTH101
+        os.replace(tmp, file)  # noqa: PTH105
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp)  # noqa: PTH108
+        raise
+
+
 def run_cmd(
-    cmd: list[str], *, to_dict: bool, input_data: str | bytes | None = None
+    cmd: list[str],
+    *,
+    to_dict: bool,
+    input_data: str | bytes | None = None,
+    file: str | None = None,
+    timeout: float | None = None,
+    retries: int = 0,
+    backoff: float = DEFAULT_RETRY_BACKOFF,
+    env: dict[str, str] | None = None,
+) -> str | bytes | dict[str, Any] | None:
+    """Run the given SOPS command.
+
+    The input data is never logged, nor passed to the hooks, as it may be secret.
+
+    A command still running after `timeout` seconds is killed along with the
+    processes it started (the key service plugins, for instance). A command
+    failing with a transient error (see `is_transient_error`) is run again up to
+    `retries` times, after a jittered exponential backoff. Commands that timed
+    out are not run again.
+
+    Args:
+        cmd: The SOPS command.
+        to_dict: Return the output as a Python dict.
+        input_data: Data sent to the command standard input, if any.
+        file: Path to the SOPS file, reported to the hooks.
+        timeout: Number of seconds after which the command is killed.
+        retries: Number of times a command failing with a transient error is run
+            again.
+        backoff: Base delay before running a command again, in seconds.
+        env: Environment of the command, the current one if not set.
+
+    Returns:
+        The output of the command.
+
+    Raises:
+        SopsyTimeoutError: The command did not complete in time.
+        SopsyCommandFailedError: The command failed.
+    """
+    logger.debug("run_cmd: %s", cmd)
+    logger.debug("to_dict: %s", to_dict)
+    attempt = 1
+    while True:
+        try:
+            return _run_once(
+                cmd,
+                to_dict=to_dict,
+                input_data=input_data,
+                file=file,
+                timeout=timeout,
+                attempt=attempt,
+                env=env,
+            )
+        except SopsyCommandFailedError as err:  # noqa: PERF203
+            if not _wait_retry(err, attempt, retries, backoff):
+                raise
+            attempt += 1
+
+
+def _wait_retry(
+    err: SopsyCommandFailedError, attempt: int, retries: int, backoff: float
+) -> bool:
+    """Wait before running a failed command again, return False if it must not be."""
+    if (
+        isinstance(err, SopsyTimeoutError)
+        or attempt > retries
+        or not is_transient_error(str(err))
+    ):
+        return False
+    delay = retry_delay(attempt, backoff)
+    logger.warning(
+        "sops command failed with a transient error, retry %d of %d in "
+        "%.2f seconds: %s",
+        attempt,
+        retries,
+        delay,
+        err,
+    )
+    time.sleep(delay)
+    return True
+
+
+def _run_once(
+    cmd: list[str],
+    *,
+    to_dict: bool,
+    input_data: str | bytes | None,
+    file: str | None,
+    timeout: float | None,
+    attempt: int,
+    env: dict[str, str] | None,
 ) -> str | bytes | dict[str, Any] | None:
-    """Run the given SOPS command."""
+    """Run the given SOPS command once, killing it if it does not complete in time."""
+    import subprocess  # noqa: PLC0415
+
+    started = time.time()
+    start = spawned = waited = time.perf_counter()
+    proc: subprocess.Popen[Any] | None = None
+    stdout: str | bytes = b""
+    error: BaseException | None = None
+    # a process group of its own, to kill the processes sops started on timeout
+    new_session = timeout is not None and os.name == "posix"
     try:
-        logger.debug("run_cmd: %s", cmd)
-        logger.debug("to_dict: %s", to_dict)
-        logger.debug("input_data: %s", input_data)
-        proc = subprocess.run(  # noqa: S603
+        proc = subprocess.Popen(  # noqa: S603
             cmd,
-            input=input_data,
+            stdin=None if input_data is None else subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
             text=isinstance(input_data, str),
-            capture_output=True,
-            check=True,
+            start_new_session=new_session,
+            env=env,
         )
-    except subprocess.CalledProcessError as proc_err:
-        msg = proc_err.stderr
-        if isinstance(msg, bytes):
-            msg = msg.decode()
-        raise SopsyCommandFailedError(msg) from proc_err
+        spawned = time.perf_counter()
+        try:
+            stdout, stderr = proc.communicate(input_data, timeout=timeout)
+        except subprocess.TimeoutExpired as err:
+            _kill(proc, group=new_session)
+            waited = time.perf_counter()
+            logger.warning(
+                "sops command killed after %.2f seconds: %s", waited - start, cmd
+            )
+            msg = f"sops command timed out after {timeout} seconds"
+            raise SopsyTimeoutError(msg) from err
+        waited = time.perf_counter()
+        check_returncode(proc.returncode, stderr)
+        return parse_output(cmd, stdout, to_dict=to_dict)
+    except BaseException as err:
+        error = err
+        if proc is not None and proc.poll() is None:
+            _kill(proc, group=new_session)
+        raise
+    finally:
+        if hooks.enabled():
+            emit_cmd_event(
+                cmd,
+                file,
+                (started, start, spawned, waited),
+                bytes_in=len(input_data or b""),
+                bytes_out=len(stdout),
+                exit_code=None if proc is None else proc.returncode,
+                error=error,
+                attempt=attempt,
+            )
+
+
+def _kill(proc: subprocess.Popen[Any], *, group: bool) -> None:
+    """Kill a process, and its process group if it leads one, then reap it."""
+    _send_kill(proc, group=group)
+    _ = proc.communicate()
+
+
+def _send_kill(proc: subprocess.Popen[Any], *, group: bool) -> None:
+    """Kill a process, and its process group if it leads one, without reaping it."""
+    if group:
+        with contextlib.suppress(ProcessLookupError):
+            os.killpg(proc.pid, signal.SIGKILL)
+    else:
+        proc.kill()
+
+
+def is_transient_error(stderr: str) -> bool:
+    """Return whether a sops error output tells of a failure worth retrying.
+
+    Network errors and throttling of the key management services (KMS, Vault...)
+    are transient, decryption or parsing errors are not.
+    """
+    return _TRANSIENT_ERRORS.search(stderr) is not None
+
+
+def retry_delay(attempt: int, backoff: float = DEFAULT_RETRY_BACKOFF) -> float:
+    """Return the delay before a retry, with exponential backoff and full jitter.
+
+    Args:
+        attempt: Number of the attempt that failed, starting at 1.
+        backoff: Base delay, in seconds.
+
+    Returns:
+        A random delay between 0 and `backoff * 2 ** (attempt - 1)` seconds, at
+        most `MAX_RETRY_BACKOFF`.
+    """
+    import random  # noqa: PLC0415
+
+    return random.uniform(0, min(backoff * 2 ** (attempt - 1), MAX_RETRY_BACKOFF))  # noqa: S311
+
+
+@dataclass(frozen=True)
+class SopsyExecResult:
+    """Exit status and timings of a command run with decrypted secrets.
+
+    Attributes:
+        command: The command run by sops.
+        file: Path to the SOPS file.
+        returncode: Exit code of sops, the one of the command when it ran, or the
+            negative number of the signal that killed it.
+        started: Start time, in seconds since the epoch.
+        spawn: Number of seconds spent starting the sops process.
+        elapsed: Wall time until the command exited, in seconds.
+        timed_out: Whether the command was killed on timeout.
+        stdout: Output of the command, if captured.
+        stderr: Error output of the command and sops, if captured.
+    """
+
+    command: str
+    file: str
+    returncode: int
+    started: float = 0.0
+    spawn: float = 0.0
+    elapsed: float = 0.0
+    timed_out: bool = False
+    stdout: bytes | None = None
+    stderr: bytes | None = None
+
+    @property
+    def ok(self) -> bool:
+        """Tell if the command exited successfully."""
+        return self.returncode == 0
+
+
+def exec_cmd(
+    cmd: list[str],
+    *,
+    file: str,
+    timeout: float | None = None,
+    capture_output: bool = False,
+) -> SopsyExecResult:
+    """Run a sops `exec-env` or `exec-file` command and wait for it.
+
+    The decrypted secrets go from sops to the command through its environment or a
+    FIFO, they never reach this process. A command still running after `timeout`
+    seconds is terminated along with sops, then killed after `EXEC_KILL_DELAY`
+    seconds, so that sops can remove the plain file of `exec-file --no-fifo`.
+
+    Args:
+        cmd: The SOPS command, its last argument is the command it runs.
+        file: Path to the SOPS file, reported in the result and to the hooks.
+        timeout: Number of seconds after which the command is terminated.
+        capture_output: Capture the command output instead of inheriting the
+            standard output and error of this process.
+
+    Returns:
+        The exit status and timings of the command, a failure does not raise.
+    """
+    import subprocess  # noqa: PLC0415
+
+    logger.debug("exec_cmd: %s", cmd[:-1])
+    started = time.time()
+    start = spawned = waited = time.perf_counter()
+    proc: subprocess.Popen[bytes] | None = None
+    stdout = stderr = None
+    timed_out = False
+    error: BaseException | None = None
+    group = timeout is not None and os.name == "posix"
+    pipe = subprocess.PIPE if capture_output else None
+    try:
+        proc = subprocess.Popen(  # noqa: S603
+            cmd, stdout=pipe, stderr=pipe, start_new_session=group
+        )
+        spawned = time.perf_counter()
+        try:
+            stdout, stderr = proc.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            timed_out = True
+            stdout, stderr = _terminate(proc, group=group)
+        waited = time.perf_counter()
+    except BaseException as err:
+        error = err
+        if proc is not None and proc.poll() is None:
+            _ = _terminate(proc, group=group)
+        raise
+    finally:
+        if hooks.enabled():
+            emit_cmd_event(
+                cmd,
+                file,
+                (started, start, spawned, waited),
+                bytes_in=0,
+                bytes_out=len(stdout or b""),
+                exit_code=None if proc is None else proc.returncode,
+                error=SopsyTimeoutError() if timed_out else error,
+            )
+    if timed_out:
+        logger.warning("sops %s killed after %.2f seconds", cmd[-1], waited - start)
+    return SopsyExecResult(
+        command=cmd[-1],
+        file=file,
+        returncode=proc.returncode,
+        started=started,
+        spawn=spawned - start,
+        elapsed=waited - start,
+        timed_out=timed_out,
+        stdout=stdout,
+        stderr=stderr,
+    )
+
+
+def _terminate(
+    proc: subprocess.Popen[bytes], *, group: bool
+) -> tuple[bytes | None, bytes | None]:
+    """Terminate a process and its process group, kill them if they linger."""
+    import subprocess  # noqa: PLC0415
+
+    if group:
+        with contextlib.suppress(ProcessLookupError):
+            os.killpg(proc.pid, signal.SIGTERM)
+    else:
+        proc.terminate()
+    try:
+        return proc.communicate(timeout=EXEC_KILL_DELAY)
+    except subprocess.TimeoutExpired:
+        _kill(proc, group=group)
+    return None, None
+
+
+def emit_cmd_event(
+    cmd: list[str],
+    file: str | None,
+    times: tuple[float, float, float, float],
+    *,
+    bytes_in: int,
+    bytes_out: int,
+    exit_code: int | None,
+    error: BaseException | None,
+    attempt: int = 1,
+) -> None:
+    """Pass the metrics of a finished command to the hooks.
+
+    Args:
+        cmd: The SOPS command.
+        file: Path to the SOPS file, if any.
+        times: Epoch time when the command was started, then performance counter
+            values when it was started, spawned, and waited for.
+        bytes_in: Size of the data sent to the command.
+        bytes_out: Size of the command output.
+        exit_code: Exit code of the command, if it exited.
+        error: The exception raised, if any.
+        attempt: Number of the attempt, greater than 1 for a retried command.
+    """
+    started, start, spawned, waited = times
+    end = time.perf_counter()
+    spawned = max(start, spawned)
+    waited = max(spawned, waited)
+    hooks.emit(
+        hooks.SopsyEvent(
+            kind=hooks.command_kind(cmd),
+            file=file,
+            started=started,
+            spawn=spawned - start,
+            wait=waited - spawned,
+            parse=end - waited,
+            bytes_in=bytes_in,
+            bytes_out=bytes_out,
+            exit_code=exit_code,
+            error=None if error is None else type(error).__name__,
+            attempt=attempt,
+        )
+    )
+
+
+def check_returncode(returncode: int, stderr: str | bytes) -> None:
+    """Raise the error output of a failed command."""
+    if returncode:
+        msg = stderr.decode() if isinstance(stderr, bytes) else stderr
+        raise SopsyCommandFailedError(msg)
+
+
+def stream_cmd(
+    cmd: list[str],
+    dst: BinaryIO,
+    src: BinaryIO | Iterable[bytes] | None = None,
+    *,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+    file: str | None = None,
+    timeout: float | None = None,
+    retries: int = 0,
+    backoff: float = DEFAULT_RETRY_BACKOFF,
+) -> int:
+    """Run the given SOPS command, streaming its input and output.
+
+    Data is moved in buffers of at most `chunk_size` bytes, so the memory used does
+    not depend on the payload size.
+
+    A command still running after `timeout` seconds is killed along with the
+    processes it started, as with `run_cmd`. Streamed data cannot be replayed: a
+    command failing with a transient error is only run again when it had no
+    source and wrote nothing yet.
+
+    Args:
+        cmd: The SOPS command.
+        dst: Binary file-like object the command output is written to.
+        src: Binary file-like object or iterable of bytes chunks fed to the command
+            standard input, if any.
+        chunk_size: Size of the buffers, in bytes.
+        file: Path to the SOPS file, reported to the hooks.
+        timeout: Number of seconds after which the command is killed.
+        retries: Number of times a command failing with a transient error is run
+            again.
+        backoff: Base delay before running a command again, in seconds.
+
+    Returns:
+        The number of bytes written to `dst`.
+
+    Raises:
+        SopsyTimeoutError: The command did not complete in time.
+        SopsyCommandFailedError: The command failed.
+    """
+    logger.debug("stream_cmd: %s", cmd)
+    attempt = 1
+    while True:
+        written = [0]
+        try:
+            return _stream_once(
+                cmd,
+                dst,
+                src,
+                chunk_size=chunk_size,
+                file=file,
+                timeout=timeout,
+                attempt=attempt,
+                written=written,
+            )
+        except SopsyCommandFailedError as err:
+            if (
+                src is not None
+                or written[0]
+                or not _wait_retry(err, attempt, retries, backoff)
+            ):
+                raise
+            attempt += 1
+
+
+def _stream_once(
+    cmd: list[str],
+    dst: BinaryIO,
+    src: BinaryIO | Iterable[bytes] | None,
+    *,
+    chunk_size: int,
+    file: str | None,
+    timeout: float | None,
+    attempt: int,
+    written: list[int],
+) -> int:
+    """Run the given SOPS command once, killing it if it does not complete in time."""
+    import subprocess  # noqa: PLC0415
+
+    started = time.time()
+    start = time.perf_counter()
+    # a process group of its own, to kill the processes sops started on timeout
+    new_session = timeout is not None and os.name == "posix"
+    proc = subprocess.Popen(  # noqa: S603
+        cmd,
+        bufsize=0,
+        stdin=subprocess.DEVNULL if src is None else subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=new_session,
+    )
+    spawned = time.perf_counter()
+    stdout, stderr = proc.stdout, proc.stderr
+    assert stdout is not None  # noqa: S101
+    assert stderr is not None  # noqa: S101
+    errors: list[BaseException] = []
+    err_output: list[bytes] = []
+    fed: list[int] = [0]
+    threads = [threading.Thread(target=lambda: err_output.append(stderr.read()))]
+    if src is not None:
+        threads.append(
+            threading.Thread(target=_feed, args=(proc, src, chunk_size, errors, fed))
+        )
+    for thread in threads:
+        thread.start()
+    deadline = _Deadline(proc, timeout, group=new_session)
+    error: BaseException | None = None
+    timed_out: SopsyTimeoutError | None = None
+    try:
+        while chunk := stdout.read(chunk_size):
+            _ = dst.write(chunk)
+            written[0] += len(chunk)
+    except BaseException as err:
+        error = err
+        _send_kill(proc, group=new_session)
+        raise
+    finally:
+        for thread in threads:
+            thread.join()
+        _ = proc.wait()
+        deadline.cancel()
+        stdout.close()
+        stderr.close()
+        waited = time.perf_counter()
+        timed_out = deadline.error(cmd, waited - start)
+        if hooks.enabled():
+            emit_cmd_event(
+                cmd,
+                file,
+                (started, start, spawned, waited),
+                bytes_in=fed[0],
+                bytes_out=written[0],
+                exit_code=proc.returncode,
+                error=error or timed_out or (errors[0] if errors else None),
+                attempt=attempt,
+            )
+    if timed_out is not None:
+        raise timed_out
+    if errors:
+        raise errors[0]
+    if proc.returncode != 0:
+        raise SopsyCommandFailedError(b"".join(err_output).decode())
+    return written[0]
+
+
+class _Deadline:
+    """Kill a command still running after a timeout.
+
+    Reads block on a hung command, it is killed from a timer thread.
+    """
+
+    def __init__(
+        self, proc: subprocess.Popen[bytes], timeout: float | None, *, group: bool
+    ) -> None:
+        self.timeout = timeout
+        self.expired = False
+        self._timer: threading.Timer | None = None
+        if timeout is not None:
+            self._timer = threading.Timer(timeout, self._expire, args=(proc, group))
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _expire(self, proc: subprocess.Popen[bytes], group: bool) -> None:  # noqa: FBT001
+        self.expired = True
+        _send_kill(proc, group=group)
+
+    def cancel(self) -> None:
+        """Stop the timer, if the command completed in time."""
+        if self._timer is not None:
+            self._timer.cancel()
+
+    def error(self, cmd: list[str], elapsed: float) -> SopsyTimeoutError | None:
+        """Return the error to raise if the command was killed, or None."""
+        if not self.expired:
+            return None
+        logger.warning("sops command killed after %.2f seconds: %s", elapsed, cmd)
+        msg = f"sops command timed out after {self.timeout} seconds"
+        return SopsyTimeoutError(msg)
+
+
+def _feed(
+    proc: subprocess.Popen[bytes],
+    src: BinaryIO | Iterable[bytes],
+    chunk_size: int,
+    errors: list[BaseException],
+    fed: list[int],
+) -> None:
+    """Write the source chunks to the process standard input, then close it.
+
+    The number of bytes written is counted in `fed`.
+    """
+    assert proc.stdin is not None  # noqa: S101
+    chunks = iter(lambda: src.read(chunk_size), b"") if hasattr(src, "read") else src
+    try:
+        for chunk in chunks:
+            _ = proc.stdin.write(chunk)
+            fed[0] += len(chunk)
+    except BrokenPipeError:
+        # the command exited early, its exit code tells why
+        pass
+    except BaseException as err:  # noqa: BLE001
+        errors.append(err)
+        proc.kill()
+    finally:
+        with contextlib.suppress(BrokenPipeError):
+            proc.stdin.close()
+
+
+def parse_output(
+    cmd: list[str], stdout: str | bytes, *, to_dict: bool
+) -> str | bytes | dict[str, Any] | None:
+    """Return the output of the given SOPS command, parsed if requested."""
     if {"-i", "--in-place", "--output"}.intersection(cmd):
         return None
     if to_dict:
-        return get_dict(proc.stdout)
-    return proc.stdout
+        return get_dict(stdout, output_type=output_type_of(cmd))
+    return stdout
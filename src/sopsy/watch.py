@@ -0,0 +1,352 @@
+"""SOPSy file watcher, refreshing decrypted secrets in the background."""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from dataclasses import field
+from pathlib import Path
+from types import MappingProxyType
+from typing import TYPE_CHECKING
+from typing import Any
+from typing import Callable
+from typing import Mapping
+
+from sopsy.cache import file_signature
+from sopsy.errors import SopsyError
+from sopsy.sopsy import Sops
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from typing_extensions import Self
+
+DEFAULT_DEBOUNCE = 0.2
+DEFAULT_POLL_INTERVAL = 1.0
+logger = logging.getLogger(__name__)
+
+# from <sys/inotify.h>
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_MASK = (
+    _IN_MODIFY
+    | _IN_ATTRIB
+    | _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+)
+_IN_EVENT = struct.Struct("iIII")
+_READ_SIZE = 64 * 1024
+
+
+@dataclass(frozen=True)
+class SopsSnapshot:
+    """Immutable view of the decrypted content of the watched files.
+
+    Attributes:
+        generation: Number of snapshots published before this one.
+        secrets: Decrypted content of each watched file, by resolved path. Files
+            that could never be decrypted are missing.
+        changed: Files whose content changed since the previous snapshot.
+    """
+
+    generation: int = 0
+    secrets: Mapping[Path, Any] = field(default_factory=lambda: MappingProxyType({}))
+    changed: frozenset[Path] = frozenset()
+
+
+class SopsWatcher:
+    """Watch SOPS files and keep their decrypted content up to date.
+
+    Changes are detected with inotify on Linux, by polling the files size and
+    modification time elsewhere. Bursts of writes are coalesced, and only the files
+    that actually changed are decrypted again. Each refresh publishes a new
+    `SopsSnapshot`, reading the current one is a plain attribute access.
+
+    Examples:
+        >>> from sopsy import SopsWatcher
+        >>> with SopsWatcher(["secrets.json"]) as watcher:
+        >>>     watcher.subscribe(lambda snapshot: print(snapshot.changed))
+        >>>     watcher.get("secrets.json")
+        {'hello': 'world'}
+
+    Attributes:
+        files: Resolved paths of the watched files.
+        snapshot: The current snapshot.
+        debounce: Number of seconds without changes to wait for before refreshing.
+        poll_interval: Number of seconds between two checks, when polling.
+        inotify: Whether inotify is used to detect changes.
+    """
+
+    def __init__(
+        self,
+        files: Iterable[str | Path],
+        *,
+        debounce: float = DEFAULT_DEBOUNCE,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        inotify: bool | None = None,
+        on_error: Callable[[Path, SopsyError], None] | None = None,
+        **sops_kwargs: Any,  # noqa: ANN401
+    ) -> None:
+        """Initialize watcher object, files are watched once it is started.
+
+        Args:
+            files: Paths to the SOPS files to watch.
+            debounce: Number of seconds without changes to wait for before
+                refreshing, to coalesce bursts of writes.
+            poll_interval: Number of seconds between two checks, when polling.
+            inotify: Use inotify, polling otherwise. If not set, inotify is used when
+                available.
+            on_error: Called when a file cannot be decrypted, its previous content is
+                kept in the snapshots.
+            **sops_kwargs: Arguments passed to each `Sops` object.
+        """
+        self.files: list[Path] = [Path(f).resolve() for f in files]
+        self.snapshot: SopsSnapshot = SopsSnapshot()
+        self.debounce: float = debounce
+        self.poll_interval: float = poll_interval
+        self.inotify: bool = _inotify_available() if inotify is None else inotify
+        self._on_error = on_error
+        self._sops_kwargs = sops_kwargs
+        self._subscribers: tuple[Callable[[SopsSnapshot], None], ...] = ()
+        self._signatures: dict[Path, tuple[int, int, int] | None] = {}
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._stop_pipe: tuple[int, int] | None = None
+
+    def __enter__(self) -> Self:
+        """Start watching the files."""
+        self.start()
+        return self
+
+    def __exit__(self, *_args: object) -> None:
+        """Stop watching the files."""
+        self.stop()
+
+    def get(self, file: str | Path, default: Any = None) -> Any:  # noqa: ANN401
+        """Return the decrypted content of a watched file from the current snapshot."""
+        return self.snapshot.secrets.get(Path(file).resolve(), default)
+
+    def subscribe(self, callback: Callable[[SopsSnapshot], None]) -> None:
+        """Call the given function with each new snapshot, from the watcher thread."""
+        self._subscribers = (*self._subscribers, callback)
+
+    def unsubscribe(self, callback: Callable[[SopsSnapshot], None]) -> None:
+        """Stop calling the given function with new snapshots."""
+        self._subscribers = tuple(s for s in self._subscribers if s != callback)
+
+    def start(self) -> None:
+        """Decrypt the files, then watch them from a background thread."""
+        if self._thread is not None:
+            return
+        _ = self.refresh(self.files)
+        watch = None
+        if self.inotify:
+            try:
+                watch = _Inotify(self.files)
+            except OSError as err:
+                logger.warning("inotify unavailable, polling instead: %s", err)
+                self.inotify = False
+        self._stop_pipe = os.pipe()
+        self._thread = threading.Thread(
+            target=self._run, args=(watch,), name="sopsy-watcher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop watching the files, the last snapshot stays available."""
+        thread, self._thread = self._thread, None
+        if thread is None or self._stop_pipe is None:
+            return
+        _ = os.write(self._stop_pipe[1], b"x")
+        thread.join()
+        for fd in self._stop_pipe:
+            os.close(fd)
+        self._stop_pipe = None
+
+    def refresh(self, files: Iterable[Path] | None = None) -> SopsSnapshot:
+        """Decrypt the given files again if they changed, and publish a snapshot.
+
+        Concurrent calls are serialized. Files that could not be decrypted are
+        decrypted again on the next call, even if they did not change since.
+
+        Args:
+            files: Files to check, all watched files if not set.
+
+        Returns:
+            The current snapshot, a new one only if a file changed.
+        """
+        with self._lock:
+            snapshot = self._refresh(self.files if files is None else files)
+        if snapshot is None:
+            return self.snapshot
+        for callback in self._subscribers:
+            _notify(callback, snapshot)
+        return snapshot
+
+    def _refresh(self, files: Iterable[Path]) -> SopsSnapshot | None:
+        """Publish and return a new snapshot if a file changed, holding the lock."""
+        changed = {}
+        for file in files:
+            signature = file_signature(file)
+            if file in self._signatures and signature == self._signatures[file]:
+                continue
+            if signature is None:
+                self._signatures[file] = signature
+                continue
+            try:
+                changed[file] = Sops(file, **self._sops_kwargs).decrypt()
+            except SopsyError as err:
+                # keep the previous signature, a file caught mid-write is retried
+                logger.warning("could not decrypt %s: %s", file, err)
+                if self._on_error is not None:
+                    self._on_error(file, err)
+                continue
+            self._signatures[file] = signature
+        current = self.snapshot
+        changed = {f: v for f, v in changed.items() if current.secrets.get(f) != v}
+        if not changed:
+            return None
+        snapshot = SopsSnapshot(
+            generation=current.generation + 1,
+            secrets=MappingProxyType({**current.secrets, **changed}),
+            changed=frozenset(changed),
+        )
+        # publishing is a single reference assignment, readers never need a lock
+        self.snapshot = snapshot
+        return snapshot
+
+    def _run(self, watch: _Inotify | None) -> None:
+        assert self._stop_pipe is not None  # noqa: S101
+        stop_fd = self._stop_pipe[0]
+        seen = dict(self._signatures)
+        try:
+            while True:
+                dirty = self._wait(watch, stop_fd, None, seen)
+                if dirty is None:
+                    return
+                # coalesce the burst of changes, until files are quiet
+                while dirty:
+                    more = self._wait(watch, stop_fd, self.debounce, seen)
+                    if more is None:
+                        return
+                    if not more:
+                        break
+                    dirty |= more
+                _ = self.refresh(sorted(dirty))
+        finally:
+            if watch is not None:
+                watch.close()
+
+    def _wait(
+        self,
+        watch: _Inotify | None,
+        stop_fd: int,
+        timeout: float | None,
+        seen: dict[Path, tuple[int, int, int] | None],
+    ) -> set[Path] | None:
+        """Wait for changes, return the changed files or None if stopping.
+
+        When polling, `seen` holds the last signature observed for each file.
+        """
+        if watch is None:
+            deadline = time.monotonic() + (
+                self.poll_interval if timeout is None else timeout
+            )
+            while True:
+                readable, _, _ = select.select(
+                    [stop_fd], [], [], max(0, deadline - time.monotonic())
+                )
+                if readable:
+                    return None
+                dirty = set()
+                for file in self.files:
+                    signature = file_signature(file)
+                    if signature != seen.get(file):
+                        seen[file] = signature
+                        dirty.add(file)
+                if dirty or timeout is not None or time.monotonic() >= deadline:
+                    return dirty
+        readable, _, _ = select.select([stop_fd, watch.fd], [], [], timeout)
+        if stop_fd in readable:
+            return None
+        return watch.read() if readable else set()
+
+
+class _Inotify:
+    """Minimal inotify binding, watching the directories of the given files.
+
+    Watching directories rather than files catches the atomic renames most editors
+    and `sops` itself use to write files.
+    """
+
+    def __init__(self, files: list[Path]) -> None:
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd: int = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._files = set(files)
+        self._dirs: dict[int, Path] = {}
+        for directory in {f.parent for f in files}:
+            wd = self._libc.inotify_add_watch(
+                self.fd, str(directory).encode(), _IN_MASK
+            )
+            if wd < 0:
+                self.close()
+                raise OSError(ctypes.get_errno(), f"cannot watch {directory}")
+            self._dirs[wd] = directory
+
+    def read(self) -> set[Path]:
+        """Return the watched files touched by the pending events."""
+        try:
+            data = os.read(self.fd, _READ_SIZE)
+        except BlockingIOError:
+            return set()
+        touched = set()
+        offset = 0
+        while offset < len(data):
+            wd, _, _, length = _IN_EVENT.unpack_from(data, offset)
+            start = offset + _IN_EVENT.size
+            name = data[start : start + length].rstrip(b"\0")
+            offset = start + length
+            directory = self._dirs.get(wd)
+            if directory is not None and name:
+                path = directory / os.fsdecode(name)
+                if path in self._files:
+                    touched.add(path)
+        return touched
+
+    def close(self) -> None:
+        """Release the inotify file descriptor."""
+        os.close(self.fd)
+
+
+def _notify(callback: Callable[[SopsSnapshot], None], snapshot: SopsSnapshot) -> None:
+    try:
+        callback(snapshot)
+    except Exception:
+        logger.exception("snapshot subscriber failed")
+
+
+def _inotify_available() -> bool:
+    if not sys.platform.startswith("linux"):
+        return False
+    libc_name = ctypes.util.find_library("c")
+    if libc_name is None:
+        return False
+    return hasattr(ctypes.CDLL(libc_name), "inotify_init1")
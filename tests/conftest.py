@@ -0,0 +1,169 @@
+"""SOPSy Tests fixtures."""
+
+import functools
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from sopsy import binary
+from sopsy import hooks
+from sopsy import shared
+from sopsy import utils
+
+# A stand-in for the sops binary: it outputs the given file (or stdin) content,
+# fails on files with "fail" in their name, and can be slowed down or fail once with
+# a transient error. It can also record its arguments, run commands as sops exec-env
+# and exec-file do, edit files as sops edit does, and run a dummy key service on a
+# unix socket.
+FAKE_SOPS = """
+import json
+import os
+import socket
+import sys
+import time
+
+args = sys.argv[1:]
+if os.environ.get("FAKE_SOPS_ARGSFILE"):
+    with open(os.environ["FAKE_SOPS_ARGSFILE"], "a") as fp:
+        fp.write(json.dumps(args) + "\\n")
+if os.environ.get("FAKE_SOPS_PIDFILE"):
+    with open(os.environ["FAKE_SOPS_PIDFILE"], "w") as fp:
+        fp.write(str(os.getpid()))
+time.sleep(float(os.environ.get("FAKE_SOPS_SLEEP", "0")))
+if os.environ.get("FAKE_SOPS_FAIL_ONCE"):
+    if not os.path.exists(os.environ["FAKE_SOPS_FAIL_ONCE"]):
+        open(os.environ["FAKE_SOPS_FAIL_ONCE"], "w").close()
+        sys.stderr.write("Post https://kms: dial tcp: connection reset by peer")
+        sys.exit(1)
+if args[:1] == ["keyservice"]:
+    if os.environ.get("FAKE_SOPS_KEYSERVICE_FAIL"):
+        sys.stderr.write("fake keyservice failure")
+        sys.exit(1)
+    for _ in range(int(os.environ.get("FAKE_SOPS_KEYSERVICE_NOISE", "0"))):
+        sys.stderr.write("keyservice log line\\n")
+    server = socket.socket(socket.AF_UNIX)
+    server.bind(args[args.index("--address") + 1])
+    server.listen()
+    while True:
+        server.accept()[0].close()
+if "edit" in args:
+    import shlex
+    import subprocess
+    import tempfile
+
+    with open(args[-1]) as fp:
+        original = fp.read()
+    suffix = os.path.splitext(args[-1])[1]
+    with tempfile.NamedTemporaryFile("w", suffix=suffix, delete=False) as fp:
+        fp.write(original)
+    editor = os.environ.get("SOPS_EDITOR") or os.environ["EDITOR"]
+    status = subprocess.call([*shlex.split(editor), fp.name])
+    with open(fp.name) as tmp:
+        edited = tmp.read()
+    os.unlink(fp.name)
+    if status:
+        sys.exit(status)
+    if edited == original:
+        sys.stderr.write("File has not changed, exiting.")
+        sys.exit(200)
+    with open(args[-1], "w") as out:
+        out.write(edited)
+    sys.exit(0)
+if "exec-env" in args or "exec-file" in args:
+    import subprocess
+    import tempfile
+
+    with open(args[-2]) as fp:
+        secrets = json.load(fp)
+    if "exec-env" in args:
+        env = {} if "--pristine" in args else dict(os.environ)
+        env.update({key: str(value) for key, value in secrets.items()})
+        sys.exit(subprocess.call(args[-1], shell=True, env=env))
+    with tempfile.NamedTemporaryFile("w", suffix=".json") as fp:
+        json.dump(secrets, fp)
+        fp.flush()
+        sys.exit(subprocess.call(args[-1].replace("{}", fp.name), shell=True))
+path = args[-1] if args and os.path.isfile(args[-1]) else None
+if path and "fail" in os.path.basename(path):
+    sys.stderr.write("fake sops failure")
+    sys.exit(1)
+if path:
+    with open(path, "rb") as fp:
+        data = fp.read()
+else:
+    data = sys.stdin.buffer.read()
+sys.stdout.buffer.write(data)
+"""
+
+
+class RunPopen:
+    """Stand-in for subprocess.Popen, answering with a subprocess.run mock."""
+
+    def __init__(self, run: Any, args: Any, **kwargs: Any) -> None:
+        """Record the command, it is run when communicating with the process."""
+        self.run = run
+        self.args = args
+        self.kwargs = kwargs
+        self.returncode: Any = None
+
+    def __enter__(self) -> Any:
+        """Return the process, as subprocess.run uses it as a context manager."""
+        return self
+
+    def __exit__(self, *_args: object) -> None:
+        """Do nothing, the command is not an actual process."""
+
+    def communicate(self, input_data: Any = None, timeout: Any = None) -> Any:
+        """Run the command with the subprocess.run mock."""
+        try:
+            proc = self.run(self.args, input=input_data, timeout=timeout, **self.kwargs)
+        except subprocess.CalledProcessError as err:
+            self.returncode = err.returncode
+            return err.stdout, err.stderr
+        self.returncode = proc.returncode
+        if self.kwargs.get("text") and isinstance(proc.stdout, bytes):
+            return proc.stdout.decode(), proc.stderr
+        return proc.stdout, proc.stderr
+
+    def poll(self) -> Any:
+        """Return the exit code of the command, once run."""
+        return self.returncode
+
+    def wait(self, timeout: Any = None) -> Any:  # noqa: ARG002
+        """Return the exit code of the command, once run."""
+        return self.returncode
+
+    def kill(self) -> None:
+        """Do nothing, the command is not an actual process."""
+
+
+@pytest.fixture
+def mock_run(monkeypatch: pytest.MonkeyPatch) -> Any:
+    """Answer the commands run with subprocess.Popen with a subprocess.run mock."""
+
+    def _mock_run(run: Any) -> None:
+        monkeypatch.setattr(subprocess, "Popen", functools.partial(RunPopen, run))
+
+    return _mock_run
+
+
+@pytest.fixture
+def fake_sops(tmp_path: Path) -> Path:
+    """Write an executable stand-in for the sops binary."""
+    path = tmp_path / "fake-sops"
+    _ = path.write_text(f"#!{sys.executable}\n{FAKE_SOPS}")
+    path.chmod(0o755)
+    return path
+
+
+@pytest.fixture(autouse=True)
+def _clear_caches() -> None:
+    """Do not share process-wide caches between tests."""
+    utils.clear_config_cache()
+    binary.clear_binary_cache()
+    hooks.clear_hooks()
+    if shared.active is not None:
+        shared.active.close()
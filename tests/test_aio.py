@@ -0,0 +1,175 @@
+"""SOPSy Asyncio Tests."""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from io import BytesIO
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from sopsy import aio
+from sopsy import errors
+from sopsy import sopsy
+
+
+def test_async_sops_decrypt(fake_sops: Path, tmp_path: Path) -> None:
+    """Test aio.AsyncSops.decrypt function."""
+    sops_file = tmp_path / "secret.json"
+    _ = sops_file.write_text('{"hello": "world"}')
+    s = aio.AsyncSops(sops_file, binary_path=fake_sops)
+    assert asyncio.run(s.decrypt()) == {"hello": "world"}
+    assert asyncio.run(s.get("hello")) == "world"
+    assert asyncio.run(s.get("nonexistent", default="default")) == "default"
+
+
+def test_async_sops_encrypt_from_stdin(fake_sops: Path) -> None:
+    """Test aio.AsyncSops.encrypt function with stdin input source."""
+    s = aio.AsyncSops(
+        '{"hello": "world"}',
+        binary_path=fake_sops,
+        input_source=sopsy.SopsyInputSource.STDIN,
+        input_type="json",
+    )
+    assert asyncio.run(s.encrypt(to_dict=False)) == '{"hello": "world"}'
+
+
+def test_async_sops_fail(fake_sops: Path, tmp_path: Path) -> None:
+    """Test aio.AsyncSops.rotate function failing."""
+    sops_file = tmp_path / "fail.json"
+    _ = sops_file.write_text("{}")
+    s = aio.AsyncSops(sops_file, binary_path=fake_sops)
+    with pytest.raises(errors.SopsyCommandFailedError, match="fake sops failure"):
+        _ = asyncio.run(s.rotate())
+
+
+def test_async_sops_as_environ(
+    monkeypatch: pytest.MonkeyPatch, fake_sops: Path, tmp_path: Path
+) -> None:
+    """Test aio.AsyncSops.as_environ function awaits the decryption."""
+    monkeypatch.setenv("SOPSY_ASYNC", "before")
+    sops_file = tmp_path / "secret.json"
+    _ = sops_file.write_text('{"SOPSY_ASYNC": "world"}')
+    s = aio.AsyncSops(sops_file, binary_path=fake_sops)
+    assert asyncio.run(s.as_environ()) == {"SOPSY_ASYNC": "world"}
+    assert os.environ["SOPSY_ASYNC"] == "world"
+
+
+def test_async_sops_timeout(
+    monkeypatch: pytest.MonkeyPatch, fake_sops: Path, tmp_path: Path
+) -> None:
+    """Test aio.AsyncSops.decrypt function kills the process on timeout."""
+    monkeypatch.setenv("FAKE_SOPS_SLEEP", "10")
+    sops_file = tmp_path / "secret.json"
+    _ = sops_file.write_text("{}")
+    s = aio.AsyncSops(sops_file, binary_path=fake_sops, timeout=0.5)
+    start = time.perf_counter()
+    with pytest.raises(errors.SopsyTimeoutError):
+        _ = asyncio.run(s.decrypt())
+    assert time.perf_counter() - start < 5  # noqa: PLR2004
+
+
+def test_async_sops_retries(
+    monkeypatch: pytest.MonkeyPatch, fake_sops: Path, tmp_path: Path
+) -> None:
+    """Test aio.AsyncSops.decrypt function runs sops again after a transient error."""
+    monkeypatch.setenv("FAKE_SOPS_FAIL_ONCE", str(tmp_path / "failed"))
+    sops_file = tmp_path / "secret.json"
+    _ = sops_file.write_text('{"hello": "world"}')
+    s = aio.AsyncSops(sops_file, binary_path=fake_sops, retries=1)
+    assert asyncio.run(s.decrypt()) == {"hello": "world"}
+
+
+def test_async_sops_cancel(
+    monkeypatch: pytest.MonkeyPatch, fake_sops: Path, tmp_path: Path
+) -> None:
+    """Test aio.AsyncSops.decrypt function kills the process on cancellation."""
+    pid_file = tmp_path / "pid"
+    monkeypatch.setenv("FAKE_SOPS_SLEEP", "10")
+    monkeypatch.setenv("FAKE_SOPS_PIDFILE", str(pid_file))
+    sops_file = tmp_path / "secret.json"
+    _ = sops_file.write_text("{}")
+    s = aio.AsyncSops(sops_file, binary_path=fake_sops)
+
+    async def _cancel() -> None:
+        task = asyncio.ensure_future(s.decrypt())
+        while not pid_file.exists() or not pid_file.read_text():  # noqa: ASYNC110
+            await asyncio.sleep(0.05)
+        _ = task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(_cancel())
+    with pytest.raises(ProcessLookupError):
+        os.kill(int(pid_file.read_text()), 0)
+
+
+def test_async_sops_semaphore(
+    monkeypatch: pytest.MonkeyPatch, fake_sops: Path, tmp_path: Path
+) -> None:
+    """Test aio.AsyncSops limits the number of concurrent sops processes."""
+    monkeypatch.setenv("FAKE_SOPS_SLEEP", "0.3")
+    sops_file = tmp_path / "secret.json"
+    _ = sops_file.write_text("{}")
+
+    async def _gather(limit: int) -> float:
+        semaphore = asyncio.Semaphore(limit)
+        s = aio.AsyncSops(sops_file, binary_path=fake_sops, semaphore=semaphore)
+        start = time.perf_counter()
+        _ = await asyncio.gather(*(s.decrypt() for _ in range(3)))
+        return time.perf_counter() - start
+
+    assert asyncio.run(_gather(1)) >= 0.9  # noqa: PLR2004
+    assert asyncio.run(_gather(3)) < 0.9  # noqa: PLR2004
+
+
+def test_async_sops_native(
+    fake_sops: Path, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    """Test aio.AsyncSops functions run the native engine off the event loop."""
+    threads: list[int] = []
+
+    def _native(*_args: Any, **_kwargs: Any) -> Any:
+        threads.append(threading.get_ident())
+        return {"hello": "world"}
+
+    for name in ("_native_decrypt", "_native_encrypt", "_native_get_path"):
+        monkeypatch.setattr(sopsy.Sops, name, _native)
+    s = aio.AsyncSops(tmp_path / "secret.json", binary_path=fake_sops, native=True)
+
+    async def _main() -> Any:
+        return (
+            await s.decrypt(),
+            await s.encrypt(),
+            await s.get("hello"),
+            threading.get_ident(),
+        )
+
+    decrypted, encrypted, value, loop_thread = asyncio.run(_main())
+    assert decrypted == encrypted == value == {"hello": "world"}
+    assert len(threads) == 3  # noqa: PLR2004
+    assert loop_thread not in threads
+
+
+def test_async_sops_blocking_methods(fake_sops: Path, tmp_path: Path) -> None:
+    """Test aio.AsyncSops functions inherited from Sops are awaitable."""
+    sops_file = tmp_path / "secret.json"
+    _ = sops_file.write_text('{"HELLO": "world"}')
+    s = aio.AsyncSops(sops_file, binary_path=fake_sops)
+    asyncio.run(s.set("HELLO", "you"))
+    assert json.loads(sops_file.read_text()) == {"HELLO": "you"}
+    asyncio.run(s.update({"OTHER": "value"}))
+    assert json.loads(sops_file.read_text()) == {"HELLO": "you", "OTHER": "value"}
+    dst = BytesIO()
+    assert asyncio.run(s.decrypt_stream(None, dst)) == len(dst.getvalue())
+    assert json.loads(dst.getvalue()) == {"HELLO": "you", "OTHER": "value"}
+    dst = BytesIO()
+    _ = asyncio.run(s.encrypt_stream(None, dst))
+    assert dst.getvalue() == sops_file.read_bytes()
+    result = asyncio.run(s.exec_env('echo "$HELLO"', capture_output=True))
+    assert result.stdout == b"you\n"
+    result = asyncio.run(s.exec_file("cat {}", capture_output=True))
+    assert json.loads(result.stdout or b"") == {"HELLO": "you", "OTHER": "value"}
@@ -0,0 +1,154 @@
+"""SOPSy Batch Tests."""
+
+import shutil
+import subprocess
+import time
+from datetime import datetime
+from datetime import timezone
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from sopsy import batch
+from sopsy import errors
+
+
+@pytest.fixture(autouse=True)
+def _mock_sops(mock_run: Any, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(shutil, "which", lambda *_args, **_kwargs: "sops")
+    mock_run(_mock_subprocess_run)
+
+
+def test_decrypt_many(tmp_path: Path) -> None:
+    """Test batch.decrypt_many function keeps input order and collects errors."""
+    files = [tmp_path / f"{name}.json" for name in ("slow", "fail", "fast")]
+    results = batch.decrypt_many(files, max_workers=3)
+    assert [r.file for r in results] == files
+    assert results[0].output == {"file": "slow.json"}
+    assert not results[1].ok
+    assert isinstance(results[1].error, errors.SopsyCommandFailedError)
+    assert results[2].output == {"file": "fast.json"}
+    assert all(r.elapsed > 0 for r in results)
+
+
+def test_decrypt_many_os_error(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    """Test batch.decrypt_many function collects OS errors as failures."""
+
+    def _decrypt(*_args: Any, **_kwargs: Any) -> Any:
+        msg = "disk full"
+        raise OSError(msg)
+
+    monkeypatch.setattr(batch.Sops, "decrypt", _decrypt)
+    results = batch.decrypt_many([tmp_path / "fast.json"])
+    assert not results[0].ok
+    assert isinstance(results[0].error, errors.SopsyError)
+    assert str(results[0].error) == "disk full"
+
+
+def test_iter_many(tmp_path: Path) -> None:
+    """Test batch.iter_many function yields results in completion order."""
+    files = [tmp_path / f"{name}.json" for name in ("slow", "fast")]
+    results = list(batch.iter_many("rotate", files, max_workers=2))
+    assert [r.file for r in results] == files[::-1]
+
+
+def test_iter_many_bad_operation(tmp_path: Path) -> None:
+    """Test batch.iter_many function with an unsupported operation."""
+    with pytest.raises(errors.SopsyError):
+        _ = list(batch.iter_many("edit", [tmp_path / "fast.json"]))
+
+
+def test_encrypt_many_concurrency(tmp_path: Path) -> None:
+    """Test batch.encrypt_many function runs commands concurrently."""
+    files = [tmp_path / f"slow{i}.json" for i in range(4)]
+    start = time.perf_counter()
+    results = batch.encrypt_many(files, max_workers=4)
+    assert all(r.ok for r in results)
+    assert time.perf_counter() - start < 4 * _SLOW_DELAY
+
+
+def test_exec_many(tmp_path: Path) -> None:
+    """Test batch.exec_many function runs commands concurrently, in order."""
+    sops_file = tmp_path / "secret.env"
+    jobs = [(sops_file, f"slow{i}") for i in range(3)] + [(sops_file, "fail")]
+    start = time.perf_counter()
+    results = batch.exec_many(jobs, mode="file", max_workers=4)
+    assert time.perf_counter() - start < 3 * _SLOW_DELAY
+    assert [r.command for r in results] == ["slow0", "slow1", "slow2", "fail"]
+    assert [r.returncode for r in results] == [0, 0, 0, 1]
+    assert all(r.elapsed >= _SLOW_DELAY for r in results[:3])
+
+
+def test_exec_many_bad_mode(tmp_path: Path) -> None:
+    """Test batch.exec_many function with an unsupported mode."""
+    with pytest.raises(errors.SopsyError):
+        _ = batch.exec_many([(tmp_path / "secret.env", "true")], mode="stdin")
+
+
+def _sops_file(path: Path, lastmodified: str) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    _ = path.write_text(f'{{"sops": {{"lastmodified": "{lastmodified}"}}}}')
+    return path
+
+
+def test_rotate_tree(tmp_path: Path) -> None:
+    """Test batch.rotate_tree function rotates matching files in place."""
+    old = _sops_file(tmp_path / "a" / "old.enc.json", "2024-01-01T00:00:00Z")
+    new = _sops_file(tmp_path / "new.enc.json", "2024-12-01T00:00:00Z")
+    failing = _sops_file(tmp_path / "a" / "b" / "fail.enc.json", "2024-01-01T00:00:00Z")
+    ignored = _sops_file(tmp_path / "plain.json", "2024-01-01T00:00:00Z")
+    old.chmod(0o600)
+    seen: Any = []
+    summary = batch.rotate_tree(
+        tmp_path,
+        modified_before=datetime(2024, 6, 1, tzinfo=timezone.utc),
+        progress=seen.append,
+    )
+    assert [r.file for r in summary.rotated] == [old]
+    assert [r.file for r in summary.skipped] == [new]
+    assert [r.file for r in summary.failed] == [failing]
+    assert len(seen) == 3  # noqa: PLR2004
+    assert old.read_text() == '{"file": "old.enc.json"}'
+    assert old.stat().st_mode & 0o777 == 0o600  # noqa: PLR2004
+    assert "2024-12-01" in new.read_text()
+    assert "2024-01-01" in failing.read_text()
+    assert "2024-01-01" in ignored.read_text()
+    assert sorted(p.name for p in tmp_path.rglob("*.tmp")) == []
+    assert "rotated 1 file(s), skipped 1, failed 1" in str(summary)
+    assert f"{failing}: pytest" in str(summary)
+
+
+@pytest.mark.parametrize(
+    ("name", "content", "expected"),
+    [
+        ("a.json", '{"sops": {"lastmodified": "2024-10-10T19:34:48Z"}}', 2024),
+        ("a.yaml", "sops:\n  lastmodified: '2023-10-10T19:34:48Z'\n", 2023),
+        ("a.yaml", "sops:\n  lastmodified: 2020-10-10T19:34:48Z\n", 2020),
+        ("a.env", "sops_lastmodified=2022-10-10T19:34:48Z\n", 2022),
+        ("a.ini", "[sops]\nlastmodified = 2021-10-10T19:34:48Z\n", 2021),
+        ("a.json", '{"hello": "world"}', None),
+        ("a.json", "not json", None),
+    ],
+)
+def test_sops_lastmodified(
+    tmp_path: Path, name: str, content: str, expected: Any
+) -> None:
+    """Test batch.sops_lastmodified function with the sops file formats."""
+    path = tmp_path / name
+    _ = path.write_text(content)
+    lastmodified = batch.sops_lastmodified(path)
+    assert (lastmodified.year if lastmodified else None) == expected
+
+
+_SLOW_DELAY = 0.2
+
+
+def _mock_subprocess_run(cmd: Any, **_kwargs: Any) -> object:
+    name = Path(cmd[-1]).name
+    if name.startswith("slow"):
+        time.sleep(_SLOW_DELAY)
+    if name.startswith("fail"):
+        raise subprocess.CalledProcessError(cmd=cmd, returncode=1, stderr=b"pytest")
+    stdout = f'{{"file": "{name}"}}'.encode()
+    return subprocess.CompletedProcess(args=cmd, returncode=0, stdout=stdout)
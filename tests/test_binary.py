@@ -0,0 +1,110 @@
+"""SOPSy Binary Tests."""
+
+import shutil
+import sys
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from sopsy import binary
+from sopsy import errors
+
+# A stand-in for the sops binary answering --version and --help, it counts its runs.
+PROBED_SOPS = """
+import os
+import sys
+
+with open(os.environ["PROBED_SOPS_COUNT"], "a") as fp:
+    fp.write(sys.argv[1] + "\\n")
+if sys.argv[1] == "--version":
+    print("sops 3.9.1 (latest)")
+else:
+    print("NAME:\\n   sops - encrypted file editor\\n")
+    print("COMMANDS:")
+    print("   exec-env    execute a command with decrypted values")
+    print("   keyservice  start a SOPS key service server")
+    print("   help, h     Shows a list of commands or help for one command")
+    print("\\nGLOBAL OPTIONS:\\n   --decrypt, -d  decrypt a file")
+"""
+
+
+@pytest.fixture
+def probed_sops(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> Path:
+    """Write an executable stand-in for the sops binary, counting its runs."""
+    path = tmp_path / "sops"
+    _ = path.write_text(f"#!{sys.executable}\n{PROBED_SOPS}")
+    path.chmod(0o755)
+    monkeypatch.setenv("PROBED_SOPS_COUNT", str(tmp_path / "count"))
+    return path
+
+
+def test_binary_resolve_binary(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test binary.resolve_binary function looks up once per name and PATH."""
+    calls = []
+
+    def _which(name: Any, *_args: Any, **_kwargs: Any) -> str:
+        calls.append(name)
+        return "/usr/local/bin/sops"
+
+    monkeypatch.setattr(shutil, "which", _which)
+    assert binary.resolve_binary("sops") == Path("/usr/local/bin/sops")
+    assert binary.resolve_binary("sops") == Path("/usr/local/bin/sops")
+    assert len(calls) == 1
+    monkeypatch.setenv("PATH", "/somewhere/else")
+    _ = binary.resolve_binary("sops")
+    assert len(calls) == 2  # noqa: PLR2004
+
+
+def test_binary_resolve_binary_not_found(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test binary.resolve_binary function does not remember missing binaries."""
+    monkeypatch.setattr(shutil, "which", lambda *_args, **_kwargs: None)
+    assert binary.resolve_binary("sops") is None
+    monkeypatch.setattr(shutil, "which", lambda *_args, **_kwargs: "/bin/sops")
+    assert binary.resolve_binary("sops") == Path("/bin/sops")
+
+
+def test_binary_binary_info(probed_sops: Path, tmp_path: Path) -> None:
+    """Test binary.binary_info function probes the binary once."""
+    info = binary.binary_info(probed_sops)
+    assert info.path == probed_sops
+    assert info.version == (3, 9, 1)
+    assert info.subcommands == {"exec-env", "keyservice"}
+    assert info.supports("exec-env")
+    assert not info.supports("filestatus")
+    assert not info.supports("set --value-stdin")
+    with pytest.raises(errors.SopsyError, match=r"sops >= 3\.9\.0 is required"):
+        info.require("set --value-stdin")
+    assert binary.binary_info(probed_sops) is info
+    assert (tmp_path / "count").read_text().split() == ["--version", "--help"]
+
+
+def test_binary_binary_info_unknown(tmp_path: Path) -> None:
+    """Test binary.binary_info function with a binary it cannot probe."""
+    path = tmp_path / "sops"
+    _ = path.write_text("#!/bin/sh\nexit 1\n")
+    path.chmod(0o755)
+    info = binary.binary_info(path)
+    assert info.version is None
+    assert info.subcommands == frozenset()
+    assert info.supports("set --value-stdin")
+
+
+def test_binary_binary_info_not_found(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test binary.binary_info function with a missing binary."""
+    monkeypatch.setattr(shutil, "which", lambda *_args, **_kwargs: None)
+    with pytest.raises(errors.SopsyCommandNotFoundError):
+        _ = binary.binary_info()
+
+
+def test_binary_sops_binary_info_supports() -> None:
+    """Test binary.SopsBinaryInfo.supports function gates features on the version."""
+    subcommands = frozenset({"decrypt", "set"})
+    old = binary.SopsBinaryInfo(Path("sops"), (3, 8, 1), subcommands)
+    new = binary.SopsBinaryInfo(Path("sops"), (3, 9, 0), subcommands)
+    assert not old.supports("decrypt --extract")
+    assert new.supports("decrypt --extract")
+    assert new.supports("set --value-stdin")
+    new.require("set --value-stdin")
+    with pytest.raises(errors.SopsyError, match=r"sops 3\.8\.1 .* does not support"):
+        old.require("set --value-stdin")
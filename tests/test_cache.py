@@ -0,0 +1,127 @@
+"""SOPSy Cache Tests."""
+
+import shutil
+import subprocess
+import time
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from sopsy import cache
+from sopsy import sopsy
+
+
+def test_lru_cache_eviction() -> None:
+    """Test cache.LRUCache evicts least recently used entries."""
+    c: cache.LRUCache[int] = cache.LRUCache(maxsize=2)
+    c.set("a", 1)
+    c.set("b", 2)
+    assert c.get("a") == 1
+    c.set("c", 3)
+    assert c.get("b") is None
+    assert c.get("a") == 1
+    assert c.get("c") == 3  # noqa: PLR2004
+    assert len(c) == 2  # noqa: PLR2004
+
+
+def test_lru_cache_ttl(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test cache.LRUCache expires entries after ttl."""
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+    c: cache.LRUCache[int] = cache.LRUCache(ttl=10)
+    c.set("a", 1)
+    assert c.get("a") == 1
+    monkeypatch.setattr(time, "monotonic", lambda: now + 11)
+    assert c.get("a") is None
+    assert (c.hits, c.misses) == (1, 1)
+
+
+def test_lru_cache_clear() -> None:
+    """Test cache.LRUCache.clear function."""
+    c: cache.LRUCache[int] = cache.LRUCache()
+    c.set("a", 1)
+    _ = c.get("a")
+    c.clear()
+    assert len(c) == 0
+    assert (c.hits, c.misses) == (0, 0)
+
+
+def test_decrypt_cache_returns_copies() -> None:
+    """Test cache.DecryptCache does not share mutable documents."""
+    c = cache.DecryptCache()
+    doc = {"hello": "world"}
+    c.set("a", doc)
+    doc["hello"] = "changed"
+    cached = c.get("a")
+    cached["hello"] = "changed too"
+    assert c.get("a") == {"hello": "world"}
+
+
+def test_decrypt_cache_invalidate(tmp_path: Path) -> None:
+    """Test cache.DecryptCache.invalidate function."""
+    sops_file = tmp_path / "secret.json"
+    _ = sops_file.write_text("{}")
+    other_file = tmp_path / "other.json"
+    _ = other_file.write_text("{}")
+    c = cache.DecryptCache()
+    c.set(cache.file_key(sops_file, True), {"hello": "world"})  # noqa: FBT003
+    c.set(cache.file_key(other_file, True), {"hello": "world"})  # noqa: FBT003
+    c.invalidate(sops_file)
+    assert c.get(cache.file_key(sops_file, True)) is None  # noqa: FBT003
+    assert c.get(cache.file_key(other_file, True)) is not None  # noqa: FBT003
+
+
+def test_file_key_changes_with_content(tmp_path: Path) -> None:
+    """Test cache.file_key changes when the file is modified."""
+    sops_file = tmp_path / "secret.json"
+    _ = sops_file.write_text("{}")
+    key = cache.file_key(sops_file)
+    _ = sops_file.write_text('{"hello": "world"}')
+    assert key != cache.file_key(sops_file)
+
+
+def test_file_signature(tmp_path: Path) -> None:
+    """Test cache.file_signature function on existing and missing files."""
+    sops_file = tmp_path / "secret.json"
+    _ = sops_file.write_text("{}")
+    assert cache.file_signature(sops_file) == cache.file_key(sops_file)[1:]
+    assert cache.file_signature(tmp_path / "missing.json") is None
+
+
+def test_sops_decrypt_cached(
+    mock_run: Any, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    """Test sops.Sops.decrypt function with a shared cache."""
+    calls: list[Any] = []
+
+    def _run(*args: Any, **_kwargs: Any) -> object:
+        calls.append(args)
+        return subprocess.CompletedProcess(
+            args=[], returncode=0, stdout=b'{"hello": "world"}'
+        )
+
+    mock_run(_run)
+    monkeypatch.setattr(shutil, "which", lambda *_args, **_kwargs: "sops")
+    sops_file = tmp_path / "secret.json"
+    _ = sops_file.write_text("{}")
+    c = cache.DecryptCache()
+    assert sopsy.Sops(sops_file, cache=c).get("hello") == "world"
+    assert sopsy.Sops(sops_file, cache=c).get("hello") == "world"
+    assert len(calls) == 1
+    assert (c.hits, c.misses) == (1, 1)
+    _ = sops_file.write_text('{"changed": true}')
+    _ = sopsy.Sops(sops_file, cache=c).decrypt()
+    assert len(calls) == 2  # noqa: PLR2004
+
+
+def test_data_key_cache_zeroise() -> None:
+    """Test cache.DataKeyCache overwrites evicted keys with zeros."""
+    c = cache.DataKeyCache(maxsize=1)
+    first = bytearray(b"\x01" * 32)
+    second = bytearray(b"\x02" * 32)
+    c.set("first", first)
+    c.set("second", second)
+    assert first == bytes(32)
+    c.clear()
+    assert second == bytes(32)
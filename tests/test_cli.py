@@ -0,0 +1,79 @@
+"""SOPSy CLI Tests."""
+
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from sopsy import cli
+
+
+def test_cli_rotate(
+    capsys: pytest.CaptureFixture[str],
+    fake_sops: Path,
+    tmp_path: Path,
+) -> None:
+    """Test cli.main function with the rotate command."""
+    ok = tmp_path / "ok.enc.json"
+    _ = ok.write_text('{"hello": "world"}')
+    failing = tmp_path / "fail.enc.json"
+    _ = failing.write_text('{"hello": "world"}')
+    code = cli.main(["rotate", str(tmp_path), "--binary-path", str(fake_sops)])
+    out, err = capsys.readouterr()
+    assert code == 1
+    assert f"rotated {ok}" in err
+    assert f"failed {failing}" in err
+    assert "rotated 1 file(s), skipped 0, failed 1" in out
+    assert "files/s" in out
+    assert f"{failing}: fake sops failure" in out
+
+
+def test_cli_rotate_quiet(
+    capsys: pytest.CaptureFixture[str],
+    fake_sops: Path,
+    tmp_path: Path,
+) -> None:
+    """Test cli.main function with the rotate command and nothing to fail."""
+    _ = (tmp_path / "ok.enc.yaml").write_text("hello: world")
+    args = ["rotate", str(tmp_path), "--quiet", "--binary-path", str(fake_sops)]
+    assert cli.main(args) == 0
+    out, err = capsys.readouterr()
+    assert err == ""
+    assert "rotated 1 file(s)" in out
+
+
+def test_cli_usage(capsys: pytest.CaptureFixture[str]) -> None:
+    """Test cli.main function without command."""
+    with pytest.raises(SystemExit):
+        _ = cli.main([])
+    assert "usage: sopsy" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        ("2024-10-01", datetime(2024, 10, 1, tzinfo=timezone.utc)),
+        ("2024-10-01T12:30:00Z", datetime(2024, 10, 1, 12, 30, tzinfo=timezone.utc)),
+        (
+            "2024-10-01T12:30:00+02:00",
+            datetime(2024, 10, 1, 12, 30, tzinfo=timezone(timedelta(hours=2))),
+        ),
+    ],
+)
+def test_cli_rotate_modified_before(value: str, expected: Any) -> None:
+    """Test cli.build_parser function parses --modified-before as UTC dates."""
+    args = cli.build_parser().parse_args(["rotate", ".", "--modified-before", value])
+    assert args.modified_before == expected
+    assert args.modified_before.utcoffset() == expected.utcoffset()
+
+
+def test_cli_rotate_modified_before_invalid(
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    """Test cli.main function with an invalid --modified-before date."""
+    with pytest.raises(SystemExit):
+        _ = cli.main(["rotate", ".", "--modified-before", "yesterday"])
+    assert "invalid ISO 8601 date: 'yesterday'" in capsys.readouterr().err
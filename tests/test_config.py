@@ -0,0 +1,83 @@
+"""SOPSy Config Tests."""
+
+from pathlib import Path
+
+import pytest
+
+from sopsy import config
+from sopsy import errors
+from sopsy import utils
+
+SOPS_CONFIG = r"""creation_rules:
+  - path_regex: ^prod/.*\.json$
+    age: age1prod
+  - path_regex: ^staging/
+    age: age1prod
+    encrypted_regex: ^password$
+  - path_regex: \.yaml$
+    age: age1yaml
+"""
+
+
+def test_sops_config_rule_for(tmp_path: Path) -> None:
+    """Test config.SopsConfig.rule_for function matches paths like sops does."""
+    sops_config = tmp_path / ".sops.yaml"
+    _ = sops_config.write_text(SOPS_CONFIG + "  - age: age1default\n")
+    c = config.SopsConfig.from_file(sops_config)
+    assert c.rule_for(tmp_path / "prod" / "db.json") == {
+        "path_regex": r"^prod/.*\.json$",
+        "age": "age1prod",
+    }
+    assert c.rule_index(tmp_path / "staging" / "db.json") == 1
+    assert c.rule_index(tmp_path / "prod" / "db.yaml") == 2  # noqa: PLR2004
+    assert c.rule_index(tmp_path / "dev" / "db.json") == 3  # noqa: PLR2004
+    # paths outside of the config directory stay absolute
+    assert c.rule_index("/prod/db.json") == 3  # noqa: PLR2004
+    assert config.SopsConfig({}).rule_for(tmp_path / "db.json") is None
+
+
+def test_sops_config_from_file_cached(tmp_path: Path) -> None:
+    """Test config.SopsConfig.from_file function only compiles changed files."""
+    sops_config = tmp_path / ".sops.yaml"
+    _ = sops_config.write_text(SOPS_CONFIG)
+    c = config.SopsConfig.from_file(sops_config)
+    assert config.SopsConfig.from_file(sops_config) is c
+    _ = sops_config.write_text(SOPS_CONFIG + "  - age: age1default\n")
+    assert config.SopsConfig.from_file(sops_config) is not c
+    _ = sops_config.write_text("creation_rules: [{path_regex: '('}]")
+    with pytest.raises(errors.SopsyError, match="path_regex"):
+        _ = config.SopsConfig.from_file(sops_config)
+
+
+def test_sops_config_load(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    """Test config.SopsConfig.load function merges the config dict."""
+    monkeypatch.chdir(tmp_path)
+    assert config.SopsConfig.load().rules == []
+    sops_config = tmp_path / ".sops.yaml"
+    _ = sops_config.write_text(SOPS_CONFIG)
+    utils.clear_config_cache()
+    c = config.SopsConfig.load(sops_config)
+    assert c is config.SopsConfig.from_file(sops_config)
+    c = config.SopsConfig.load(config_dict={"creation_rules": [{"age": "age1dict"}]})
+    assert c.directory == tmp_path
+    assert c.rule_for(tmp_path / "any.txt") == {"age": "age1dict"}
+    assert c.rule_index(tmp_path / "prod" / "db.json") == 0
+
+
+def test_sops_config_group(tmp_path: Path) -> None:
+    """Test config.SopsConfig.group function groups files by key set."""
+    sops_config = tmp_path / ".sops.yaml"
+    _ = sops_config.write_text(SOPS_CONFIG)
+    c = config.SopsConfig.from_file(sops_config)
+    files = [
+        tmp_path / "prod" / "a.json",
+        tmp_path / "staging" / "b.json",
+        tmp_path / "c.yaml",
+        tmp_path / "d.txt",
+    ]
+    assert c.resolve(files) == dict(zip(files, [0, 1, 2, None]))
+    assert c.group(files) == {
+        0: files[:2],
+        2: [files[2]],
+        None: [files[3]],
+    }
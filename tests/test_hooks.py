@@ -0,0 +1,193 @@
+"""SOPSy Hooks Tests."""
+
+import io
+import logging
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from sopsy import cache
+from sopsy import errors
+from sopsy import hooks
+from sopsy import sopsy
+
+
+def _record() -> Any:
+    events: list[hooks.SopsyEvent] = []
+    _ = hooks.add_hook(events.append)
+    return events
+
+
+def test_hooks_run_cmd(fake_sops: Path, tmp_path: Path) -> None:
+    """Test hooks.add_hook function receives sops command events."""
+    events = _record()
+    sops_file = tmp_path / "secret.json"
+    _ = sops_file.write_text('{"hello": "world"}')
+    assert sopsy.Sops(sops_file, binary_path=fake_sops).decrypt()
+    [event] = events
+    assert event.kind == "decrypt"
+    assert event.backend == "binary"
+    assert event.file == str(sops_file)
+    assert event.exit_code == 0
+    assert event.bytes_in == 0
+    assert event.bytes_out == len('{"hello": "world"}')
+    assert event.error is None
+    assert event.started > 0
+    assert min(event.spawn, event.wait, event.parse) >= 0
+    assert event.duration == event.spawn + event.wait + event.parse
+
+
+def test_hooks_run_cmd_fail(fake_sops: Path, tmp_path: Path) -> None:
+    """Test hooks events of failing sops commands."""
+    events = _record()
+    sops_file = tmp_path / "fail.json"
+    _ = sops_file.write_text("{}")
+    with pytest.raises(errors.SopsyCommandFailedError):
+        _ = sopsy.Sops(sops_file, binary_path=fake_sops).decrypt()
+    [event] = events
+    assert event.exit_code == 1
+    assert event.error == "SopsyCommandFailedError"
+
+
+def test_hooks_run_cmd_retry(
+    fake_sops: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test hooks events of sops commands run again after a transient error."""
+    monkeypatch.setenv("FAKE_SOPS_FAIL_ONCE", str(tmp_path / "failed"))
+    events = _record()
+    sops_file = tmp_path / "secret.json"
+    _ = sops_file.write_text("{}")
+    s = sopsy.Sops(sops_file, binary_path=fake_sops, retries=2)
+    assert s.decrypt() == {}
+    assert [(e.attempt, e.exit_code) for e in events] == [(1, 1), (2, 0)]
+
+
+def test_hooks_native_fallback(fake_sops: Path, tmp_path: Path) -> None:
+    """Test no native event is emitted when the sops binary decrypts instead."""
+    events = _record()
+    sops_file = tmp_path / "secret.env"
+    _ = sops_file.write_text("HELLO=world")
+    s = sopsy.Sops(sops_file, binary_path=fake_sops, native=True)
+    assert s.decrypt(to_dict=False) == b"HELLO=world"
+    _ = s.decrypt()
+    assert [event.backend for event in events] == ["binary", "binary"]
+
+
+def test_hooks_no_secrets(
+    fake_sops: Path, caplog: pytest.LogCaptureFixture, tmp_path: Path
+) -> None:
+    """Test secret payloads are neither logged nor passed to the hooks."""
+    caplog.set_level(logging.DEBUG)
+    events = _record()
+    s = sopsy.Sops(
+        b'{"password": "hunter2"}',
+        input_source=sopsy.SopsyInputSource.STDIN,
+        input_type="json",
+        binary_path=fake_sops,
+    )
+    assert s.encrypt() == {"password": "hunter2"}
+    dst = io.BytesIO()
+    sops_file = tmp_path / "secret.json"
+    _ = sops_file.write_text('{"password": "hunter2"}')
+    _ = sopsy.Sops(sops_file, binary_path=fake_sops).decrypt_stream(None, dst)
+    assert "hunter2" not in caplog.text
+    assert all("hunter2" not in repr(event) for event in events)
+    assert [e.kind for e in events] == ["encrypt", "decrypt"]
+    assert events[0].file is None
+    assert events[0].bytes_in == len('{"password": "hunter2"}')
+    assert events[1].bytes_out == len('{"password": "hunter2"}')
+
+
+def test_hooks_cache(fake_sops: Path, tmp_path: Path) -> None:
+    """Test hooks events of decrypt cache lookups."""
+    events = _record()
+    sops_file = tmp_path / "secret.json"
+    _ = sops_file.write_text('{"hello": "world"}')
+    c = cache.DecryptCache()
+    for _ in range(2):
+        _ = sopsy.Sops(sops_file, binary_path=fake_sops, cache=c).decrypt()
+    assert [(e.backend, e.cache_hit) for e in events] == [
+        ("cache", False),
+        ("binary", None),
+        ("cache", True),
+    ]
+
+
+def test_hooks_failing_hook(fake_sops: Path, tmp_path: Path) -> None:
+    """Test hooks raising exceptions do not break sops commands."""
+
+    def _fail(_event: hooks.SopsyEvent) -> None:
+        raise RuntimeError
+
+    _ = hooks.add_hook(_fail)
+    events = _record()
+    sops_file = tmp_path / "secret.json"
+    _ = sops_file.write_text('{"hello": "world"}')
+    assert sopsy.Sops(sops_file, binary_path=fake_sops).decrypt()
+    assert len(events) == 1
+    hooks.remove_hook(_fail)
+    hooks.remove_hook(events.append)
+    assert not hooks.enabled()
+
+
+def test_hooks_command_kind() -> None:
+    """Test hooks.command_kind function."""
+    assert hooks.command_kind(["sops", "--config", "c", "exec-env", "f"]) == "exec-env"
+    assert hooks.command_kind(["sops", "--version"]) == "sops"
+
+
+def test_hooks_otel_hook() -> None:
+    """Test hooks.otel_hook function creates a span for each event."""
+    spans: list[dict[str, Any]] = []
+
+    class _Span:
+        def __init__(self, **kwargs: Any) -> None:
+            self.kwargs = kwargs
+            spans.append(kwargs)
+
+        def end(self, end_time: int) -> None:
+            self.kwargs["end_time"] = end_time
+
+    class _Tracer:
+        def start_span(self, name: str, **kwargs: Any) -> _Span:
+            return _Span(name=name, **kwargs)
+
+    hook = hooks.otel_hook(_Tracer())
+    hook(hooks.SopsyEvent(kind="decrypt", file="a.json", started=1.0, wait=0.5))
+    [span] = spans
+    assert span["name"] == "sops decrypt"
+    assert span["start_time"] == int(1e9)
+    assert span["end_time"] == int(1.5e9)
+    assert span["attributes"]["sopsy.file"] == "a.json"
+    assert "sopsy.exit_code" not in span["attributes"]
+
+
+def test_hooks_latency_from_samples() -> None:
+    """Test hooks.SopsLatency.from_samples function."""
+    latency = hooks.SopsLatency.from_samples([0.4, 0.1, 0.3, 0.2])
+    assert latency.calls == 4  # noqa: PLR2004
+    assert latency.mean == pytest.approx(0.25)
+    assert latency.p50 == pytest.approx(0.2)
+    assert latency.p95 == pytest.approx(0.4)
+    assert latency.p99 == pytest.approx(0.4)
+    assert hooks.SopsLatency.from_samples([]) == hooks.SopsLatency()
+
+
+def test_hooks_latency_recorder(caplog: pytest.LogCaptureFixture) -> None:
+    """Test hooks.SopsLatencyRecorder class records latencies by outcome."""
+    recorder = hooks.SopsLatencyRecorder(max_samples=2)
+    for wait in (0.1, 0.2, 0.3):
+        recorder(hooks.SopsyEvent("decrypt", wait=wait))
+    recorder(hooks.SopsyEvent("decrypt", wait=1.0, error="SopsyTimeoutError"))
+    recorder(hooks.SopsyEvent("decrypt", wait=0.5, attempt=2))
+    recorder(hooks.SopsyEvent("decrypt", backend="cache"))
+    summary = recorder.summary()
+    assert set(summary) == {"ok", "timeout", "retry"}
+    assert summary["ok"].calls == 2  # noqa: PLR2004
+    assert summary["ok"].p99 == pytest.approx(0.5)
+    assert summary["timeout"].mean == pytest.approx(1.0)
+    assert recorder.latency("failed") == hooks.SopsLatency()
+    caplog.set_level(logging.INFO)
+    recorder.log()
+    assert "sops timeout: 1 calls" in caplog.text
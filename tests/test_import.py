@@ -0,0 +1,71 @@
+"""SOPSy Import Tests."""
+
+import subprocess
+import sys
+
+import pytest
+
+# `import sopsy` cumulative import time budget, in microseconds
+IMPORT_TIME_BUDGET = 50_000
+HEAVY_MODULES = {
+    "asyncio",
+    "concurrent.futures",
+    "configparser",
+    "orjson",
+    "shutil",
+    "subprocess",
+    "tempfile",
+    "yaml",
+}
+
+
+def _python(*args: str) -> subprocess.CompletedProcess[str]:
+    return subprocess.run(  # noqa: S603
+        [sys.executable, *args], capture_output=True, check=True, text=True
+    )
+
+
+@pytest.mark.parametrize(
+    "statement",
+    [
+        "import sopsy",
+        "from sopsy import Sops, SopsyError, SopsyInOutType",
+        "from sopsy import DecryptCache, add_hook",
+    ],
+)
+def test_import_lazy(statement: str) -> None:
+    """Test importing sopsy defers the heavy imports until they are needed."""
+    code = (
+        "import sys; before = set(sys.modules)\n"
+        f"{statement}\n"
+        "print('\\n'.join(set(sys.modules) - before))"
+    )
+    imported = set(_python("-c", code).stdout.split())
+    assert not HEAVY_MODULES & imported
+
+
+def test_import_lazy_attributes() -> None:
+    """Test sopsy public names are imported on first access."""
+    code = (
+        "import sopsy\n"
+        "assert sopsy.Sops.__module__ == 'sopsy.sopsy'\n"
+        "assert set(sopsy.__all__) <= set(dir(sopsy))\n"
+        "try:\n"
+        "    sopsy.missing\n"
+        "except AttributeError:\n"
+        "    pass\n"
+        "else:\n"
+        "    raise AssertionError"
+    )
+    _ = _python("-c", code)
+
+
+def test_import_time() -> None:
+    """Test `import sopsy` stays within its import time budget."""
+    stderr = _python("-X", "importtime", "-c", "import sopsy").stderr
+    cumulative = {}
+    for line in stderr.splitlines()[1:]:
+        # import time: self [us] | cumulative | imported package
+        _, total, name = line.split("|")
+        cumulative[name.strip()] = int(total)
+    assert cumulative["sopsy"] < IMPORT_TIME_BUDGET
@@ -0,0 +1,579 @@
+"""SOPSy Native Engine Tests."""
+
+import json
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Any
+from typing import NoReturn
+
+import pytest
+import yaml
+from test_sopsy import PLAIN_JSON
+from test_sopsy import PLAIN_YAML
+from test_sopsy import SECRET_JSON
+from test_sopsy import SECRET_YAML
+from test_sopsy import requires_sops
+
+from sopsy import binary
+from sopsy import cache
+from sopsy import errors
+from sopsy import native
+from sopsy import sopsy
+
+pytest.importorskip("cryptography")
+
+AGE_RECIPIENT = "age13q0ur562d70500mmsnxlhnmpu0cemanf9muk7tyeum0r88gnfa2scrus0l"
+
+
+def test_native_decrypt_document_json() -> None:
+    """Test native.decrypt_document function with JSON data."""
+    result = native.decrypt_document(native.load_document(SECRET_JSON, "json"))
+    assert result == {"hello": "world"}
+
+
+def test_native_decrypt_document_yaml() -> None:
+    """Test native.decrypt_document function with YAML data."""
+    result = native.decrypt_document(native.load_document(SECRET_YAML, "yaml"))
+    assert result == {"hello": "world"}
+
+
+def test_native_decrypt_path() -> None:
+    """Test native.decrypt_path function."""
+    document = native.load_document(SECRET_YAML, "yaml")
+    assert native.decrypt_path(document, ["hello"]) == "world"
+    assert native.decrypt_path(document, ["hello"], verify_mac=True) == "world"
+    with pytest.raises(KeyError):
+        _ = native.decrypt_path(document, ["sops"])
+
+
+def test_native_decrypt_path_lazy(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test native.decrypt_path function only decrypts the wanted values."""
+    decrypted: list[str] = []
+    decrypt_value = native.decrypt_value
+
+    def _decrypt_value(value: str, key: bytes, additional_data: str) -> Any:
+        decrypted.append(additional_data)
+        return decrypt_value(value, key, additional_data)
+
+    monkeypatch.setattr(native, "decrypt_value", _decrypt_value)
+    document = native.load_document(SECRET_JSON, "json")
+    document["other"] = "ENC[AES256_GCM,data:AA==,iv:AA==,tag:AA==,type:str]"
+    assert native.decrypt_path(document, ["hello"]) == "world"
+    assert decrypted == ["hello:"]
+
+
+def test_native_decrypt_document_bad_mac() -> None:
+    """Test native.decrypt_document function with a tampered document."""
+    document = json.loads(SECRET_JSON)
+    document["sops"]["lastmodified"] = "2024-10-10T19:34:49Z"
+    with pytest.raises(errors.SopsyNativeError):
+        _ = native.decrypt_document(document)
+    result = native.decrypt_document(document, verify_mac=False)
+    assert result == {"hello": "world"}
+
+
+def test_native_decrypt_document_bad_identity() -> None:
+    """Test native.decrypt_document function with a non matching identity."""
+    with pytest.raises(errors.SopsyNativeError):
+        _ = native.decrypt_document(json.loads(SECRET_JSON), identities=[bytes(32)])
+
+
+def test_native_decrypt_document_unsupported_key() -> None:
+    """Test native.decrypt_document function with non age master keys."""
+    document = json.loads(SECRET_JSON)
+    document["sops"]["age"] = None
+    document["sops"]["kms"] = [{"arn": "arn:aws:kms:eu-west-1:1:key/1", "enc": ""}]
+    with pytest.raises(errors.SopsyNativeError):
+        _ = native.decrypt_document(document)
+
+
+def test_native_decrypt_document_data_key_cache(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test native.decrypt_document function reuses unwrapped data keys."""
+    calls: list[str] = []
+    age_decrypt = native.age_decrypt
+
+    def _age_decrypt(armored: str, identity: bytes) -> bytes:
+        calls.append(armored)
+        return age_decrypt(armored, identity)
+
+    monkeypatch.setattr(native, "age_decrypt", _age_decrypt)
+    key_cache = cache.DataKeyCache()
+    document = json.loads(SECRET_JSON)
+    _ = native.decrypt_document(document, key_cache=key_cache)
+    _ = native.decrypt_document(document, key_cache=key_cache)
+    assert len(calls) == 1
+    assert (key_cache.hits, key_cache.misses) == (1, 1)
+    _ = native.decrypt_document(document, key_cache=None)
+    assert len(calls) == 2  # noqa: PLR2004
+
+
+def test_native_load_document_yaml_comments() -> None:
+    """Test native.load_document function refuses YAML with comments."""
+    with pytest.raises(errors.SopsyNativeError):
+        _ = native.load_document("#ENC[AES256_GCM,data:...]\n" + SECRET_YAML, "yaml")
+
+
+def test_native_load_age_identities_file(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    """Test native.load_age_identities function with SOPS_AGE_KEY_FILE."""
+    key_file = tmp_path / "keys.txt"
+    key = native.bech32_encode(native.AGE_IDENTITY_HRP, bytes(range(32))).upper()
+    _ = key_file.write_text(f"# created: 2024-10-10\n{key}\n")
+    monkeypatch.setenv("SOPS_AGE_KEY", "")
+    monkeypatch.setenv("SOPS_AGE_KEY_FILE", str(key_file))
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path))
+    assert native.load_age_identities() == [bytes(range(32))]
+
+
+def test_native_bech32_roundtrip() -> None:
+    """Test native.bech32_encode and native.bech32_decode functions."""
+    value = native.bech32_encode("age", b"\x01" * 32)
+    assert value.startswith("age1")
+    assert native.bech32_decode(value) == ("age", b"\x01" * 32)
+    with pytest.raises(errors.SopsyNativeError):
+        _ = native.bech32_decode(value.replace("age1", "age1q", 1))
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        ("hello", b"hello"),
+        (True, b"True"),
+        (42, b"42"),
+        (1.0, b"1"),
+        (1.5, b"1.5"),
+        (1e21, b"1000000000000000000000"),
+    ],
+)
+def test_native_value_to_bytes(value: Any, expected: bytes) -> None:
+    """Test native.value_to_bytes function matches sops representation."""
+    assert native.value_to_bytes(value) == expected
+
+
+def test_sops_decrypt_native(
+    mock_run: Any, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    """Test sops.Sops.decrypt function with the native engine."""
+    monkeypatch.setattr(shutil, "which", lambda *_args, **_kwargs: "sops")
+    mock_run(_mock_subprocess_run_fail)
+    sops_file = tmp_path / "secret.yaml"
+    _ = sops_file.write_text(SECRET_YAML)
+    assert sopsy.Sops(sops_file, native=True).decrypt() == {"hello": "world"}
+    d = sopsy.Sops(
+        SECRET_JSON,
+        input_source=sopsy.SopsyInputSource.STDIN,
+        input_type="json",
+        native=True,
+    ).decrypt()
+    assert d == {"hello": "world"}
+
+
+def test_sops_decrypt_native_fallback(
+    mock_run: Any, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    """Test sops.Sops.decrypt function falls back to the sops binary."""
+    monkeypatch.setattr(shutil, "which", lambda *_args, **_kwargs: "sops")
+    mock_run(_mock_subprocess_run)
+    document = yaml.safe_load(SECRET_YAML)
+    document["sops"]["age"] = []
+    sops_file = tmp_path / "secret.yaml"
+    _ = sops_file.write_text(yaml.dump(document))
+    assert sopsy.Sops(sops_file, native=True).decrypt() == {"hello": "sops"}
+    sops_file = tmp_path / "secret.json"
+    _ = sops_file.write_text(SECRET_JSON)
+    s = sopsy.Sops(sops_file, native=True, extract='["hello"]')
+    assert s.decrypt() == {"hello": "sops"}
+
+
+def test_sops_get_native(
+    mock_run: Any, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    """Test sops.Sops.get and get_path functions with the native engine."""
+    monkeypatch.setattr(shutil, "which", lambda *_args, **_kwargs: "sops")
+    mock_run(_mock_subprocess_run_fail)
+    sops_file = tmp_path / "secret.json"
+    _ = sops_file.write_text(SECRET_JSON)
+    s = sopsy.Sops(sops_file, native=True)
+    assert s.get("hello") == "world"
+    assert s.get("hello", verify_mac=True) == "world"
+    assert s.get_path("/hello") == "world"
+    assert s.get("nonexistent", default="default") == "default"
+
+
+def test_sops_get_path_extract_fallback(
+    mock_run: Any, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    """Test sops.Sops.get_path function uses sops --extract as fallback."""
+    cmds: list[list[str]] = []
+    outputs = {
+        '["hello"]': b'[\n\t"123",\n\t1\n]',
+        '["hello"][0]': b"123",
+        '["hello"][1]': b"sops",
+    }
+
+    def _run(cmd: Any, **_kwargs: Any) -> object:
+        if "--extract" not in cmd:
+            cmds.append(cmd)
+            return subprocess.CompletedProcess([], 0, stdout=b"hello: ['123', 1]")
+        cmds.append(cmd)
+        expr = cmd[cmd.index("--extract") + 1]
+        if expr not in outputs:
+            stderr = f"Error: component [{expr}] not found".encode()
+            raise subprocess.CalledProcessError(1, cmd, stderr=stderr)
+        return subprocess.CompletedProcess([], 0, stdout=outputs[expr])
+
+    monkeypatch.setattr(shutil, "which", lambda *_args, **_kwargs: "sops")
+    mock_run(_run)
+    sops_file = tmp_path / "secret.env"
+    _ = sops_file.write_text("")
+    s = sopsy.Sops(sops_file, native=True, output_type="yaml")
+    # a leaf that is not JSON is a string, the binary is not probed
+    assert s.get_path("hello.1") == "sops"
+    [cmd] = cmds
+    assert cmd[-6:] == [
+        "decrypt",
+        "--extract",
+        '["hello"][1]',
+        "--output-type",
+        "json",
+        str(sops_file),
+    ]
+    # a missing path does not decrypt the whole file
+    cmds.clear()
+    assert s.get_path("hello.2", default="default") == "default"
+    assert len(cmds) == 1
+    # a branch is JSON, it is not decrypted again
+    cmds.clear()
+    assert s.get("hello") == ["123", 1]
+    assert len(cmds) == 1
+    # "123" may be a string or a number, the whole file is decrypted
+    cmds.clear()
+    assert s.get_path("hello.0") == "123"
+    assert len(cmds) == 2  # noqa: PLR2004
+
+
+def test_sops_get_path_extract_relative(
+    mock_run: Any, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    """Test sops.Sops.get_path function extracts under the object extract path."""
+    cmds: list[list[str]] = []
+
+    def _run(cmd: Any, **_kwargs: Any) -> object:
+        cmds.append(cmd)
+        return subprocess.CompletedProcess([], 0, stdout=b"sops")
+
+    monkeypatch.setattr(shutil, "which", lambda *_args, **_kwargs: "sops")
+    mock_run(_run)
+    sops_file = tmp_path / "secret.env"
+    _ = sops_file.write_text("")
+    s = sopsy.Sops(sops_file, extract='["a"]', in_place=True)
+    assert s.get("b") == "sops"
+    [cmd] = [cmd for cmd in cmds if "--extract" in cmd]
+    assert cmd.count("--extract") == 1
+    assert cmd[cmd.index("--extract") + 1] == '["a"]["b"]'
+    assert "--in-place" not in cmd
+
+
+def test_sops_get_path_extract_old_sops(
+    mock_run: Any, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    """Test sops.Sops.get_path function decrypts the file when --extract failed."""
+
+    def _run(cmd: Any, **_kwargs: Any) -> object:
+        if "--extract" in cmd:
+            raise subprocess.CalledProcessError(1, cmd, stderr=b"unknown command")
+        return subprocess.CompletedProcess([], 0, stdout=b"hello: sops")
+
+    monkeypatch.setattr(shutil, "which", lambda *_args, **_kwargs: "sops")
+    mock_run(_run)
+    sops_file = tmp_path / "secret.yaml"
+    _ = sops_file.write_text("")
+    old = binary.SopsBinaryInfo(Path("sops"), (3, 8, 1), frozenset())
+    monkeypatch.setattr(sopsy, "binary_info", lambda _binary: old)
+    assert sopsy.Sops(sops_file).get("hello") == "sops"
+    new = binary.SopsBinaryInfo(Path("sops"), (3, 9, 0), frozenset())
+    monkeypatch.setattr(sopsy, "binary_info", lambda _binary: new)
+    with pytest.raises(errors.SopsyCommandFailedError):
+        _ = sopsy.Sops(sops_file).get("hello")
+
+
+def test_native_update_document() -> None:
+    """Test native.update_document function only re-encrypts changed values."""
+    document = native.load_document(SECRET_JSON, "json")
+    base = native.update_document(
+        document, [(["a"], "one"), (["b", "c"], [1, 2.5, True]), (["hello"], "world")]
+    )
+    assert base["hello"] == document["hello"]
+    assert base["sops"]["mac"] != document["sops"]["mac"]
+    updated = native.update_document(base, [(["b", "c", 0], 2), (["d"], None)])
+    assert updated["hello"] == base["hello"]
+    assert updated["a"] == base["a"]
+    assert updated["b"]["c"][0] != base["b"]["c"][0]
+    assert updated["b"]["c"][1:] == base["b"]["c"][1:]
+    assert native.decrypt_document(updated) == {
+        "hello": "world",
+        "a": "one",
+        "b": {"c": [2, 2.5, True]},
+        "d": None,
+    }
+    assert native.update_document(updated, [(["a"], "one")]) is updated
+    with pytest.raises(KeyError):
+        _ = native.update_document(updated, [(["b", "c", 3], "out of range")])
+
+
+def test_native_update_document_unencrypted() -> None:
+    """Test native.update_document function with unencrypted values."""
+    document = native.load_document(SECRET_JSON, "json")
+    updated = native.update_document(document, [(["port_unencrypted"], 8080)])
+    assert updated["port_unencrypted"] == 8080  # noqa: PLR2004
+    assert native.decrypt_document(updated)["port_unencrypted"] == 8080  # noqa: PLR2004
+
+
+def test_native_dump_document() -> None:
+    """Test native.dump_document function formats JSON as sops does."""
+    document = native.load_document(SECRET_JSON, "json")
+    assert native.dump_document(document, "json", like=SECRET_JSON) == (
+        SECRET_JSON.encode()
+    )
+    assert (
+        native.dump_document({"a": "<&>"}, "json")
+        == b'{\n\t"a": "\\u003c\\u0026\\u003e"\n}'
+    )
+    with pytest.raises(errors.SopsyNativeError):
+        _ = native.dump_document(document, "yaml")
+
+
+def test_sops_set_native(
+    mock_run: Any, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    """Test sops.Sops.set and update functions with the native engine."""
+    monkeypatch.setattr(shutil, "which", lambda *_args, **_kwargs: "sops")
+    mock_run(_mock_subprocess_run_fail)
+    sops_file = tmp_path / "secret.json"
+    _ = sops_file.write_text(SECRET_JSON)
+    decrypt_cache = cache.DecryptCache()
+    s = sopsy.Sops(sops_file, native=True, cache=decrypt_cache)
+    assert s.decrypt() == {"hello": "world"}
+    s.set("new", "value")
+    s.update({("nested", "key"): 1, "hello": "world"})
+    assert s.decrypt() == {"hello": "world", "new": "value", "nested": {"key": 1}}
+    content = json.loads(sops_file.read_text())
+    assert content["hello"] == json.loads(SECRET_JSON)["hello"]
+
+
+def test_sops_set_fallback(
+    fake_sops: Path, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    """Test sops.Sops.update function falls back to a single sops edit."""
+    args_file = tmp_path / "args"
+    monkeypatch.setenv("FAKE_SOPS_ARGSFILE", str(args_file))
+    # YAML documents cannot be written back in-process, they are not even loaded
+    monkeypatch.setattr(native, "load_document", _mock_subprocess_run_fail)
+    sops_file = tmp_path / "secret.yaml"
+    _ = sops_file.write_text("a:\n- x\nb: 1\n")
+    s = sopsy.Sops(
+        sops_file, binary_path=fake_sops, native=True, in_place=True, output_type="json"
+    )
+    s.update({("a", 0): "b", ("c", "d"): True, "b": 1})
+    expected = {"a": ["b"], "b": 1, "c": {"d": True}}
+    assert yaml.safe_load(sops_file.read_text()) == expected
+    # the binary is probed for its version first
+    args = json.loads(args_file.read_text().splitlines()[-1])
+    assert args[-2] == "edit"
+    assert "--in-place" not in args
+    assert "--output-type" not in args
+    content = sops_file.read_text()
+    s.set("b", 1)
+    assert sops_file.read_text() == content
+    # the edited copies are removed
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "args",
+        "fake-sops",
+        "secret.yaml",
+    ]
+
+
+def test_sops_set_fallback_dotenv(
+    fake_sops: Path, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    """Test sops.Sops.set function falls back to sops set for dotenv files."""
+    args_file = tmp_path / "args"
+    monkeypatch.setenv("FAKE_SOPS_ARGSFILE", str(args_file))
+    sops_file = tmp_path / "secret.env"
+    _ = sops_file.write_text("A=x\n")
+    sopsy.Sops(sops_file, binary_path=fake_sops).set("a", "b")
+    args = json.loads(args_file.read_text().splitlines()[-1])
+    assert args[-4:] == ["set", "--value-stdin", str(sops_file), '["a"]']
+
+
+def test_sops_set_fallback_old_sops(
+    fake_sops: Path, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    """Test sops.Sops.set function requires sops 3.9 to fall back to sops set."""
+    info = binary.SopsBinaryInfo(fake_sops, (3, 8, 1), frozenset({"set"}))
+    monkeypatch.setattr(sopsy, "binary_info", lambda _binary: info)
+    sops_file = tmp_path / "secret.yaml"
+    _ = sops_file.write_text(SECRET_YAML)
+    with pytest.raises(errors.SopsyError, match="sops >= 3.9.0 is required"):
+        sopsy.Sops(sops_file, binary_path=fake_sops).set("a", "b")
+
+
+def test_native_encrypt_document() -> None:
+    """Test native.encrypt_document function output decrypts to the input."""
+    tree = {
+        "hello": "world",
+        "nested": {"list": [1, 2.5, True, b"raw"], "port_unencrypted": 8080},
+        "empty": "",
+        "none": None,
+    }
+    document = native.encrypt_document(tree, [AGE_RECIPIENT])
+    assert document["hello"].startswith("ENC[AES256_GCM,")
+    assert document["nested"]["port_unencrypted"] == 8080  # noqa: PLR2004
+    assert document["sops"]["unencrypted_suffix"] == "_unencrypted"
+    assert [s["recipient"] for s in document["sops"]["age"]] == [AGE_RECIPIENT]
+    assert native.decrypt_document(document) == tree
+    document = native.encrypt_document(
+        tree, [AGE_RECIPIENT], encrypted_regex="^hello$", mac_only_encrypted=True
+    )
+    assert document["nested"] == tree["nested"]
+    assert document["hello"].startswith("ENC[AES256_GCM,")
+    assert native.decrypt_document(document) == tree
+
+
+@pytest.mark.parametrize(
+    ("tree", "recipients", "kwargs"),
+    [
+        ({"sops": {}}, [AGE_RECIPIENT], {}),
+        ({"hello": "world"}, [], {}),
+        ({"hello": "world"}, ["age1invalid"], {}),
+        (
+            {"hello": "world"},
+            [AGE_RECIPIENT],
+            {"encrypted_regex": "a", "encrypted_suffix": "b"},
+        ),
+        ({"hello": object()}, [AGE_RECIPIENT], {}),
+    ],
+)
+def test_native_encrypt_document_unsupported(
+    tree: Any, recipients: Any, kwargs: Any
+) -> None:
+    """Test native.encrypt_document function with unsupported arguments."""
+    with pytest.raises(errors.SopsyNativeError):
+        _ = native.encrypt_document(tree, recipients, **kwargs)
+
+
+def test_native_age_encrypt() -> None:
+    """Test native.age_encrypt function output decrypts with the identity."""
+    _, public_key = native.bech32_decode(AGE_RECIPIENT)
+    (identity,) = native.load_age_identities()
+    for size in (0, 32, native.AGE_CHUNK_SIZE, native.AGE_CHUNK_SIZE * 2 + 1):
+        data = bytes(range(256)) * (size // 256) + b"x" * (size % 256)
+        armored = native.age_encrypt(data, public_key)
+        assert armored.startswith(native.AGE_ARMOR_BEGIN)
+        assert native.age_decrypt(armored, identity) == data
+
+
+def test_native_creation_settings(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test native.creation_settings function with sops creation rules."""
+    monkeypatch.delenv("SOPS_AGE_RECIPIENTS")
+    rule = {"age": "age1a, age1b", "encrypted_regex": "^data$", "path_regex": "x"}
+    assert native.creation_settings(rule) == {
+        "recipients": ["age1a", "age1b"],
+        "encrypted_regex": "^data$",
+    }
+    assert native.creation_settings({"age": ["age1a"]}) == {"recipients": ["age1a"]}
+    assert native.creation_settings(None) == {"recipients": []}
+    with pytest.raises(errors.SopsyNativeError):
+        _ = native.creation_settings({"age": "age1a", "pgp": "FINGERPRINT"})
+    monkeypatch.setenv("SOPS_AGE_RECIPIENTS", "age1env")
+    assert native.creation_settings({"pgp": "FINGERPRINT"}) == {
+        "recipients": ["age1env"]
+    }
+
+
+@pytest.mark.parametrize("extension", [".json", ".yaml"])
+def test_sops_encrypt_native(
+    mock_run: Any, monkeypatch: pytest.MonkeyPatch, tmp_path: Path, extension: str
+) -> None:
+    """Test sops.Sops.encrypt function with the native engine."""
+    monkeypatch.setattr(shutil, "which", lambda *_args, **_kwargs: "sops")
+    mock_run(_mock_subprocess_run_fail)
+    sops_file = tmp_path / f"secret{extension}"
+    _ = sops_file.write_text(PLAIN_JSON)
+    e = sopsy.Sops(sops_file, native=True).encrypt()
+    assert isinstance(e, dict)
+    assert e["hello"].startswith("ENC[")
+    assert native.decrypt_document(e) == {"hello": "world"}
+    raw = sopsy.Sops(sops_file, native=True).encrypt(to_dict=False)
+    assert isinstance(raw, bytes)
+    assert native.load_document(raw, extension[1:])["hello"].startswith("ENC[")
+    assert sopsy.Sops(sops_file, native=True, in_place=True).encrypt() is None
+    assert sopsy.Sops(sops_file, native=True).decrypt() == {"hello": "world"}
+
+
+def test_sops_encrypt_native_creation_rule(
+    mock_run: Any, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    """Test sops.Sops.encrypt function uses the creation rule of the file."""
+    monkeypatch.setattr(shutil, "which", lambda *_args, **_kwargs: "sops")
+    monkeypatch.delenv("SOPS_AGE_RECIPIENTS")
+    mock_run(_mock_subprocess_run_fail)
+    sops_file = tmp_path / "secret.json"
+    _ = sops_file.write_text('{"hello": "world", "port": 8080}')
+    config = {
+        "creation_rules": [
+            {"path_regex": r"\.yaml$", "age": "age1invalid"},
+            {
+                "path_regex": r"\.json$",
+                "age": AGE_RECIPIENT,
+                "encrypted_regex": "^hello$",
+            },
+        ]
+    }
+    e = sopsy.Sops(sops_file, native=True, config_dict=config).encrypt()
+    assert isinstance(e, dict)
+    assert e["port"] == 8080  # noqa: PLR2004
+    assert e["sops"]["encrypted_regex"] == "^hello$"
+
+
+def test_sops_encrypt_native_fallback(
+    mock_run: Any, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    """Test sops.Sops.encrypt function falls back to the sops binary."""
+    monkeypatch.setattr(shutil, "which", lambda *_args, **_kwargs: "sops")
+    mock_run(_mock_subprocess_run)
+    sops_file = tmp_path / "secret.yaml"
+    _ = sops_file.write_text("# comment\nhello: world\n")
+    assert sopsy.Sops(sops_file, native=True).encrypt() == {"hello": "sops"}
+    sops_file = tmp_path / "secret.env"
+    _ = sops_file.write_text("hello=world\n")
+    result = sopsy.Sops(sops_file, native=True).encrypt(to_dict=False)
+    assert result == b'{"hello": "sops"}'
+    monkeypatch.setenv("SOPS_AGE_RECIPIENTS", "")
+    sops_file = tmp_path / "secret.json"
+    _ = sops_file.write_text(PLAIN_JSON)
+    assert sopsy.Sops(sops_file, native=True).encrypt() == {"hello": "sops"}
+
+
+@requires_sops
+def test_sops_encrypt_native_decrypt_binary(tmp_path: Path) -> None:
+    """Test sops decrypts the files encrypted with the native engine."""
+    for extension, content in ((".json", PLAIN_JSON), (".yaml", PLAIN_YAML)):
+        sops_file = tmp_path / f"secret{extension}"
+        _ = sops_file.write_text(content)
+        assert sopsy.Sops(sops_file, native=True, in_place=True).encrypt() is None
+        assert sopsy.Sops(sops_file).decrypt() == {"hello": "world"}
+
+
+def _mock_subprocess_run(*_args: Any, **_kwargs: Any) -> object:
+    return subprocess.CompletedProcess(
+        args=[], returncode=0, stdout=b'{"hello": "sops"}'
+    )
+
+
+def _mock_subprocess_run_fail(*_args: Any, **_kwargs: Any) -> NoReturn:
+    raise subprocess.CalledProcessError(cmd=[], returncode=1, stderr=b"pytest")
@@ -0,0 +1,86 @@
+"""SOPSy Session Tests."""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from sopsy import errors
+from sopsy import hooks
+from sopsy import session
+
+
+def test_sops_session(
+    fake_sops: Path, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    """Test session.SopsSession points commands at its key service."""
+    args_file = tmp_path / "args"
+    monkeypatch.setenv("FAKE_SOPS_ARGSFILE", str(args_file))
+    sops_file = tmp_path / "secret.json"
+    _ = sops_file.write_text('{"hello": "world"}')
+    with session.SopsSession(binary_path=fake_sops) as sess:
+        assert sess.socket is not None
+        assert sess.socket.is_socket()
+        socket = sess.socket
+        assert sess.sops(sops_file).decrypt() == {"hello": "world"}
+        assert sess.sops(sops_file).rotate() == {"hello": "world"}
+        assert sess.latency().calls == 2  # noqa: PLR2004
+        assert sess.latencies.maxlen == hooks.DEFAULT_MAX_SAMPLES
+        assert not sess.sops(sops_file, native=True).native
+        result = sess.sops(sops_file).exec_env("true")
+        assert result.ok
+    assert not socket.exists()
+    assert sess.socket is None
+    calls = [json.loads(line) for line in args_file.read_text().splitlines()]
+    assert calls[0][:1] == ["keyservice"]
+    for call in calls[1:]:
+        assert f"unix://{socket}" in call
+        assert "--enable-local-keyservice=false" in call
+    # the session arguments follow the subcommand, for exec-env too
+    assert calls[-1].index("exec-env") < calls[-1].index("--keyservice")
+
+
+def test_sops_session_compare(fake_sops: Path, tmp_path: Path) -> None:
+    """Test session.SopsSession.compare function."""
+    sops_file = tmp_path / "secret.json"
+    _ = sops_file.write_text('{"hello": "world"}')
+    with session.SopsSession(binary_path=fake_sops) as sess:
+        result = sess.compare(sops_file, runs=2)
+    assert set(result) == {"session", "standalone"}
+    assert all(latency.calls == 2 for latency in result.values())  # noqa: PLR2004
+    assert all(latency.mean > 0 for latency in result.values())
+
+
+def test_sops_session_not_started() -> None:
+    """Test session.SopsSession arguments before the session starts."""
+    with pytest.raises(errors.SopsyError):
+        _ = session.SopsSession().args
+
+
+def test_sops_session_startup_failure(
+    fake_sops: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test session.SopsSession with a key service failing to start."""
+    monkeypatch.setenv("FAKE_SOPS_KEYSERVICE_FAIL", "1")
+    sess = session.SopsSession(binary_path=fake_sops)
+    with pytest.raises(errors.SopsyCommandFailedError, match="fake keyservice"):
+        sess.start()
+    assert sess.socket is None
+
+
+def test_sops_session_stderr(fake_sops: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test session.SopsSession reads the key service output while it runs."""
+    # more than a pipe buffer, the key service blocks if nobody reads it
+    monkeypatch.setenv("FAKE_SOPS_KEYSERVICE_NOISE", "20000")
+    with session.SopsSession(binary_path=fake_sops, startup_timeout=5) as sess:
+        assert sess.socket is not None
+
+
+def test_sops_session_startup_timeout(
+    fake_sops: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test session.SopsSession with a key service too slow to start."""
+    monkeypatch.setenv("FAKE_SOPS_SLEEP", "5")
+    sess = session.SopsSession(binary_path=fake_sops, startup_timeout=0.2)
+    with pytest.raises(errors.SopsyTimeoutError):
+        sess.start()
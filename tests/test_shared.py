@@ -0,0 +1,133 @@
+"""SOPSy Shared Tests."""
+
+import json
+import os
+import pickle
+from datetime import datetime
+from datetime import timezone
+from pathlib import Path
+
+import pytest
+
+from sopsy import errors
+from sopsy import hooks
+from sopsy import shared
+from sopsy import sopsy
+
+
+def test_preload(
+    fake_sops: Path, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    """Test shared.preload function serves Sops objects without running sops."""
+    sops_file = tmp_path / "secret.json"
+    _ = sops_file.write_text('{"hello": "world", "db": {"hosts": ["db1"]}}')
+    store = shared.preload([sops_file], binary_path=fake_sops)
+    assert shared.active is store
+    assert store.generation == 1
+    args_file = tmp_path / "args"
+    monkeypatch.setenv("FAKE_SOPS_ARGSFILE", str(args_file))
+    events: list[hooks.SopsyEvent] = []
+    _ = hooks.add_hook(events.append)
+    s = sopsy.Sops(sops_file, binary_path=fake_sops)
+    assert s.get("hello") == "world"
+    assert s.get_path("db.hosts.0") == "db1"
+    assert s.get("nonexistent", default="default") == "default"
+    data = s.decrypt()
+    assert data == {"hello": "world", "db": {"hosts": ["db1"]}}
+    assert isinstance(data, dict)
+    data["hello"] = "changed"
+    assert s.get("hello") == "world"
+    assert [e.backend for e in events] == ["preload"]
+    assert not args_file.exists()
+    # other files, and raw outputs, still run sops
+    other = tmp_path / "other.json"
+    _ = other.write_text('{"foo": "bar"}')
+    assert sopsy.Sops(other, binary_path=fake_sops).decrypt() == {"foo": "bar"}
+    assert s.decrypt(to_dict=False) == sops_file.read_bytes()
+    assert len(args_file.read_text().splitlines()) == 2  # noqa: PLR2004
+
+
+def test_preload_refresh(fake_sops: Path, tmp_path: Path) -> None:
+    """Test shared.SopsPreload.refresh and publish functions."""
+    first, second = tmp_path / "first.json", tmp_path / "second.json"
+    _ = first.write_text('{"hello": "world"}')
+    _ = second.write_text('{"foo": "bar"}')
+    store = shared.preload([first, second], binary_path=fake_sops)
+    _ = first.write_text('{"hello": "new world"}')
+    assert sopsy.Sops(first, binary_path=fake_sops).get("hello") == "world"
+    assert store.refresh() == 2  # noqa: PLR2004
+    assert sopsy.Sops(first, binary_path=fake_sops).get("hello") == "new world"
+    assert store.publish({second: {"foo": "baz"}}) == 3  # noqa: PLR2004
+    assert store.get(first) == {"hello": "new world"}
+    assert store.get(second) == {"foo": "baz"}
+    s = sopsy.Sops(second, binary_path=fake_sops, preloaded=False)
+    assert s.decrypt() == {"foo": "bar"}
+    store.close()
+    assert shared.active is None
+    assert store.get(first) is None
+
+
+def test_preload_publish_types(tmp_path: Path) -> None:
+    """Test shared.SopsPreload.publish function keeps the value types."""
+    secrets = {
+        "binary": b"\x00\xff",
+        "date": datetime(2024, 1, 1, tzinfo=timezone.utc),
+        "numbers": {1: 1.5, "list": [True, None]},
+    }
+    with shared.SopsPreload([]) as store:
+        _ = store.publish({tmp_path / "secret.yaml": secrets})
+        # read the mapping as a forked process would
+        store._decoded = (0, {})
+        assert store.get(tmp_path / "secret.yaml") == secrets
+
+
+def test_preload_errors(fake_sops: Path, tmp_path: Path) -> None:
+    """Test shared.SopsPreload with failing files and a too small capacity."""
+    sops_file = tmp_path / "secret.json"
+    _ = sops_file.write_text(json.dumps({"hello": "world"}))
+    failing = tmp_path / "fail.json"
+    _ = failing.write_text("{}")
+    with pytest.raises(errors.SopsyCommandFailedError):
+        _ = shared.preload([sops_file, failing], binary_path=fake_sops)
+    assert shared.active is None
+    secrets = {str(sops_file): {"hello": "world"}}
+    capacity = len(pickle.dumps(secrets, protocol=pickle.HIGHEST_PROTOCOL)) + 16
+    with shared.SopsPreload(
+        [sops_file], capacity=capacity, binary_path=fake_sops
+    ) as store:
+        assert store.refresh() == 1
+        with pytest.raises(errors.SopsyError, match="capacity"):
+            _ = store.publish({sops_file: {"hello": "x" * 64}})
+        assert store.get(sops_file) == {"hello": "world"}
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+def test_preload_fork(fake_sops: Path, tmp_path: Path) -> None:
+    """Test shared.SopsPreload refreshes are seen by forked processes."""
+    sops_file = tmp_path / "secret.json"
+    _ = sops_file.write_text('{"hello": "world"}')
+    store = shared.preload([sops_file], binary_path=fake_sops)
+    from_parent, to_child = os.pipe()
+    from_child, to_parent = os.pipe()
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover
+        code = 1
+        try:
+            s = sopsy.Sops(sops_file, binary_path=fake_sops)
+            seen = [s.get("hello")]
+            _ = os.write(to_parent, b"x")
+            _ = os.read(from_parent, 1)
+            seen.append(s.get("hello"))
+            _ = os.write(to_parent, json.dumps(seen).encode())
+            code = 0
+        finally:
+            os._exit(code)
+    _ = os.read(from_child, 1)
+    _ = sops_file.write_text('{"hello": "new world"}')
+    _ = store.refresh()
+    _ = os.write(to_child, b"x")
+    _, status = os.waitpid(pid, 0)
+    assert status == 0
+    assert json.loads(os.read(from_child, 1024)) == ["world", "new world"]
+    for fd in (to_child, from_parent, from_child, to_parent):
+        os.close(fd)
@@ -1,10 +1,15 @@
 """SOPSy Tests."""
 
+import json
 import os
 import shutil
 import subprocess
+import time
+import tracemalloc
+from io import BytesIO
 from pathlib import Path
 from typing import Any
+from typing import Iterator
 from typing import NoReturn
 
 import pytest
@@ -19,6 +24,10 @@ os.environ["SOPS_AGE_KEY"] = (
 os.environ["SOPS_AGE_RECIPIENTS"] = (
     "age13q0ur562d70500mmsnxlhnmpu0cemanf9muk7tyeum0r88gnfa2scrus0l"
 )
+# tests running the actual sops binary
+requires_sops = pytest.mark.skipif(
+    shutil.which("sops") is None, reason="sops is not installed"
+)
 PLAIN_YAML = "hello: world"
 SECRET_YAML = r"""hello: ENC[AES256_GCM,data:yPLskFo=,iv:9UE/ZnohaTLw8CM0LUJLpHvauXqMK1elqlFx/P8NdqU=,tag:jcHJo4pVgIAH5Jv+k8MlSg==,type:str]
 sops:
@@ -96,34 +105,293 @@ def test_get_dict_bad_content_yaml(tmp_path: Path) -> None:
         _ = utils.get_dict(bad_file.read_bytes())
 
 
-def test_run_cmd_to_inplace(monkeypatch: pytest.MonkeyPatch) -> None:
+def test_get_dict_output_type() -> None:
+    """Test utils.get_dict function with a known output type."""
+    assert utils.get_dict(b"hello: world", output_type="yaml") == {"hello": "world"}
+    assert utils.get_dict(b' {"hello":1}', output_type="json") == {"hello": 1}
+    with pytest.raises(errors.SopsyUnparsableOutpoutTypeError):
+        _ = utils.get_dict(b"hello: world", output_type="json")
+
+
+def test_parse_dotenv() -> None:
+    """Test utils.parse_dotenv function with raw values as written by sops."""
+    data = (
+        b"# comment\n"
+        b"A='abc\\nB=x'y\n"
+        b'P="hello\n'
+        b"K= spaced \n"
+        b"SOPS_MULTILINE=line1\\nline2\n"
+        b"EQUAL=a=b\n"
+        b"EMPTY=\n"
+    )
+    assert utils.parse_dotenv(data) == {
+        "A": "'abc\nB=x'y",
+        "P": '"hello',
+        "K": " spaced ",
+        "SOPS_MULTILINE": "line1\nline2",
+        "EQUAL": "a=b",
+        "EMPTY": "",
+    }
+
+
+def test_parse_dotenv_quoted() -> None:
+    """Test utils.parse_dotenv function with hand-written quoted values."""
+    data = (
+        b"# comment\n"
+        b"HELLO=world\n"
+        b"SOPS_MULTILINE=line1\\nline2\n"
+        b"\n"
+        b"export EXPORTED = value \n"
+        b'DOUBLE="a \\"quoted\\" # value\\t"\n'
+        b"SINGLE='literal \\n'\n"
+        b'MULTILINE="first\n'
+        b'second"\n'
+        b"EMPTY=\n"
+    )
+    assert utils.parse_dotenv(data, quoted=True) == {
+        "HELLO": "world",
+        "SOPS_MULTILINE": "line1\nline2",
+        "EXPORTED": "value",
+        "DOUBLE": 'a "quoted" # value\t',
+        "SINGLE": "literal \\n",
+        "MULTILINE": "first\nsecond",
+        "EMPTY": "",
+    }
+
+
+@pytest.mark.parametrize(
+    ("data", "quoted"),
+    [("not a variable", False), ("not a variable", True), ('U="value', True)],
+)
+def test_parse_dotenv_bad_content(data: Any, quoted: Any) -> None:
+    """Test utils.parse_dotenv function with unparsable content."""
+    with pytest.raises(errors.SopsyUnparsableOutpoutTypeError):
+        _ = utils.parse_dotenv(data, quoted=quoted)
+
+
+def test_parse_ini() -> None:
+    """Test utils.parse_ini function."""
+    data = "[DEFAULT]\nKey = value\n[section]\nmulti = first\n  second\npct = 100%\n"
+    assert utils.get_dict(data, output_type="ini") == {
+        "DEFAULT": {"Key": "value"},
+        "section": {"multi": "first\nsecond", "pct": "100%"},
+    }
+    with pytest.raises(errors.SopsyUnparsableOutpoutTypeError):
+        _ = utils.parse_ini("key = value")
+
+
+@pytest.mark.parametrize(
+    ("cmd", "expected"),
+    [
+        (["sops", "decrypt", "secret.json"], "json"),
+        (["sops", "decrypt", "secret.yml"], "yaml"),
+        (["sops", "decrypt", "--output-type", "yaml", "secret.json"], "yaml"),
+        (["sops", "decrypt", "--output-type", "dotenv", "secret.json"], "dotenv"),
+        (["sops", "decrypt", "--output-type", "binary", "secret.json"], None),
+        (["sops", "decrypt", "secret.env"], "dotenv"),
+        (["sops", "decrypt", "secret.ini"], "ini"),
+        (["sops", "decrypt", "--input-type", "json", "secret.txt"], "json"),
+        (["sops", "decrypt", "--extract", '["hello"]', "secret.json"], None),
+        (["sops", "decrypt", "secret.txt"], None),
+    ],
+)
+def test_output_type_of(cmd: Any, expected: Any) -> None:
+    """Test utils.output_type_of function."""
+    assert utils.output_type_of(cmd) == expected
+
+
+@pytest.mark.parametrize(
+    ("path", "expected"),
+    [
+        ("hello", ["hello"]),
+        ("hello.world.0", ["hello", "world", 0]),
+        ("/hello/wor~1ld/0", ["hello", "wor/ld", 0]),
+        (["hello", "0"], ["hello", "0"]),
+    ],
+)
+def test_parse_path(path: Any, expected: Any) -> None:
+    """Test utils.parse_path function."""
+    assert utils.parse_path(path) == expected
+
+
+def test_lookup_path() -> None:
+    """Test utils.lookup_path function."""
+    tree = {"hello": {"world": ["a", "b"]}}
+    assert utils.lookup_path(tree, ["hello", "world", 1]) == ("b", ["hello", "world"])
+    with pytest.raises(KeyError):
+        _ = utils.lookup_path(tree, ["hello", "nonexistent"])
+    with pytest.raises(KeyError):
+        _ = utils.lookup_path(tree, ["hello", "world", 2])
+
+
+def test_extract_expr() -> None:
+    """Test utils.extract_expr function."""
+    assert utils.extract_expr(["hello", 0]) == '["hello"][0]'
+
+
+def test_run_cmd_to_inplace(mock_run: Any) -> None:
     """Test utils.run_cmd function with inplace argument."""
-    monkeypatch.setattr(subprocess, "run", _mock_subprocess_run)
+    mock_run(_mock_subprocess_run)
     result = utils.run_cmd(["-i"], to_dict=False)
     assert result is None
 
 
-def test_run_cmd_to_bytes(monkeypatch: pytest.MonkeyPatch) -> None:
+def test_run_cmd_to_bytes(mock_run: Any) -> None:
     """Test utils.run_cmd function to bytes."""
-    monkeypatch.setattr(subprocess, "run", _mock_subprocess_run)
+    mock_run(_mock_subprocess_run)
     result = utils.run_cmd([], to_dict=False)
     assert result == b'{"hello": "world"}'
 
 
-def test_run_cmd_to_dict(monkeypatch: pytest.MonkeyPatch) -> None:
+def test_run_cmd_to_dict(mock_run: Any) -> None:
     """Test utils.run_cmd function to dict."""
-    monkeypatch.setattr(subprocess, "run", _mock_subprocess_run)
+    mock_run(_mock_subprocess_run)
     result = utils.run_cmd([], to_dict=True)
     assert result == {"hello": "world"}
 
 
-def test_run_cmd_fail(monkeypatch: pytest.MonkeyPatch) -> None:
+def test_run_cmd_fail(mock_run: Any) -> None:
     """Test utils.run_cmd function failing."""
-    monkeypatch.setattr(subprocess, "run", _mock_subprocess_run_fail)
+    mock_run(_mock_subprocess_run_fail)
     with pytest.raises(errors.SopsyCommandFailedError):
         _ = utils.run_cmd([], to_dict=True)
 
 
+def test_run_cmd_timeout(
+    fake_sops: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test utils.run_cmd function kills the command on timeout."""
+    pid_file = tmp_path / "pid"
+    monkeypatch.setenv("FAKE_SOPS_SLEEP", "10")
+    monkeypatch.setenv("FAKE_SOPS_PIDFILE", str(pid_file))
+    start = time.perf_counter()
+    with pytest.raises(errors.SopsyTimeoutError):
+        _ = utils.run_cmd([str(fake_sops), "decrypt"], to_dict=False, timeout=0.5)
+    assert time.perf_counter() - start < 5  # noqa: PLR2004
+    with pytest.raises(ProcessLookupError):
+        os.kill(int(pid_file.read_text()), 0)
+
+
+def test_run_cmd_timeout_new_session(mock_run: Any) -> None:
+    """Test utils.run_cmd function runs commands with a timeout in a new session."""
+    sessions = []
+
+    def _run(*_args: Any, **kwargs: Any) -> Any:
+        sessions.append(kwargs["start_new_session"])
+        return _mock_subprocess_run()
+
+    mock_run(_run)
+    _ = utils.run_cmd([], to_dict=True)
+    _ = utils.run_cmd([], to_dict=True, timeout=1)
+    assert sessions == [False, os.name == "posix"]
+
+
+def test_run_cmd_retries(
+    fake_sops: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test utils.run_cmd function runs commands again after a transient error."""
+    monkeypatch.setenv("FAKE_SOPS_FAIL_ONCE", str(tmp_path / "failed"))
+    cmd = [str(fake_sops), "decrypt"]
+    with pytest.raises(errors.SopsyCommandFailedError, match="connection reset"):
+        _ = utils.run_cmd(cmd, to_dict=False, input_data="{}")
+    (tmp_path / "failed").unlink()
+    assert utils.run_cmd(cmd, to_dict=True, input_data="{}", retries=1, backoff=0) == {}
+
+
+def test_run_cmd_no_retry(mock_run: Any) -> None:
+    """Test utils.run_cmd function does not run commands again after an error."""
+    calls = []
+
+    def _run(*args: Any, **kwargs: Any) -> Any:
+        calls.append(args)
+        return _mock_subprocess_run_fail(*args, **kwargs)
+
+    mock_run(_run)
+    with pytest.raises(errors.SopsyCommandFailedError):
+        _ = utils.run_cmd([], to_dict=True, retries=3, backoff=0)
+    assert len(calls) == 1
+
+
+def test_is_transient_error() -> None:
+    """Test utils.is_transient_error function."""
+    assert utils.is_transient_error("dial tcp 10.0.0.1:443: i/o timeout")
+    assert utils.is_transient_error("ThrottlingException: Rate exceeded")
+    assert utils.is_transient_error("Vault returned 503 Service Unavailable")
+    assert not utils.is_transient_error("Error getting data key: 0 successful groups")
+    assert not utils.is_transient_error("MAC mismatch")
+
+
+def test_retry_delay() -> None:
+    """Test utils.retry_delay function backs off exponentially, with a cap."""
+    assert 0 <= utils.retry_delay(1, 0.1) <= 0.1  # noqa: PLR2004
+    assert 0 <= utils.retry_delay(3, 0.1) <= 0.4  # noqa: PLR2004
+    assert utils.retry_delay(100) <= utils.MAX_RETRY_BACKOFF
+
+
+def test_sops_exec_env(
+    fake_sops: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test sopsy.Sops.exec_env function runs a command with the secrets."""
+    args_file = tmp_path / "args"
+    monkeypatch.setenv("FAKE_SOPS_ARGSFILE", str(args_file))
+    monkeypatch.setenv("INHERITED", "yes")
+    sops_file = tmp_path / "secret.json"
+    _ = sops_file.write_text('{"HELLO": "world"}')
+    s = sopsy.Sops(sops_file, binary_path=fake_sops)
+    result = s.exec_env('echo "$HELLO-$INHERITED"', capture_output=True)
+    assert result.ok
+    assert result.stdout == b"world-yes\n"
+    assert result.file == str(sops_file)
+    assert result.elapsed >= result.spawn > 0
+    result = s.exec_env(
+        ["sh", "-c", 'echo "$HELLO-$INHERITED"; exit 3'],
+        pristine=True,
+        capture_output=True,
+    )
+    assert result.returncode == 3  # noqa: PLR2004
+    assert result.stdout == b"world-\n"
+    args = json.loads(args_file.read_text().splitlines()[-1])
+    assert args[-4:] == ["exec-env", "--pristine", str(sops_file), args[-1]]
+    assert args[-1] == "sh -c 'echo \"$HELLO-$INHERITED\"; exit 3'"
+
+
+def test_sops_exec_file(fake_sops: Path, tmp_path: Path) -> None:
+    """Test sopsy.Sops.exec_file function runs a command reading the secrets."""
+    sops_file = tmp_path / "secret.json"
+    _ = sops_file.write_text('{"hello": "world"}')
+    s = sopsy.Sops(sops_file, binary_path=fake_sops)
+    result = s.exec_file("cat {}", capture_output=True)
+    assert result.ok
+    assert json.loads(result.stdout or b"") == {"hello": "world"}
+
+
+def test_sops_exec_timeout(
+    fake_sops: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test sopsy.Sops.exec_env function terminates commands on timeout."""
+    monkeypatch.setattr(utils, "EXEC_KILL_DELAY", 1)
+    sops_file = tmp_path / "secret.json"
+    _ = sops_file.write_text("{}")
+    s = sopsy.Sops(sops_file, binary_path=fake_sops, timeout=0.5)
+    start = time.perf_counter()
+    result = s.exec_env("sleep 10")
+    assert time.perf_counter() - start < 5  # noqa: PLR2004
+    assert result.timed_out
+    assert not result.ok
+
+
+def test_sops_exec_stdin(fake_sops: Path) -> None:
+    """Test sopsy.Sops.exec_env function requires a file."""
+    s = sopsy.Sops(
+        b"{}",
+        binary_path=fake_sops,
+        input_source=sopsy.SopsyInputSource.STDIN,
+        input_type="json",
+    )
+    with pytest.raises(errors.SopsyError):
+        _ = s.exec_env("true")
+
+
 def test_find_sops_config_default(tmp_path: Path) -> None:
     """Test utils.find_sops_config function without argument."""
     os.chdir(tmp_path)
@@ -230,6 +498,87 @@ def test_build_config(tmp_path: Path) -> None:
     }
 
 
+def test_find_sops_config_cached(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    """Test utils.find_sops_config_cached function does not walk again."""
+    sops_config = tmp_path / ".sops.yaml"
+    _ = sops_config.write_text("hello: world")
+    sub_dir = tmp_path / "hello_world"
+    sub_dir.mkdir()
+    os.chdir(sub_dir)
+    assert utils.find_sops_config_cached() == sops_config
+    monkeypatch.setattr(utils, "find_sops_config", _raise_error)
+    assert utils.find_sops_config_cached() == sops_config
+    utils.clear_config_cache()
+    with pytest.raises(errors.SopsyError):
+        _ = utils.find_sops_config_cached()
+
+
+def test_load_sops_config_cached(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    """Test utils.load_sops_config function only parses changed files."""
+    sops_config = tmp_path / ".sops.yaml"
+    _ = sops_config.write_text("hello: world")
+    assert utils.load_sops_config(sops_config) == {"hello": "world"}
+    utils.load_sops_config(sops_config)["hello"] = "modified"
+    monkeypatch.setattr(utils, "yaml_load", _raise_error)
+    assert utils.load_sops_config(sops_config) == {"hello": "world"}
+    _ = sops_config.write_text("hello: sops")
+    with pytest.raises(errors.SopsyError):
+        _ = utils.load_sops_config(sops_config)
+
+
+def test_config_files_path_for() -> None:
+    """Test utils.ConfigFiles.path_for function is content-addressed."""
+    with utils.ConfigFiles() as config_files:
+        path = config_files.path_for({"hello": "world"})
+        assert path.read_text() == "hello: world\n"
+        assert config_files.path_for({"hello": "world"}) == path
+        assert config_files.path_for({"hello": "sops"}) != path
+    assert not path.exists()
+
+
+def test_config_files_cleanup_forked(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test utils.ConfigFiles.cleanup function keeps the files of another process."""
+    config_files = utils.ConfigFiles()
+    path = config_files.path_for({"hello": "world"})
+    with monkeypatch.context() as m:
+        m.setattr(utils.os, "getpid", lambda: -1)
+        config_files.cleanup()
+    assert path.exists()
+    other = config_files.path_for({"hello": "world"})
+    assert other.parent != path.parent
+    config_files.cleanup()
+    assert not other.exists()
+    shutil.rmtree(path.parent)
+
+
+def test_config_args_passthrough(tmp_path: Path) -> None:
+    """Test utils.config_args function without config dict."""
+    os.chdir(tmp_path)
+    result = utils.config_args(config_path=None, config_dict=None)
+    assert result[0] == "--config"
+    assert Path(result[1]).read_text() == "{}\n"
+    sops_config = tmp_path / ".sops.yaml"
+    _ = sops_config.write_text("hello: world")
+    utils.clear_config_cache()
+    result = utils.config_args(config_path=None, config_dict={})
+    assert result == ["--config", str(sops_config)]
+
+
+def test_config_args_merged(tmp_path: Path) -> None:
+    """Test utils.config_args function with config dict."""
+    os.chdir(tmp_path)
+    sops_config = tmp_path / ".sops.yaml"
+    _ = sops_config.write_text("hello: world")
+    result = utils.config_args(config_path=None, config_dict={"foo": "bar"})
+    assert result[0] == "--config"
+    assert Path(result[1]).read_text() == "foo: bar\nhello: world\n"
+    assert utils.config_args(config_path=None, config_dict={"foo": "bar"}) == result
+
+
 def test_sops_init(tmp_path: Path) -> None:
     """Test sops.Sops.__init__ function."""
     sops_file = tmp_path / "secret.json"
@@ -483,6 +832,147 @@ def test_sops_get_default(tmp_path: Path) -> None:
     assert g == "hello"
 
 
+@requires_sops
+def test_sops_get_path(tmp_path: Path) -> None:
+    """Test sops.Sops.get_path function."""
+    sops_file = tmp_path / "secret.json"
+    _ = sops_file.write_text(SECRET_JSON)
+    s = sopsy.Sops(sops_file)
+    assert s.get_path("hello") == "world"
+    assert s.get_path("/hello") == "world"
+    assert s.get_path("hello.nonexistent", default="default") == "default"
+
+
+def test_sops_decrypt_stream(fake_sops: Path, tmp_path: Path) -> None:
+    """Test sops.Sops.decrypt_stream function with and without a source."""
+    sops_file = tmp_path / "secret.bin"
+    _ = sops_file.write_bytes(b"from file")
+    s = sopsy.Sops(sops_file, binary_path=fake_sops)
+    dst = BytesIO()
+    assert s.decrypt_stream(None, dst) == len(b"from file")
+    assert dst.getvalue() == b"from file"
+    s = sopsy.Sops(tmp_path / "missing.bin", binary_path=fake_sops)
+    dst = BytesIO()
+    _ = s.decrypt_stream(BytesIO(b"from stdin"), dst, chunk_size=4)
+    assert dst.getvalue() == b"from stdin"
+
+
+def test_sops_decrypt_stream_timeout(
+    fake_sops: Path, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    """Test sops.Sops.decrypt_stream function kills the process on timeout."""
+    pid_file = tmp_path / "pid"
+    monkeypatch.setenv("FAKE_SOPS_SLEEP", "10")
+    monkeypatch.setenv("FAKE_SOPS_PIDFILE", str(pid_file))
+    sops_file = tmp_path / "secret.bin"
+    _ = sops_file.write_bytes(b"from file")
+    s = sopsy.Sops(sops_file, binary_path=fake_sops, timeout=10)
+    start = time.perf_counter()
+    with pytest.raises(errors.SopsyTimeoutError):
+        _ = s.decrypt_stream(BytesIO(b"from stdin"), BytesIO(), timeout=0.5)
+    assert time.perf_counter() - start < 5  # noqa: PLR2004
+    with pytest.raises(ProcessLookupError):
+        os.kill(int(pid_file.read_text()), 0)
+
+
+def test_sops_decrypt_stream_retries(
+    fake_sops: Path, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    """Test sops.Sops.decrypt_stream function only retries without a source."""
+    monkeypatch.setenv("FAKE_SOPS_FAIL_ONCE", str(tmp_path / "failed"))
+    sops_file = tmp_path / "secret.bin"
+    _ = sops_file.write_bytes(b"from file")
+    s = sopsy.Sops(sops_file, binary_path=fake_sops, retries=1)
+    dst = BytesIO()
+    assert s.decrypt_stream(None, dst) == len(b"from file")
+    assert dst.getvalue() == b"from file"
+    (tmp_path / "failed").unlink()
+    with pytest.raises(errors.SopsyCommandFailedError, match="connection reset"):
+        _ = s.decrypt_stream(BytesIO(b"from stdin"), BytesIO())
+
+
+def test_sops_encrypt_stream_bounded_memory(fake_sops: Path) -> None:
+    """Test sops.Sops.encrypt_stream function memory does not grow with payload."""
+    chunk_size = 64 * 1024
+    chunks = 512
+
+    def _chunks() -> Iterator[bytes]:
+        chunk = b"x" * chunk_size
+        for _ in range(chunks):
+            yield chunk
+
+    class _Counter:
+        size = 0
+
+        def write(self, data: bytes) -> int:
+            self.size += len(data)
+            return len(data)
+
+    s = sopsy.Sops(
+        b"",
+        binary_path=fake_sops,
+        input_source=sopsy.SopsyInputSource.STDIN,
+        input_type=sopsy.SopsyInOutType.BINARY,
+    )
+    dst = _Counter()
+    tracemalloc.start()
+    try:
+        written = s.encrypt_stream(_chunks(), dst, chunk_size=chunk_size)  # type: ignore[arg-type]
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert written == dst.size == chunk_size * chunks
+    assert peak < 16 * chunk_size
+
+
+def test_sops_encrypt_stream_fail(fake_sops: Path, tmp_path: Path) -> None:
+    """Test sops.Sops.encrypt_stream function failing."""
+    sops_file = tmp_path / "fail.bin"
+    _ = sops_file.write_bytes(b"hello")
+    s = sopsy.Sops(sops_file, binary_path=fake_sops)
+    with pytest.raises(errors.SopsyCommandFailedError, match="fake sops failure"):
+        _ = s.encrypt_stream(None, BytesIO())
+
+
+def test_sops_encrypt_stream_source_error(fake_sops: Path, tmp_path: Path) -> None:
+    """Test sops.Sops.encrypt_stream function with a failing source."""
+
+    def _chunks() -> Iterator[bytes]:
+        yield b"hello"
+        raise OSError
+
+    s = sopsy.Sops(tmp_path / "missing.bin", binary_path=fake_sops)
+    with pytest.raises(OSError):  # noqa: PT011
+        _ = s.encrypt_stream(_chunks(), BytesIO())
+
+
+def test_sops_as_environ(
+    fake_sops: Path, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    """Test sops.Sops.as_environ function."""
+    monkeypatch.setattr(os, "environ", {"EXISTING": "old"})
+    sops_file = tmp_path / "secret.env"
+    _ = sops_file.write_text("HELLO=world\nEXISTING=new\n")
+    s = sopsy.Sops(sops_file, binary_path=fake_sops)
+    assert s.as_environ(overwrite=False) == {"HELLO": "world"}
+    assert os.environ == {"HELLO": "world", "EXISTING": "old"}
+    assert s.as_environ() == {"HELLO": "world", "EXISTING": "new"}
+    assert os.environ["EXISTING"] == "new"
+
+
+def test_sops_as_environ_complex(fake_sops: Path, tmp_path: Path) -> None:
+    """Test sops.Sops.as_environ function with nested values."""
+    sops_file = tmp_path / "secret.json"
+    _ = sops_file.write_text('{"hello": {"nested": "world"}}')
+    s = sopsy.Sops(sops_file, binary_path=fake_sops)
+    with pytest.raises(errors.SopsyError, match="complex value"):
+        _ = s.as_environ()
+
+
+def _raise_error(*_args: Any, **_kwargs: Any) -> NoReturn:
+    raise errors.SopsyError
+
+
 def _not_return_sops_path(*_args: Any, **_kwargs: Any) -> None:
     return None
 
@@ -0,0 +1,112 @@
+"""SOPSy Store Tests."""
+
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from sopsy import errors
+from sopsy import store
+
+
+def _write(path: Path, content: Any) -> Path:
+    _ = path.write_text(json.dumps(content))
+    # the store tells files apart by mtime, do not depend on its resolution
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    return path
+
+
+def test_store_sops_store(tmp_path: Path, fake_sops: Path) -> None:
+    """Test store.SopsStore class overlays files under dotted keys."""
+    base = _write(
+        tmp_path / "base.json",
+        {"db": {"host": "db", "port": 5432, "hosts": ["a", "b"]}, "debug": True},
+    )
+    prod = _write(tmp_path / "prod.json", {"db": {"host": "prod-db"}, "debug": False})
+    s = store.SopsStore([base, prod], binary_path=fake_sops)
+    assert s["db.host"] == "prod-db"
+    assert s["db.port"] == 5432  # noqa: PLR2004
+    assert s["debug"] is False
+    assert s["db.hosts"] == ("a", "b")
+    assert s["db.hosts.1"] == "b"
+    assert s["/db/hosts/0"] == "a"
+    assert s.get("db.missing", "default") == "default"
+    assert sorted(s) == ["db.host", "db.hosts", "db.port", "debug"]
+    assert len(s) == 4  # noqa: PLR2004
+    branch = s["db"]
+    assert branch == {"host": "prod-db", "port": 5432, "hosts": ("a", "b")}
+    branch["host"] = "changed"
+    assert s["db.host"] == "prod-db"
+
+
+def test_store_sops_store_precedence_first(tmp_path: Path, fake_sops: Path) -> None:
+    """Test store.SopsStore class with the first file taking precedence."""
+    files = [
+        _write(tmp_path / "override.json", {"a": {"b": 1}}),
+        _write(tmp_path / "defaults.json", {"a": {"b": 2, "c": 3}}),
+    ]
+    s = store.SopsStore(files, precedence="first", binary_path=fake_sops)
+    assert dict(s) == {"a.b": 1, "a.c": 3}
+
+
+def test_store_sops_store_reload(
+    tmp_path: Path, fake_sops: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test store.SopsStore.reload function only decrypts the changed files."""
+    base = _write(tmp_path / "base.json", {"region": "eu", "name": "app"})
+    prod = _write(tmp_path / "prod.json", {"release": "r1"})
+    s = store.SopsStore([base, prod], binary_path=fake_sops)
+    args_file = tmp_path / "args"
+    monkeypatch.setenv("FAKE_SOPS_ARGSFILE", str(args_file))
+    assert s.reload() == []
+    assert not args_file.exists()
+    _ = _write(prod, {"release": "r2", "name": "app"})
+    assert s.reload() == [prod.resolve()]
+    assert len(args_file.read_text().splitlines()) == 1
+    assert s["release"] == "r2"
+    assert s["region"] == "eu"
+    # equal leaves of different files share one object
+    assert s["name"] is s._layers[base.resolve()]["name"]
+
+
+def test_store_sops_store_dotted_keys(tmp_path: Path, fake_sops: Path) -> None:
+    """Test store.SopsStore class with keys holding a dot."""
+    path = _write(
+        tmp_path / "secret.json",
+        {"smtp.host": "mail", "db": {"a.example.com": {"port": 1}, "name": "x"}},
+    )
+    s = store.SopsStore([path], binary_path=fake_sops)
+    assert dict(s) == {"db.name": "x"}
+    assert s["/smtp.host"] == "mail"
+    assert s["/db/a.example.com/port"] == 1
+    assert s["db"]["a.example.com"] == {"port": 1}
+    with pytest.raises(KeyError):
+        _ = s["smtp.host"]
+
+
+def test_store_sops_store_errors(tmp_path: Path, fake_sops: Path) -> None:
+    """Test store.SopsStore class with bad arguments and undecryptable files."""
+    good = _write(tmp_path / "good.json", {"a": 1})
+    with pytest.raises(errors.SopsyError, match="precedence"):
+        _ = store.SopsStore([good], precedence="middle", binary_path=fake_sops)
+    with pytest.raises(errors.SopsyError, match="mapping"):
+        _ = store.SopsStore(
+            [good, _write(tmp_path / "list.json", [1])], binary_path=fake_sops
+        )
+    with pytest.raises(errors.SopsyCommandFailedError):
+        _ = store.SopsStore(
+            [good, _write(tmp_path / "fail.json", {})], binary_path=fake_sops
+        )
+
+
+def test_store_sops_store_reload_error(tmp_path: Path, fake_sops: Path) -> None:
+    """Test store.SopsStore.reload function keeps the content on error."""
+    path = _write(tmp_path / "secret.json", {"a": 1})
+    s = store.SopsStore([path], binary_path=fake_sops)
+    _ = _write(path, [1])
+    with pytest.raises(errors.SopsyError):
+        _ = s.reload()
+    assert s["a"] == 1
@@ -0,0 +1,149 @@
+"""SOPSy Watch Tests."""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from sopsy import errors
+from sopsy import watch
+
+
+def _write(path: Path, content: Any) -> None:
+    _ = path.write_text(json.dumps(content))
+    # make each write visible to the polling backend, whatever the mtime resolution
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.mark.parametrize("inotify", [True, False])
+def test_sops_watcher(fake_sops: Path, tmp_path: Path, inotify: bool) -> None:  # noqa: FBT001
+    """Test watch.SopsWatcher publishes a snapshot when a file changes."""
+    if inotify and not watch._inotify_available():
+        pytest.skip("inotify is not available")
+    first, second = tmp_path / "first.json", tmp_path / "second.json"
+    _write(first, {"hello": "world"})
+    _write(second, {"foo": "bar"})
+    snapshots: list[watch.SopsSnapshot] = []
+    published = threading.Event()
+
+    def _on_snapshot(snapshot: watch.SopsSnapshot) -> None:
+        snapshots.append(snapshot)
+        published.set()
+
+    watcher = watch.SopsWatcher(
+        [first, second],
+        debounce=0.05,
+        poll_interval=0.05,
+        inotify=inotify,
+        binary_path=fake_sops,
+    )
+    with watcher:
+        assert watcher.inotify is inotify
+        assert watcher.snapshot.generation == 1
+        assert watcher.get(first) == {"hello": "world"}
+        assert watcher.get(second) == {"foo": "bar"}
+        watcher.subscribe(_on_snapshot)
+        before = watcher.snapshot
+        _write(first, {"hello": "you"})
+        assert published.wait(5)
+    assert watcher.get(first) == {"hello": "you"}
+    assert len(snapshots) == 1
+    assert snapshots[0].changed == {first.resolve()}
+    assert snapshots[0].generation == 2  # noqa: PLR2004
+    # untouched files keep their content, published snapshots are never modified
+    assert snapshots[0].secrets[second.resolve()] is before.secrets[second.resolve()]
+    assert before.secrets[first.resolve()] == {"hello": "world"}
+
+
+def test_sops_watcher_coalesce(fake_sops: Path, tmp_path: Path) -> None:
+    """Test watch.SopsWatcher refreshes once for a burst of writes."""
+    sops_file = tmp_path / "secret.json"
+    _write(sops_file, {"n": "0"})
+    snapshots: list[watch.SopsSnapshot] = []
+    published = threading.Event()
+
+    def _on_snapshot(snapshot: watch.SopsSnapshot) -> None:
+        snapshots.append(snapshot)
+        published.set()
+
+    with watch.SopsWatcher(
+        [sops_file], debounce=0.5, poll_interval=0.05, binary_path=fake_sops
+    ) as watcher:
+        watcher.subscribe(_on_snapshot)
+        for n in range(1, 6):
+            _write(sops_file, {"n": str(n)})
+        assert published.wait(5)
+    assert len(snapshots) == 1
+    assert watcher.get(sops_file) == {"n": "5"}
+
+
+def test_sops_watcher_refresh(
+    fake_sops: Path, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    """Test watch.SopsWatcher.refresh function only decrypts changed files."""
+    args_file = tmp_path / "args"
+    monkeypatch.setenv("FAKE_SOPS_ARGSFILE", str(args_file))
+    sops_file = tmp_path / "secret.json"
+    _write(sops_file, {"hello": "world"})
+    watcher = watch.SopsWatcher([sops_file], binary_path=fake_sops)
+    first = watcher.refresh()
+    assert watcher.refresh() is first
+    assert len(args_file.read_text().splitlines()) == 1
+    # a file rewritten with the same content does not publish a snapshot
+    _write(sops_file, {"hello": "world"})
+    assert watcher.refresh() is first
+    assert len(args_file.read_text().splitlines()) == 2  # noqa: PLR2004
+
+
+def test_sops_watcher_error(fake_sops: Path, tmp_path: Path) -> None:
+    """Test watch.SopsWatcher keeps the previous content of undecryptable files."""
+    sops_file = tmp_path / "fail.json"
+    _write(sops_file, {"hello": "world"})
+    failures: list[Path] = []
+
+    def _on_error(file: Path, err: errors.SopsyError) -> None:
+        assert isinstance(err, errors.SopsyCommandFailedError)
+        failures.append(file)
+
+    watcher = watch.SopsWatcher([sops_file], on_error=_on_error, binary_path=fake_sops)
+    snapshot = watcher.refresh()
+    assert snapshot.generation == 0
+    assert watcher.get(sops_file, "missing") == "missing"
+    assert failures == [sops_file.resolve()]
+
+
+def test_sops_watcher_error_retry(
+    fake_sops: Path, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    """Test watch.SopsWatcher.refresh function retries files it could not decrypt."""
+    monkeypatch.setenv("FAKE_SOPS_FAIL_ONCE", str(tmp_path / "failed"))
+    sops_file = tmp_path / "secret.json"
+    _write(sops_file, {"hello": "world"})
+    watcher = watch.SopsWatcher([sops_file], binary_path=fake_sops)
+    assert watcher.refresh().generation == 0
+    snapshot = watcher.refresh()
+    assert snapshot.generation == 1
+    assert watcher.get(sops_file) == {"hello": "world"}
+    assert watcher.refresh() is snapshot
+
+
+def test_sops_watcher_refresh_threads(fake_sops: Path, tmp_path: Path) -> None:
+    """Test watch.SopsWatcher.refresh function decrypts once for concurrent calls."""
+    sops_file = tmp_path / "secret.json"
+    _write(sops_file, {"hello": "world"})
+    watcher = watch.SopsWatcher([sops_file], binary_path=fake_sops)
+    snapshots: list[watch.SopsSnapshot] = []
+    threads = [
+        threading.Thread(target=lambda: snapshots.append(watcher.refresh()))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert watcher.snapshot.generation == 1
+    assert all(s is watcher.snapshot for s in snapshots)